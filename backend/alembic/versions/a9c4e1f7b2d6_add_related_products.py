@@ -0,0 +1,64 @@
+"""add_related_products
+
+Revision ID: a9c4e1f7b2d6
+Revises: f3b6d0a8e5c2
+Create Date: 2026-10-17 17:21:09.487233
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+revision = 'a9c4e1f7b2d6'
+down_revision = 'f3b6d0a8e5c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Co-purchase counts and top-K lists built by build_related_products.py;
+    # empty until the job first runs.
+    op.create_table(
+        'product_cooccurrence',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('related_product_id', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['related_product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('product_id', 'related_product_id', name='uq_product_cooccurrence_pair')
+    )
+    op.create_index(op.f('ix_product_cooccurrence_id'), 'product_cooccurrence', ['id'], unique=False)
+
+    op.create_table(
+        'product_recommendations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('related_product_id', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['related_product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('product_id', 'rank', name='uq_product_recommendation_rank')
+    )
+    op.create_index(op.f('ix_product_recommendations_id'), 'product_recommendations', ['id'], unique=False)
+
+    op.create_table(
+        'job_watermarks',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('job_watermarks')
+    op.drop_index(op.f('ix_product_recommendations_id'), table_name='product_recommendations')
+    op.drop_table('product_recommendations')
+    op.drop_index(op.f('ix_product_cooccurrence_id'), table_name='product_cooccurrence')
+    op.drop_table('product_cooccurrence')
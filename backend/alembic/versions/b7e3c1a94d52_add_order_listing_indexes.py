@@ -0,0 +1,31 @@
+"""add_order_listing_indexes
+
+Revision ID: b7e3c1a94d52
+Revises: 3fcd7ba5fb94
+Create Date: 2026-10-17 09:12:31.408117
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+revision = 'b7e3c1a94d52'
+down_revision = '3fcd7ba5fb94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keyset pagination over (created_at, id), newest first, optionally
+    # narrowed to one status or one customer
+    op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'], unique=False)
+    op.create_index('ix_orders_status_created_at_id', 'orders', ['status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_orders_user_id_created_at_id', 'orders', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_user_id_created_at_id', table_name='orders')
+    op.drop_index('ix_orders_status_created_at_id', table_name='orders')
+    op.drop_index('ix_orders_created_at_id', table_name='orders')
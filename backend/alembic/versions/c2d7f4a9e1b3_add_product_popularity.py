@@ -0,0 +1,48 @@
+"""add_product_popularity
+
+Revision ID: c2d7f4a9e1b3
+Revises: a9c4e1f7b2d6
+Create Date: 2026-10-17 18:40:52.113906
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+revision = 'c2d7f4a9e1b3'
+down_revision = 'a9c4e1f7b2d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('orders', sa.Column('confirmed_at', sa.DateTime(), nullable=True))
+    # Confirmation times were not recorded before; the last update is the
+    # closest we have for orders already confirmed.
+    op.execute("UPDATE orders SET confirmed_at = updated_at WHERE status = 'confirmed'")
+    op.create_index('ix_orders_confirmed_at_id', 'orders', ['confirmed_at', 'id'], unique=False)
+
+    op.add_column('job_watermarks', sa.Column('last_at', sa.DateTime(), nullable=True))
+
+    # Filled by refresh_popularity.py; empty until the job first runs
+    op.create_table(
+        'product_popularity',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('last_sold_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_index('ix_product_popularity_updated_at', 'product_popularity', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_popularity_updated_at', table_name='product_popularity')
+    op.drop_table('product_popularity')
+    op.drop_column('job_watermarks', 'last_at')
+    op.drop_index('ix_orders_confirmed_at_id', table_name='orders')
+    op.drop_column('orders', 'confirmed_at')
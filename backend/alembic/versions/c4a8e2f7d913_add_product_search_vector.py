@@ -0,0 +1,40 @@
+"""add_product_search_vector
+
+Revision ID: c4a8e2f7d913
+Revises: b7e3c1a94d52
+Create Date: 2026-10-17 10:41:07.553904
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+revision = 'c4a8e2f7d913'
+down_revision = 'b7e3c1a94d52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Generated full-text document for catalog search (app/services/catalog_search.py).
+    # Not mapped on the model; the 'simple' config keeps words unstemmed so
+    # prefix queries behave the same for French and English product names.
+    op.execute(
+        """
+        ALTER TABLE products ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        ) STORED
+        """
+    )
+    op.create_index(
+        'ix_products_search_vector', 'products', ['search_vector'], unique=False, postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_search_vector', table_name='products')
+    op.drop_column('products', 'search_vector')
@@ -0,0 +1,35 @@
+"""add_product_listing_indexes
+
+Revision ID: d5f1b8c3e260
+Revises: c4a8e2f7d913
+Create Date: 2026-10-17 14:02:47.215530
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+revision = 'd5f1b8c3e260'
+down_revision = 'c4a8e2f7d913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Catalog sort orders (price, newest, name) with id as the keyset
+    # tie-breaker; price optionally narrowed to one kind
+    op.create_index('ix_products_active_price_cents_id', 'products', ['active', 'price_cents', 'id'], unique=False)
+    op.create_index(
+        'ix_products_active_kind_price_cents_id', 'products', ['active', 'kind', 'price_cents', 'id'], unique=False
+    )
+    op.create_index('ix_products_active_created_at_id', 'products', ['active', 'created_at', 'id'], unique=False)
+    op.create_index('ix_products_active_name_id', 'products', ['active', 'name', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_active_name_id', table_name='products')
+    op.drop_index('ix_products_active_created_at_id', table_name='products')
+    op.drop_index('ix_products_active_kind_price_cents_id', table_name='products')
+    op.drop_index('ix_products_active_price_cents_id', table_name='products')
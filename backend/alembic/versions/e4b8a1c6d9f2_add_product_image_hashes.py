@@ -0,0 +1,40 @@
+"""add_product_image_hashes
+
+Revision ID: e4b8a1c6d9f2
+Revises: c2d7f4a9e1b3
+Create Date: 2026-10-17 21:12:37.408215
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+revision = 'e4b8a1c6d9f2'
+down_revision = 'c2d7f4a9e1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'product_image_hashes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('hash', sa.BigInteger(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_product_image_hashes_id'), 'product_image_hashes', ['id'], unique=False)
+    op.create_index(
+        op.f('ix_product_image_hashes_product_id'), 'product_image_hashes', ['product_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_image_hashes_product_id'), table_name='product_image_hashes')
+    op.drop_index(op.f('ix_product_image_hashes_id'), table_name='product_image_hashes')
+    op.drop_table('product_image_hashes')
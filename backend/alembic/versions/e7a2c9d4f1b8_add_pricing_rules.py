@@ -0,0 +1,46 @@
+"""add_pricing_rules
+
+Revision ID: e7a2c9d4f1b8
+Revises: d5f1b8c3e260
+Create Date: 2026-10-17 15:12:44.318207
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+
+revision = 'e7a2c9d4f1b8'
+down_revision = 'd5f1b8c3e260'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE TYPE pricingrulekind AS ENUM ('shipping', 'tax')")
+
+    # Shipping and tax rules read by app/services/pricing.py; with no matching
+    # rule the DEFAULT_SHIPPING_CENTS / DEFAULT_TAX_RATE_BPS settings apply.
+    op.create_table(
+        'pricing_rules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', postgresql.ENUM('shipping', 'tax', name='pricingrulekind', create_type=False), nullable=False),
+        sa.Column('country', sa.String(length=100), nullable=True),
+        sa.Column('commune', sa.String(length=100), nullable=True),
+        sa.Column('min_subtotal_cents', sa.Integer(), nullable=False),
+        sa.Column('amount_cents', sa.Integer(), nullable=True),
+        sa.Column('rate_bps', sa.Integer(), nullable=True),
+        sa.Column('active', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pricing_rules_id'), 'pricing_rules', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_pricing_rules_id'), table_name='pricing_rules')
+    op.drop_table('pricing_rules')
+    op.execute("DROP TYPE pricingrulekind")
@@ -0,0 +1,49 @@
+"""add_product_availability
+
+Revision ID: f3b6d0a8e5c2
+Revises: e7a2c9d4f1b8
+Create Date: 2026-10-17 16:03:21.904511
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+revision = 'f3b6d0a8e5c2'
+down_revision = 'e7a2c9d4f1b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nursery stock per (city, commune, product) behind the catalog's
+    # in_stock_near filter; the unique index also serves city-only lookups.
+    op.create_table(
+        'product_availability',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('city', sa.String(length=100), nullable=False),
+        sa.Column('commune', sa.String(length=100), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('city', 'commune', 'product_id', name='uq_product_availability_location_product')
+    )
+    op.create_index(op.f('ix_product_availability_id'), 'product_availability', ['id'], unique=False)
+
+    # Backfill from current nursery stock; keys normalised like inventory_service.location_key
+    op.execute(
+        """
+        INSERT INTO product_availability (city, commune, product_id, quantity)
+        SELECT lower(trim(n.city)), coalesce(lower(trim(n.commune)), ''), ni.product_id, sum(ni.quantity)
+        FROM nursery_inventory ni JOIN nurseries n ON n.id = ni.nursery_id
+        GROUP BY lower(trim(n.city)), coalesce(lower(trim(n.commune)), ''), ni.product_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_availability_id'), table_name='product_availability')
+    op.drop_table('product_availability')
@@ -0,0 +1,51 @@
+"""
+HTTP validators (ETag / Last-Modified), Cache-Control and 304 handling.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over `parts`: the same data serialises to the same JSON, byte order aside."""
+    return 'W/"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:20] + '"'
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime], max_age: int) -> Dict[str, str]:
+    """ETag, Last-Modified (naive datetimes are UTC) and a public Cache-Control."""
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def _etags(header: str) -> Iterable[str]:
+    for tag in header.split(","):
+        tag = tag.strip()
+        yield tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """Evaluate If-None-Match (weak comparison), else If-Modified-Since, against `headers`."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = headers["ETag"].removeprefix("W/")
+        return any(tag == "*" or tag == etag for tag in _etags(if_none_match))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = headers.get("Last-Modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """Bodyless 304 carrying the validators and caching headers."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -1,7 +1,5 @@
 # Re-export commonly used DB bits
 from app.db.base import Base  # noqa: F401
-from app.db.session import get_db  # noqa: F401
-
-
+from app.db.session import get_async_db, get_db  # noqa: F401
 
 
@@ -7,11 +7,14 @@ from enum import Enum as PyEnum
 from typing import Optional
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     DateTime,
     Enum,
+    Float,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
@@ -61,6 +64,11 @@ class FulfillmentStatus(str, PyEnum):
     CANCELLED = "cancelled"
 
 
+class PricingRuleKind(str, PyEnum):
+    SHIPPING = "shipping"
+    TAX = "tax"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -109,6 +117,15 @@ class Product(Base):
     attributes = relationship("ProductAttributes", back_populates="product", uselist=False, cascade="all, delete-orphan")
     inventory = relationship("Inventory", back_populates="product", uselist=False, cascade="all, delete-orphan")
     order_items = relationship("OrderItem", back_populates="product")
+    popularity = relationship("ProductPopularity", uselist=False, viewonly=True)
+
+    __table_args__ = (
+        # Catalog sort orders, id as the keyset tie-breaker
+        Index("ix_products_active_price_cents_id", "active", "price_cents", "id"),
+        Index("ix_products_active_kind_price_cents_id", "active", "kind", "price_cents", "id"),
+        Index("ix_products_active_created_at_id", "active", "created_at", "id"),
+        Index("ix_products_active_name_id", "active", "name", "id"),
+    )
 
 
 class ProductAttributes(Base):
@@ -168,6 +185,97 @@ class NurseryInventory(Base):
     )
 
 
+class ProductAvailability(Base):
+    """Nursery stock summed per (city, commune, product) for "in stock near" filtering.
+
+    Maintained with deltas by app/services/inventory_service.py; city and
+    commune are stored normalised (see inventory_service.location_key).
+    """
+
+    __tablename__ = "product_availability"
+
+    id = Column(Integer, primary_key=True, index=True)
+    city = Column(String(100), nullable=False)
+    commune = Column(String(100), default="", nullable=False)  # "" for nurseries without a commune
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("city", "commune", "product_id", name="uq_product_availability_location_product"),
+    )
+
+
+class ProductCooccurrence(Base):
+    """How many orders contained both products; one row per direction (see app/services/related_products.py)."""
+
+    __tablename__ = "product_cooccurrence"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    related_product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    orders = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("product_id", "related_product_id", name="uq_product_cooccurrence_pair"),
+    )
+
+
+class ProductRecommendation(Base):
+    """A product's top-K most frequently co-bought products, rank 1 first."""
+
+    __tablename__ = "product_recommendations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    rank = Column(Integer, nullable=False)
+    related_product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    orders = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("product_id", "rank", name="uq_product_recommendation_rank"),
+    )
+
+
+class ProductPopularity(Base):
+    """Units sold in confirmed orders, with and without time decay (see app/services/popularity.py)."""
+
+    __tablename__ = "product_popularity"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    units = Column(Integer, default=0, nullable=False)  # all time, undecayed
+    score = Column(Float, default=0.0, nullable=False)  # decayed units, scaled to popularity.EPOCH
+    last_sold_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Incremental catalog engine refresh
+        Index("ix_product_popularity_updated_at", "updated_at"),
+    )
+
+
+class ProductImageHash(Base):
+    """Perceptual hash of a reference photo of a product (see app/services/catalog_images.py)."""
+
+    __tablename__ = "product_image_hashes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    hash = Column(BigInteger, nullable=False)  # 64-bit pHash, stored signed
+    filename = Column(String(255), nullable=True)  # as uploaded, to tell an admin which photo it was
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class JobWatermark(Base):
+    """How far an incremental batch job has got, e.g. the last order id it processed."""
+
+    __tablename__ = "job_watermarks"
+
+    name = Column(String(100), primary_key=True)
+    last_id = Column(Integer, default=0, nullable=False)
+    last_at = Column(DateTime, nullable=True)  # for jobs that walk (timestamp, id)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
 class Order(Base):
     __tablename__ = "orders"
 
@@ -179,6 +287,7 @@ class Order(Base):
     tax_cents = Column(Integer, default=0, nullable=False)
     total_cents = Column(Integer, nullable=False)
     currency = Column(String(3), default="USD", nullable=False)
+    confirmed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -187,6 +296,15 @@ class Order(Base):
     shipping_address = relationship("Address", back_populates="order", uselist=False, cascade="all, delete-orphan", foreign_keys="Address.order_id")
     fulfillments = relationship("OrderFulfillment", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of order listings (newest first)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Popularity job: orders confirmed since its watermark
+        Index("ix_orders_confirmed_at_id", "confirmed_at", "id"),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -247,3 +365,20 @@ class OrderFulfillmentItem(Base):
 
     fulfillment = relationship("OrderFulfillment", back_populates="items")
     order_item = relationship("OrderItem")
+
+
+class PricingRule(Base):
+    """Shipping charge or tax rate for orders to a destination (see app/services/pricing.py)."""
+
+    __tablename__ = "pricing_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(Enum(PricingRuleKind), nullable=False)
+    country = Column(String(100), nullable=True)  # None matches every country
+    commune = Column(String(100), nullable=True)  # None matches every commune
+    min_subtotal_cents = Column(Integer, default=0, nullable=False)  # Applies from this subtotal up
+    amount_cents = Column(Integer, nullable=True)  # Shipping charge
+    rate_bps = Column(Integer, nullable=True)  # Tax rate in basis points of the subtotal
+    active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -1,15 +1,27 @@
 from __future__ import annotations
 
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
 
+# Synchronous engine, used by alembic and the CLI scripts (create_admin.py, check_users.py).
 engine = create_engine(settings.database_url, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, class_=Session)
 
+# Async engine used by the request handlers. The psycopg (v3) dialect serves both
+# the sync and the async engine from the same ``postgresql+psycopg://`` URL.
+async_engine = create_async_engine(settings.async_database_url, pool_pre_ping=True)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    class_=AsyncSession,
+)
+
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
@@ -19,5 +31,6 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
-
-
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
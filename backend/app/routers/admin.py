@@ -2,48 +2,89 @@
 Admin-only endpoints for managing nurseries, inventory, and products.
 """
 
-from typing import List, Optional
-
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from app.core.dependencies import get_current_admin_user
-from app.db.models import Inventory, Nursery, NurseryInventory, Product, ProductAttributes, User
-from app.db.session import get_db
+from app.db.models import (
+    Inventory,
+    Nursery,
+    NurseryInventory,
+    PricingRule,
+    PricingRuleKind,
+    Product,
+    ProductAttributes,
+    ProductImageHash,
+    User,
+)
+from app.db.session import get_async_db
 from app.schemas.nursery import (
+    BulkInventoryRequest,
+    BulkInventoryResponse,
+    BulkInventoryRow,
+    BulkInventoryRowError,
     CreateNurseryRequest,
     NurseryInventoryResponse,
     NurseryResponse,
     UpdateNurseryRequest,
     UpsertNurseryInventoryRequest,
 )
+from app.schemas.pricing import CreatePricingRuleRequest, PricingRuleResponse, UpdatePricingRuleRequest
 from app.schemas.product import (
+    PRODUCT_RESPONSE_OPTIONS,
     CreateProductRequest,
+    ProductImageResponse,
     ProductListResponse,
     ProductResponse,
     UpdateProductRequest,
 )
+from app.services import catalog_cache, catalog_images, inventory_service, pricing
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 
-def _recompute_global_inventory(db: Session, product_id: int) -> None:
-    """Recompute global inventory quantity from nursery inventories."""
-    total = (
-        db.query(func.sum(NurseryInventory.quantity))
-        .filter(NurseryInventory.product_id == product_id)
-        .scalar()
-        or 0
+def _nursery_response(nursery: Nursery) -> NurseryResponse:
+    return NurseryResponse(
+        id=nursery.id,
+        internal_name=nursery.internal_name,
+        city=nursery.city,
+        commune=nursery.commune,
+        latitude=nursery.latitude,
+        longitude=nursery.longitude,
+        created_at=nursery.created_at.isoformat(),
+        updated_at=nursery.updated_at.isoformat(),
     )
 
-    inventory = db.query(Inventory).filter(Inventory.product_id == product_id).first()
-    if inventory:
-        inventory.quantity = total
-    else:
-        inventory = Inventory(product_id=product_id, quantity=total)
-        db.add(inventory)
-    db.flush()
+
+def _inventory_response(item: NurseryInventory, product_name: Optional[str]) -> NurseryInventoryResponse:
+    return NurseryInventoryResponse(
+        id=item.id,
+        nursery_id=item.nursery_id,
+        product_id=item.product_id,
+        quantity=item.quantity,
+        updated_at=item.updated_at.isoformat(),
+        product_name=product_name,
+    )
+
+
+async def _get_product(db: AsyncSession, product_id: int) -> Optional[Product]:
+    """Load a product with the relationships ProductResponse needs."""
+    return await db.scalar(
+        select(Product)
+        .options(*PRODUCT_RESPONSE_OPTIONS)
+        .where(Product.id == product_id)
+        .execution_options(populate_existing=True)
+    )
 
 
 # Nursery endpoints
@@ -51,7 +92,7 @@ def _recompute_global_inventory(db: Session, product_id: int) -> None:
 async def create_nursery(
     request: CreateNurseryRequest,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Create a new nursery (admin only)."""
     nursery = Nursery(
@@ -62,32 +103,32 @@ async def create_nursery(
         longitude=request.longitude,
     )
     db.add(nursery)
-    db.commit()
-    db.refresh(nursery)
-    return NurseryResponse.model_validate(nursery)
+    await db.commit()
+    await db.refresh(nursery)
+    return _nursery_response(nursery)
 
 
 @router.get("/nurseries", response_model=List[NurseryResponse])
 async def list_nurseries(
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """List all nurseries (admin only)."""
-    nurseries = db.query(Nursery).order_by(Nursery.created_at.desc()).all()
-    return [NurseryResponse.model_validate(n) for n in nurseries]
+    nurseries = (await db.scalars(select(Nursery).order_by(Nursery.created_at.desc()))).all()
+    return [_nursery_response(n) for n in nurseries]
 
 
 @router.get("/nurseries/{nursery_id}", response_model=NurseryResponse)
 async def get_nursery(
     nursery_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get a single nursery by ID (admin only)."""
-    nursery = db.query(Nursery).filter(Nursery.id == nursery_id).first()
+    nursery = await db.scalar(select(Nursery).where(Nursery.id == nursery_id))
     if not nursery:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nursery not found")
-    return NurseryResponse.model_validate(nursery)
+    return _nursery_response(nursery)
 
 
 @router.patch("/nurseries/{nursery_id}", response_model=NurseryResponse)
@@ -95,12 +136,13 @@ async def update_nursery(
     nursery_id: int,
     request: UpdateNurseryRequest,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Update a nursery (admin only)."""
-    nursery = db.query(Nursery).filter(Nursery.id == nursery_id).first()
+    nursery = await db.scalar(select(Nursery).where(Nursery.id == nursery_id))
     if not nursery:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nursery not found")
+    old_location = inventory_service.location_key(nursery.city, nursery.commune)
 
     if request.internal_name is not None:
         nursery.internal_name = request.internal_name
@@ -113,24 +155,39 @@ async def update_nursery(
     if request.longitude is not None:
         nursery.longitude = request.longitude
 
-    db.commit()
-    db.refresh(nursery)
-    return NurseryResponse.model_validate(nursery)
+    # Relocating a nursery moves its stock in the in_stock_near index.
+    await inventory_service.move_nursery_stock(
+        db, nursery_id, old_location, inventory_service.location_key(nursery.city, nursery.commune)
+    )
+    await db.commit()
+    await db.refresh(nursery)
+    return _nursery_response(nursery)
 
 
 @router.delete("/nurseries/{nursery_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_nursery(
     nursery_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Delete a nursery (admin only)."""
-    nursery = db.query(Nursery).filter(Nursery.id == nursery_id).first()
+    nursery = await db.scalar(select(Nursery).where(Nursery.id == nursery_id))
     if not nursery:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nursery not found")
     
-    db.delete(nursery)
-    db.commit()
+    # Its stock goes with it (cascade), so take it out of the global and local totals.
+    stock = await db.execute(
+        select(NurseryInventory.product_id, NurseryInventory.quantity).where(
+            NurseryInventory.nursery_id == nursery_id
+        )
+    )
+    deltas = {(nursery_id, product_id): -quantity for product_id, quantity in stock}
+    location = inventory_service.location_key(nursery.city, nursery.commune)
+
+    await db.delete(nursery)
+    await db.flush()
+    await inventory_service.apply_stock_deltas(db, deltas, {nursery_id: location})
+    await db.commit()
 
 
 # Nursery inventory endpoints
@@ -143,76 +200,164 @@ async def upsert_nursery_inventory(
     product_id: int,
     request: UpsertNurseryInventoryRequest,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Create or update nursery inventory quantity (admin only). Recomputes global inventory."""
-    # Verify nursery exists
-    nursery = db.query(Nursery).filter(Nursery.id == nursery_id).first()
+    """Create or update nursery inventory quantity (admin only). Applies the change to global and local totals."""
+    # Verify nursery exists, locking it against other stock writes (see inventory_service.lock_nurseries)
+    nursery = await db.scalar(select(Nursery).where(Nursery.id == nursery_id).with_for_update(key_share=True))
     if not nursery:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nursery not found")
 
     # Verify product exists
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.scalar(select(Product).where(Product.id == product_id))
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
 
-    # Upsert nursery inventory
-    nursery_inventory = (
-        db.query(NurseryInventory)
-        .filter(NurseryInventory.nursery_id == nursery_id, NurseryInventory.product_id == product_id)
-        .first()
+    # Upsert nursery inventory; the nursery lock keeps the delta exact under concurrent writes
+    nursery_inventory = await db.scalar(
+        select(NurseryInventory)
+        .where(NurseryInventory.nursery_id == nursery_id, NurseryInventory.product_id == product_id)
+        .with_for_update()
     )
 
     if nursery_inventory:
+        delta = request.quantity - nursery_inventory.quantity
         nursery_inventory.quantity = request.quantity
     else:
+        delta = request.quantity
         nursery_inventory = NurseryInventory(
             nursery_id=nursery_id, product_id=product_id, quantity=request.quantity
         )
         db.add(nursery_inventory)
 
-    db.flush()
-
-    # Recompute global inventory
-    _recompute_global_inventory(db, product_id)
+    await db.flush()
+    await inventory_service.apply_stock_deltas(
+        db,
+        {(nursery_id, product_id): delta},
+        {nursery_id: inventory_service.location_key(nursery.city, nursery.commune)},
+    )
 
-    db.commit()
-    db.refresh(nursery_inventory)
+    await db.commit()
+    await db.refresh(nursery_inventory)
 
-    # Populate product name for response
-    response = NurseryInventoryResponse.model_validate(nursery_inventory)
-    response.product_name = product.name
-    return response
+    return _inventory_response(nursery_inventory, product.name)
 
 
 @router.get("/nurseries/{nursery_id}/inventory", response_model=List[NurseryInventoryResponse])
 async def list_nursery_inventory(
     nursery_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """List all inventory for a nursery (admin only)."""
-    nursery = db.query(Nursery).filter(Nursery.id == nursery_id).first()
+    nursery = await db.scalar(select(Nursery).where(Nursery.id == nursery_id))
     if not nursery:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nursery not found")
 
     inventory_items = (
-        db.query(NurseryInventory)
-        .filter(NurseryInventory.nursery_id == nursery_id)
-        .order_by(NurseryInventory.updated_at.desc())
-        .all()
+        await db.scalars(
+            select(NurseryInventory)
+            .options(selectinload(NurseryInventory.product))
+            .where(NurseryInventory.nursery_id == nursery_id)
+            .order_by(NurseryInventory.updated_at.desc())
+        )
+    ).all()
+
+    return [_inventory_response(item, item.product.name if item.product else None) for item in inventory_items]
+
+
+def _parse_bulk_rows(body: bytes, content_type: str) -> Tuple[Dict[int, BulkInventoryRow], List[BulkInventoryRowError]]:
+    """Parse a JSON ({"rows": [...]}) or CSV (nursery_id,product_id,quantity) feed.
+
+    Returns valid rows by 1-based position and the errors of the others.
+    """
+    if content_type.startswith("text/csv"):
+        try:
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="CSV must be UTF-8")
+        missing = {"nursery_id", "product_id", "quantity"} - set(reader.fieldnames or [])
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"CSV is missing columns: {', '.join(sorted(missing))}",
+            )
+        raw_rows = list(reader)
+    else:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid JSON")
+        raw_rows = payload.get("rows") if isinstance(payload, dict) else None
+        if not isinstance(raw_rows, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Expected {"rows": [...]}')
+
+    rows: Dict[int, BulkInventoryRow] = {}
+    errors: List[BulkInventoryRowError] = []
+    for position, raw in enumerate(raw_rows, start=1):
+        try:
+            rows[position] = BulkInventoryRow.model_validate(raw)
+        except ValidationError as exc:
+            message = "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in exc.errors())
+            errors.append(BulkInventoryRowError(row=position, error=message))
+    return rows, errors
+
+
+@router.post(
+    "/nurseries/inventory/bulk",
+    response_model=BulkInventoryResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {"schema": BulkInventoryRequest.model_json_schema()},
+                "text/csv": {"schema": {"type": "string"}},
+            },
+            "required": True,
+        }
+    },
+)
+async def bulk_upsert_nursery_inventory(
+    http_request: Request,
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Set many nursery inventory quantities at once from JSON or CSV (admin only).
+
+    Valid rows are applied in one statement and global inventory is updated once
+    per affected product; invalid rows are skipped and reported by position.
+    """
+    rows, errors = _parse_bulk_rows(await http_request.body(), http_request.headers.get("content-type", ""))
+
+    nursery_ids = {row.nursery_id for row in rows.values()}
+    product_ids = {row.product_id for row in rows.values()}
+    known_nurseries = set(await db.scalars(select(Nursery.id).where(Nursery.id.in_(nursery_ids))))
+    known_products = set(await db.scalars(select(Product.id).where(Product.id.in_(product_ids))))
+
+    quantities: Dict[Tuple[int, int], int] = {}
+    seen: Dict[Tuple[int, int], int] = {}
+    for position, row in rows.items():
+        cell = (row.nursery_id, row.product_id)
+        if row.nursery_id not in known_nurseries:
+            error = f"Nursery {row.nursery_id} not found"
+        elif row.product_id not in known_products:
+            error = f"Product {row.product_id} not found"
+        elif cell in seen:
+            error = f"Duplicate of row {seen[cell]}"
+        else:
+            seen[cell] = position
+            quantities[cell] = row.quantity
+            continue
+        errors.append(BulkInventoryRowError(row=position, error=error))
+
+    affected_products = await inventory_service.upsert_stock(db, quantities)
+    await db.commit()
+
+    return BulkInventoryResponse(
+        applied=len(quantities),
+        affected_products=affected_products,
+        errors=sorted(errors, key=lambda e: e.row),
     )
 
-    # Populate product names
-    result = []
-    for item in inventory_items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        response = NurseryInventoryResponse.model_validate(item)
-        response.product_name = product.name if product else None
-        result.append(response)
-
-    return result
-
 
 # Product admin endpoints
 @router.get("/products", response_model=ProductListResponse)
@@ -220,14 +365,20 @@ async def list_products_admin(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """List all products including inactive (admin only)."""
-    query = db.query(Product)
-
-    total = query.count()
+    total = await db.scalar(select(func.count(Product.id)))
     offset = (page - 1) * page_size
-    products = query.order_by(Product.created_at.desc()).offset(offset).limit(page_size).all()
+    products = (
+        await db.scalars(
+            select(Product)
+            .options(*PRODUCT_RESPONSE_OPTIONS)
+            .order_by(Product.created_at.desc())
+            .offset(offset)
+            .limit(page_size)
+        )
+    ).all()
 
     return ProductListResponse(
         items=[ProductResponse.model_validate(p) for p in products],
@@ -241,11 +392,11 @@ async def list_products_admin(
 async def create_product(
     request: CreateProductRequest,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Create a new product (admin only). Defaults to active=False until ready for publishing."""
     # Check if slug already exists
-    existing = db.query(Product).filter(Product.slug == request.slug).first()
+    existing = await db.scalar(select(Product).where(Product.slug == request.slug))
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=f"Product with slug '{request.slug}' already exists"
@@ -261,7 +412,7 @@ async def create_product(
         active=request.active,
     )
     db.add(product)
-    db.flush()
+    await db.flush()
 
     # Create product attributes if provided
     if request.attributes:
@@ -278,8 +429,9 @@ async def create_product(
     inventory = Inventory(product_id=product.id, quantity=0)
     db.add(inventory)
 
-    db.commit()
-    db.refresh(product)
+    catalog_cache.invalidate_on_commit(db, listings=True)
+    await db.commit()
+    product = await _get_product(db, product.id)
     return ProductResponse.model_validate(product)
 
 
@@ -288,10 +440,10 @@ async def update_product(
     product_id: int,
     request: UpdateProductRequest,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Update a product (admin only). Can activate/publish products."""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.scalar(select(Product).where(Product.id == product_id))
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
 
@@ -299,7 +451,7 @@ async def update_product(
     if request.slug is not None:
         # Check if slug is being changed and if new slug exists
         if request.slug != product.slug:
-            existing = db.query(Product).filter(Product.slug == request.slug).first()
+            existing = await db.scalar(select(Product).where(Product.slug == request.slug))
             if existing:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -321,7 +473,7 @@ async def update_product(
 
     # Update attributes if provided
     if request.attributes is not None:
-        attributes = db.query(ProductAttributes).filter(ProductAttributes.product_id == product_id).first()
+        attributes = await db.scalar(select(ProductAttributes).where(ProductAttributes.product_id == product_id))
         if attributes:
             if request.attributes.plant_environment is not None:
                 attributes.plant_environment = request.attributes.plant_environment
@@ -342,8 +494,175 @@ async def update_product(
             )
             db.add(attributes)
 
-    db.commit()
-    db.refresh(product)
+    # Attribute edits leave the products row untouched; bump it so catalog ETags change.
+    product.updated_at = datetime.utcnow()
+    catalog_cache.invalidate_on_commit(db, product_ids=[product.id], listings=True)
+    await db.commit()
+    product = await _get_product(db, product.id)
     return ProductResponse.model_validate(product)
 
 
+# Product photo endpoints (app/services/catalog_images.py)
+def _image_response(image: ProductImageHash) -> ProductImageResponse:
+    return ProductImageResponse(
+        id=image.id,
+        product_id=image.product_id,
+        hash=f"{catalog_images.to_unsigned(image.hash):016x}",
+        filename=image.filename,
+        created_at=image.created_at,
+    )
+
+
+@router.post(
+    "/products/{product_id}/images", response_model=ProductImageResponse, status_code=status.HTTP_201_CREATED
+)
+async def add_product_image(
+    product_id: int,
+    image: UploadFile = File(...),
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Register a reference photo of a product for /catalog/products/similar-image (admin only).
+
+    Only the photo's perceptual hash is stored; register each photo customers
+    are likely to share (the catalog shot, social posts).
+    """
+    if await db.scalar(select(Product.id).where(Product.id == product_id)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    try:
+        data = await image.read(catalog_images.MAX_IMAGE_BYTES + 1)
+        value = await run_in_threadpool(catalog_images.image_hash, data)
+    except catalog_images.UnreadableImage as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unreadable image: {exc}")
+
+    row = ProductImageHash(product_id=product_id, hash=catalog_images.to_signed(value), filename=image.filename)
+    db.add(row)
+    await db.commit()
+    await db.refresh(row)
+    catalog_images.index.invalidate()
+    return _image_response(row)
+
+
+@router.get("/products/{product_id}/images", response_model=List[ProductImageResponse])
+async def list_product_images(
+    product_id: int,
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Reference photos registered for a product, oldest first (admin only)."""
+    images = (
+        await db.scalars(
+            select(ProductImageHash).where(ProductImageHash.product_id == product_id).order_by(ProductImageHash.id)
+        )
+    ).all()
+    return [_image_response(image) for image in images]
+
+
+@router.delete("/products/{product_id}/images/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_product_image(
+    product_id: int,
+    image_id: int,
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Stop matching a reference photo (admin only)."""
+    image = await db.scalar(
+        select(ProductImageHash).where(ProductImageHash.id == image_id, ProductImageHash.product_id == product_id)
+    )
+    if not image:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product image not found")
+    await db.delete(image)
+    await db.commit()
+    catalog_images.index.invalidate()
+
+
+# Pricing rule endpoints
+def _pricing_rule_response(rule: PricingRule) -> PricingRuleResponse:
+    return PricingRuleResponse(
+        id=rule.id,
+        kind=rule.kind,
+        country=rule.country,
+        commune=rule.commune,
+        min_subtotal_cents=rule.min_subtotal_cents,
+        amount_cents=rule.amount_cents,
+        rate_bps=rule.rate_bps,
+        active=rule.active,
+        created_at=rule.created_at.isoformat(),
+        updated_at=rule.updated_at.isoformat(),
+    )
+
+
+def _check_pricing_rule(rule: PricingRule) -> None:
+    if rule.kind == PricingRuleKind.SHIPPING and rule.amount_cents is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Shipping rules need amount_cents")
+    if rule.kind == PricingRuleKind.TAX and rule.rate_bps is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tax rules need rate_bps")
+
+
+@router.get("/pricing-rules", response_model=List[PricingRuleResponse])
+async def list_pricing_rules(
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """List shipping and tax rules, inactive ones included (admin only)."""
+    rules = (await db.scalars(select(PricingRule).order_by(PricingRule.kind, PricingRule.id))).all()
+    return [_pricing_rule_response(rule) for rule in rules]
+
+
+@router.post("/pricing-rules", response_model=PricingRuleResponse, status_code=status.HTTP_201_CREATED)
+async def create_pricing_rule(
+    request: CreatePricingRuleRequest,
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Create a shipping or tax rule (admin only). Quotes use it immediately."""
+    rule = PricingRule(**request.model_dump())
+    _check_pricing_rule(rule)
+    db.add(rule)
+    await db.commit()
+    await db.refresh(rule)
+    pricing.rules.invalidate()
+    return _pricing_rule_response(rule)
+
+
+@router.patch("/pricing-rules/{rule_id}", response_model=PricingRuleResponse)
+async def update_pricing_rule(
+    rule_id: int,
+    request: UpdatePricingRuleRequest,
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Update a pricing rule (admin only)."""
+    rule = await db.scalar(select(PricingRule).where(PricingRule.id == rule_id))
+    if not rule:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pricing rule not found")
+
+    for field, value in request.model_dump(exclude_unset=True).items():
+        setattr(rule, field, value)
+    _check_pricing_rule(rule)
+
+    await db.commit()
+    await db.refresh(rule)
+    pricing.rules.invalidate()
+    return _pricing_rule_response(rule)
+
+
+@router.delete("/pricing-rules/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_pricing_rule(
+    rule_id: int,
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Delete a pricing rule (admin only)."""
+    rule = await db.scalar(select(PricingRule).where(PricingRule.id == rule_id))
+    if not rule:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pricing rule not found")
+    await db.delete(rule)
+    await db.commit()
+    pricing.rules.invalidate()
+
+
+@router.get("/catalog-cache")
+async def get_catalog_cache_stats(current_user: User = Depends(get_current_admin_user)):
+    """Catalog read cache size and hit/miss/eviction/invalidation counters (admin only)."""
+    return catalog_cache.cache.stats()
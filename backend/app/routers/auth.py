@@ -3,21 +3,23 @@ Authentication endpoints.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
 from app.core.dependencies import get_current_user
 from app.core.security import create_access_token, get_password_hash, verify_password, verify_google_token, verify_facebook_token
 from app.db.models import OAuthAccount, OAuthProvider, User, UserRole
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.schemas.auth import AdminLoginRequest, OAuthTokenRequest, TokenResponse, UserResponse
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login", response_model=TokenResponse)
-async def admin_login(request: AdminLoginRequest, db: Session = Depends(get_db)):
+async def admin_login(request: AdminLoginRequest, db: AsyncSession = Depends(get_async_db)):
     """Admin email/password login."""
-    user = db.query(User).filter(User.email == request.email).first()
+    user = await db.scalar(select(User).where(User.email == request.email))
     if not user or user.role not in [UserRole.ADMIN, UserRole.SUPER_ADMIN]:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -33,7 +35,7 @@ async def admin_login(request: AdminLoginRequest, db: Session = Depends(get_db))
 
 
 @router.post("/oauth/google", response_model=TokenResponse)
-async def oauth_google(request: OAuthTokenRequest, db: Session = Depends(get_db)):
+async def oauth_google(request: OAuthTokenRequest, db: AsyncSession = Depends(get_async_db)):
     """Exchange Google OAuth token for backend JWT."""
     id_info = verify_google_token(request.provider_token)
     if not id_info:
@@ -47,16 +49,20 @@ async def oauth_google(request: OAuthTokenRequest, db: Session = Depends(get_db)
     name = id_info.get("name")
     
     # Find or create user
-    oauth_account = db.query(OAuthAccount).filter(
-        OAuthAccount.provider == OAuthProvider.GOOGLE,
-        OAuthAccount.provider_account_id == provider_account_id
-    ).first()
+    oauth_account = await db.scalar(
+        select(OAuthAccount)
+        .options(joinedload(OAuthAccount.user))
+        .where(
+            OAuthAccount.provider == OAuthProvider.GOOGLE,
+            OAuthAccount.provider_account_id == provider_account_id,
+        )
+    )
     
     if oauth_account:
         user = oauth_account.user
     else:
         # Check if user with this email already exists
-        user = db.query(User).filter(User.email == email).first()
+        user = await db.scalar(select(User).where(User.email == email))
         if not user:
             # Create new user
             user = User(
@@ -65,7 +71,7 @@ async def oauth_google(request: OAuthTokenRequest, db: Session = Depends(get_db)
                 role=UserRole.CUSTOMER
             )
             db.add(user)
-            db.flush()
+            await db.flush()
         
         # Link OAuth account
         oauth_account = OAuthAccount(
@@ -74,15 +80,15 @@ async def oauth_google(request: OAuthTokenRequest, db: Session = Depends(get_db)
             provider_account_id=provider_account_id
         )
         db.add(oauth_account)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     
     access_token = create_access_token(data={"sub": user.id, "role": user.role.value})
     return TokenResponse(access_token=access_token)
 
 
 @router.post("/oauth/facebook", response_model=TokenResponse)
-async def oauth_facebook(request: OAuthTokenRequest, db: Session = Depends(get_db)):
+async def oauth_facebook(request: OAuthTokenRequest, db: AsyncSession = Depends(get_async_db)):
     """Exchange Facebook OAuth token for backend JWT."""
     user_data = verify_facebook_token(request.provider_token)
     if not user_data:
@@ -96,16 +102,20 @@ async def oauth_facebook(request: OAuthTokenRequest, db: Session = Depends(get_d
     name = user_data.get("name")
     
     # Find or create user
-    oauth_account = db.query(OAuthAccount).filter(
-        OAuthAccount.provider == OAuthProvider.FACEBOOK,
-        OAuthAccount.provider_account_id == provider_account_id
-    ).first()
+    oauth_account = await db.scalar(
+        select(OAuthAccount)
+        .options(joinedload(OAuthAccount.user))
+        .where(
+            OAuthAccount.provider == OAuthProvider.FACEBOOK,
+            OAuthAccount.provider_account_id == provider_account_id,
+        )
+    )
     
     if oauth_account:
         user = oauth_account.user
     else:
         # Check if user with this email already exists
-        user = db.query(User).filter(User.email == email).first()
+        user = await db.scalar(select(User).where(User.email == email))
         if not user:
             # Create new user
             user = User(
@@ -114,7 +124,7 @@ async def oauth_facebook(request: OAuthTokenRequest, db: Session = Depends(get_d
                 role=UserRole.CUSTOMER
             )
             db.add(user)
-            db.flush()
+            await db.flush()
         
         # Link OAuth account
         oauth_account = OAuthAccount(
@@ -123,8 +133,8 @@ async def oauth_facebook(request: OAuthTokenRequest, db: Session = Depends(get_d
             provider_account_id=provider_account_id
         )
         db.add(oauth_account)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     
     access_token = create_access_token(data={"sub": user.id, "role": user.role.value})
     return TokenResponse(access_token=access_token)
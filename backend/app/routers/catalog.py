@@ -2,66 +2,522 @@
 Public catalog endpoints.
 """
 
-from typing import Optional
+from datetime import datetime
+from typing import Dict, List, Literal, NamedTuple, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import PlantEnvironment, Product, ProductAttributes, ProductKind
-from app.db.session import get_db
-from app.schemas.product import ProductListResponse, ProductResponse
+from app.core import http_cache
+from app.core.config import settings
+from app.db.models import PlantEnvironment, Product, ProductAttributes, ProductKind, ProductRecommendation
+from app.db.session import get_async_db
+from app.schemas.product import (
+    PRODUCT_RESPONSE_OPTIONS,
+    FacetCount,
+    ImageMatch,
+    ProductListResponse,
+    ProductLookupRequest,
+    ProductLookupResponse,
+    ProductRefs,
+    ProductResponse,
+    ProductSuggestion,
+)
+from app.services import (
+    catalog_cache,
+    catalog_engine,
+    catalog_facets,
+    catalog_images,
+    catalog_pagination,
+    catalog_search,
+    catalog_semantic,
+    catalog_suggest,
+    inventory_service,
+)
 
 router = APIRouter(prefix="/catalog", tags=["catalog"])
 
 
+class _CachedResponse(NamedTuple):
+    body: Union[BaseModel, List[BaseModel]]
+    headers: Dict[str, str]  # ETag, Last-Modified, Cache-Control
+
+
+class _ListingParams(NamedTuple):
+    kind: Optional[ProductKind]
+    plant_environment: Optional[PlantEnvironment]
+    color: Optional[str]
+    size: Optional[str]
+    min_price: Optional[int]
+    max_price: Optional[int]
+    near: Optional[Tuple[str, Optional[str]]]  # (city, commune or None), normalised
+    q: Optional[str]
+    semantic: bool
+    sort: Optional[str]
+    page: int
+    page_size: int
+    cursor: Optional[str]
+    include_total: bool
+    facets: bool
+
+
+class _ListingPage(NamedTuple):
+    items: List[ProductResponse]
+    stamps: List[Tuple[int, datetime]]
+    total: Optional[int]
+    total_is_estimate: bool
+    next_cursor: Optional[str]
+    facet_rows: Optional[Tuple[catalog_facets.FacetRow, ...]]
+
+
+def _product_stamp(product: Product) -> datetime:
+    """When anything shown in the product's ProductResponse last changed."""
+    if product.inventory is not None:
+        return max(product.updated_at, product.inventory.updated_at)
+    return product.updated_at
+
+
+def _parse_near(value: str) -> Tuple[str, Optional[str]]:
+    """(city, commune or None) from "city" or "city/commune", normalised like ProductAvailability."""
+    city, _, commune = value.partition("/")
+    city, commune = inventory_service.location_key(city, commune)
+    if not city or "/" in commune:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail='in_stock_near must be "city" or "city/commune"'
+        )
+    return city, commune or None
+
+
+def _respond(request: Request, response: Response, cached: _CachedResponse, hit: bool):
+    """Return a bodyless 304 if the client's copy is current, else the body with its headers."""
+    headers = {**cached.headers, "X-Cache": "HIT" if hit else "MISS"}
+    if http_cache.is_not_modified(request, cached.headers):
+        return http_cache.not_modified(headers)
+    response.headers.update(headers)
+    return cached.body
+
+
 @router.get("/products", response_model=ProductListResponse)
 async def list_products(
+    request: Request,
+    response: Response,
     kind: Optional[ProductKind] = Query(None, description="Filter by product kind"),
     plant_environment: Optional[PlantEnvironment] = Query(None, description="Filter by plant environment"),
-    q: Optional[str] = Query(None, description="Search query"),
+    color: Optional[str] = Query(None, description="Filter by color attribute"),
+    size: Optional[str] = Query(None, description="Filter by size attribute"),
+    min_price: Optional[int] = Query(None, ge=0, description="Minimum price in cents"),
+    max_price: Optional[int] = Query(None, ge=0, description="Maximum price in cents"),
+    in_stock_near: Optional[str] = Query(
+        None, description='"city" or "city/commune": only products a nursery there has in stock'
+    ),
+    q: Optional[str] = Query(None, description="Search query; every word matches as a prefix"),
+    semantic: bool = Query(
+        False, description="Match q by the words and word pieces it shares with products, best first"
+    ),
+    sort: Optional[Literal["price", "newest", "name", "popular"]] = Query(
+        None, description="Sort order; defaults to relevance when searching, else id"
+    ),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces page"),
+    include_total: bool = Query(True, description="Set to false to skip counting matches"),
+    facets: bool = Query(False, description="Also return counts per kind, plant_environment, color and size"),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """List products with optional filters."""
-    query = db.query(Product).filter(Product.active == True)
+    """List products with optional filters.
+
+    Listings are ordered by sort (price and name ascending; newest and
+    popular, recent units sold in confirmed orders, first), by relevance
+    when searching without a sort, and by id otherwise. Every order but
+    relevance returns a next_cursor for keyset paging. Totals above
+    CATALOG_EXACT_COUNT_LIMIT may be estimates (total_is_estimate) on the
+    SQL backend; CATALOG_BACKEND=memory answers from the in-process
+    catalog engine with exact totals. With facets=true the response carries
+    per-value counts for each facet, each computed with the other facets'
+    filters applied. in_stock_near is answered from the ProductAvailability
+    index kept by inventory_service, not from joins over nursery stock, and
+    sort=popular from the product_popularity rollup, not from order items.
+    semantic=true ranks products by similarity to q with the
+    catalog_semantic vector index instead of matching every word; like
+    relevance, that order is paged with page, and an explicit sort keeps the
+    matches but reorders them.
+
+    Served from the catalog cache when possible; honours If-None-Match with
+    a 304.
+    """
+    if cursor:
+        if q and not sort:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Search results ranked by relevance are paged with page, not cursor",
+            )
+        try:
+            catalog_pagination.decode_cursor(cursor, sort)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    near = _parse_near(in_stock_near) if in_stock_near else None
+    near_key = "/".join(part for part in near if part) if near else None
+    if q and semantic:
+        search = " ".join(catalog_semantic.query_words(q))
+    else:
+        search = " ".join(catalog_search.search_terms(q)) if q else None
+    semantic = bool(q) and semantic
+    selected = {
+        "kind": kind.value if kind else None,
+        "plant_environment": plant_environment.value if plant_environment else None,
+        "color": color,
+        "size": size,
+    }
+    key = catalog_cache.listing_key(
+        selected["kind"], selected["plant_environment"], search, page, page_size, cursor, include_total,
+        color=color, size=size, facets=facets, sort=sort, min_price=min_price, max_price=max_price, near=near_key,
+        semantic=semantic,
+    )
+    cached = catalog_cache.cache.get(key)
+    if cached is not None:
+        return _respond(request, response, cached, hit=True)
+    generation = catalog_cache.cache.generation
 
-    if kind:
-        query = query.filter(Product.kind == kind)
+    params = _ListingParams(
+        kind, plant_environment, color, size, min_price, max_price, near, q, semantic, sort, page, page_size,
+        cursor, include_total, facets,
+    )
+    if settings.catalog_backend == "memory":
+        listing = await _engine_page(db, params)
+    else:
+        listing = await _sql_page(db, params, search, near_key)
+
+    facet_counts = None
+    if listing.facet_rows is not None:
+        facet_counts = {
+            facet: [FacetCount(value=value, count=count) for value, count in counts]
+            for facet, counts in catalog_facets.facet_counts(listing.facet_rows, selected).items()
+        }
+
+    cached = _CachedResponse(
+        body=ProductListResponse(
+            items=listing.items,
+            total=listing.total,
+            page=page,
+            page_size=page_size,
+            total_is_estimate=listing.total_is_estimate,
+            next_cursor=listing.next_cursor,
+            facets=facet_counts,
+        ),
+        headers=http_cache.validator_headers(
+            http_cache.make_etag(key, listing.total, listing.stamps, facet_counts),
+            # No Last-Modified: products leaving the page or changing places touch no stamp left on it
+            None,
+            settings.catalog_list_max_age_seconds,
+        ),
+    )
+    catalog_cache.cache.put(key, cached, [product_id for product_id, _ in listing.stamps], generation)
+    return _respond(request, response, cached, hit=False)
+
+
+async def _sql_page(
+    db: AsyncSession, params: _ListingParams, search: Optional[str], near_key: Optional[str]
+) -> _ListingPage:
+    query = select(Product).where(Product.active == True)
+
+    if params.semantic:
+        # Most similar first
+        query = catalog_semantic.apply_ranking(query, await _semantic_matches(db, params.q))
+    elif params.q:
+        # Ranked full-text search, best matches first
+        query = catalog_search.apply_search(query, params.q, db.bind.dialect.name)
+
+    if params.min_price is not None:
+        query = query.where(Product.price_cents >= params.min_price)
+
+    if params.max_price is not None:
+        query = query.where(Product.price_cents <= params.max_price)
 
-    if plant_environment:
+    if params.near:
+        query = query.where(Product.id.in_(inventory_service.products_in_stock_near(*params.near)))
+
+    facet_rows = None
+    if params.facets:
+        facet_rows = await catalog_facets.load_facet_rows(
+            db, query, search, params.min_price, params.max_price, near_key, params.semantic
+        )
+
+    if params.kind:
+        query = query.where(Product.kind == params.kind)
+
+    if params.plant_environment or params.color or params.size:
+        query = query.join(ProductAttributes)
+
+    if params.plant_environment:
         # Filter products that have the matching plant_environment attribute
-        query = query.join(ProductAttributes).filter(
+        query = query.where(
             or_(
-                ProductAttributes.plant_environment == plant_environment,
+                ProductAttributes.plant_environment == params.plant_environment,
                 ProductAttributes.plant_environment == PlantEnvironment.BOTH
             )
         )
 
-    if q:
-        search_term = f"%{q}%"
-        query = query.filter(
-            (Product.name.ilike(search_term)) | (Product.description.ilike(search_term))
+    if params.color:
+        query = query.where(ProductAttributes.color == params.color)
+
+    if params.size:
+        query = query.where(ProductAttributes.size == params.size)
+
+    total, total_is_estimate = None, False
+    if params.include_total:
+        total, total_is_estimate = await catalog_pagination.count_matches(
+            db,
+            query,
+            catalog_cache.count_key(
+                params.kind.value if params.kind else None,
+                params.plant_environment.value if params.plant_environment else None,
+                search,
+                color=params.color,
+                size=params.size,
+                min_price=params.min_price,
+                max_price=params.max_price,
+                near=near_key,
+                semantic=params.semantic,
+            ),
         )
 
-    total = query.count()
-    offset = (page - 1) * page_size
-    products = query.offset(offset).limit(page_size).all()
+    keyset = params.sort or not params.q
+    if keyset:
+        query = catalog_pagination.after_cursor(query, params.sort, params.cursor)
+    if not params.cursor:
+        query = query.offset((params.page - 1) * params.page_size)
+    # One extra row tells us whether there is a next page
+    rows = (await db.scalars(query.options(*PRODUCT_RESPONSE_OPTIONS).limit(params.page_size + 1))).all()
+    products = rows[:params.page_size]
+    next_cursor = None
+    if keyset and len(rows) > params.page_size:
+        last = products[-1]
+        next_cursor = catalog_pagination.encode_cursor(
+            params.sort, catalog_pagination.sort_value(params.sort, last), last.id
+        )
 
-    return ProductListResponse(
+    return _ListingPage(
         items=[ProductResponse.model_validate(p) for p in products],
+        stamps=[(p.id, _product_stamp(p)) for p in products],
         total=total,
-        page=page,
-        page_size=page_size,
+        total_is_estimate=total_is_estimate,
+        next_cursor=next_cursor,
+        facet_rows=facet_rows,
+    )
+
+
+async def _semantic_matches(db: AsyncSession, q: str) -> List[int]:
+    await catalog_semantic.index.ensure_fresh(db)
+    return [product_id for product_id, _ in catalog_semantic.index.search(q)]
+
+
+async def _engine_page(db: AsyncSession, params: _ListingParams) -> _ListingPage:
+    engine = catalog_engine.engine
+    await engine.ensure_fresh(db)
+    product_ids = None
+    if params.near:
+        product_ids = set(await db.scalars(inventory_service.products_in_stock_near(*params.near)))
+    ranking = await _semantic_matches(db, params.q) if params.semantic else None
+    searching = bool(params.q) and not params.semantic
+    result = engine.page(
+        kind=params.kind,
+        plant_environment=params.plant_environment,
+        color=params.color,
+        size=params.size,
+        min_price=params.min_price,
+        max_price=params.max_price,
+        sort=params.sort,
+        terms=catalog_search.search_terms(params.q) if searching else None,
+        searching=searching,
+        ranking=ranking,
+        page=params.page,
+        page_size=params.page_size,
+        after=catalog_pagination.decode_cursor(params.cursor, params.sort) if params.cursor else None,
+        facets=params.facets,
+        product_ids=product_ids,
+    )
+    return _ListingPage(
+        items=result.items,
+        stamps=result.stamps,
+        total=result.total if params.include_total else None,
+        total_is_estimate=False,
+        next_cursor=catalog_pagination.encode_cursor(params.sort, *result.next_after) if result.next_after else None,
+        facet_rows=result.facet_rows,
+    )
+
+
+@router.get("/suggest", response_model=list[ProductSuggestion])
+async def suggest_products(
+    response: Response,
+    q: str = Query(..., min_length=1, description="What has been typed so far"),
+    limit: int = Query(8, ge=1, le=20),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Search-box suggestions: (slug, name) of active products, from the in-memory prefix index."""
+    await catalog_suggest.index.ensure_fresh(db)
+    response.headers["Cache-Control"] = f"public, max-age={settings.catalog_list_max_age_seconds}"
+    return [ProductSuggestion(slug=slug, name=name) for slug, name in catalog_suggest.index.suggest(q, limit)]
+
+
+@router.post("/products/lookup", response_model=ProductLookupResponse)
+async def lookup_products(lookup: ProductLookupRequest, db: AsyncSession = Depends(get_async_db)):
+    """Current details of many products at once, by id and/or slug, for cart and checkout.
+
+    One query for the whole batch, bypassing the catalog cache so prices and
+    stock are current. Unknown and deactivated references are listed under
+    missing and inactive rather than failing the request.
+    """
+    if not lookup.ids and not lookup.slugs:
+        return ProductLookupResponse(items=[], missing=ProductRefs(), inactive=ProductRefs())
+
+    products = (
+        await db.scalars(
+            select(Product)
+            .options(*PRODUCT_RESPONSE_OPTIONS)
+            .where(or_(Product.id.in_(lookup.ids), Product.slug.in_(lookup.slugs)))
+        )
+    ).all()
+    by_id = {product.id: product for product in products}
+    by_slug = {product.slug: product for product in products}
+
+    found = {}
+    missing, inactive = ProductRefs(), ProductRefs()
+    for refs, index, key in ((lookup.ids, by_id, "ids"), (lookup.slugs, by_slug, "slugs")):
+        for ref in dict.fromkeys(refs):
+            product = index.get(ref)
+            if product is None:
+                getattr(missing, key).append(ref)
+            elif not product.active:
+                getattr(inactive, key).append(ref)
+            else:
+                found.setdefault(product.id, product)
+
+    return ProductLookupResponse(
+        items=[ProductResponse.model_validate(product) for product in found.values()],
+        missing=missing,
+        inactive=inactive,
     )
 
 
+@router.post("/products/similar-image", response_model=list[ImageMatch])
+async def find_similar_products(
+    image: UploadFile = File(..., description="A customer's photo"),
+    limit: int = Query(8, ge=1, le=20),
+    max_distance: int = Query(catalog_images.MAX_DISTANCE, ge=0, le=16, description="Hash bits that may differ"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Active products with a registered photo that looks like the upload, closest first.
+
+    Answers "do you sell this?" for copies of our own photos (screenshots,
+    re-shared posts) from perceptual hashes, without calling Gemini; see
+    app.services.catalog_images. An empty list means no close match, not
+    that we do not sell it.
+    """
+    try:
+        data = await image.read(catalog_images.MAX_IMAGE_BYTES + 1)
+        value = await run_in_threadpool(catalog_images.image_hash, data)
+    except catalog_images.UnreadableImage as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unreadable image: {exc}")
+
+    await catalog_images.index.ensure_fresh(db)
+    matches = catalog_images.index.search(value, max_distance)[: catalog_images.MAX_CANDIDATES]
+    if not matches:
+        return []
+    products = (
+        await db.scalars(
+            select(Product)
+            .options(*PRODUCT_RESPONSE_OPTIONS)
+            .where(Product.id.in_([product_id for product_id, _ in matches]), Product.active == True)
+        )
+    ).all()
+    by_id = {product.id: product for product in products}
+    return [
+        ImageMatch(distance=distance, product=ProductResponse.model_validate(by_id[product_id]))
+        for product_id, distance in matches
+        if product_id in by_id
+    ][:limit]
+
+
 @router.get("/products/{slug}", response_model=ProductResponse)
-async def get_product(slug: str, db: Session = Depends(get_db)):
-    """Get a single product by slug."""
-    product = db.query(Product).filter(Product.slug == slug, Product.active == True).first()
+async def get_product(slug: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """Get a single product by slug.
+
+    Served from the catalog cache when possible; honours If-None-Match and
+    If-Modified-Since with a 304.
+    """
+    key = catalog_cache.product_key(slug)
+    cached = catalog_cache.cache.get(key)
+    if cached is not None:
+        return _respond(request, response, cached, hit=True)
+    generation = catalog_cache.cache.generation
+
+    product = await db.scalar(
+        select(Product)
+        .options(*PRODUCT_RESPONSE_OPTIONS)
+        .where(Product.slug == slug, Product.active == True)
+    )
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    return ProductResponse.model_validate(product)
 
+    stamp = _product_stamp(product)
+    cached = _CachedResponse(
+        body=ProductResponse.model_validate(product),
+        headers=http_cache.validator_headers(
+            http_cache.make_etag(product.id, stamp), stamp, settings.catalog_detail_max_age_seconds
+        ),
+    )
+    catalog_cache.cache.put(key, cached, [product.id], generation)
+    return _respond(request, response, cached, hit=False)
+
+
+@router.get("/products/{slug}/related", response_model=list[ProductResponse])
+async def get_related_products(
+    slug: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(8, ge=1, le=settings.related_products_top_k),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Active products most often bought together with this one, most frequent first.
+
+    Lists are precomputed by build_related_products.py (see
+    app.services.related_products) and served from the catalog cache when
+    possible; a product with no co-purchases yet gets an empty list.
+    """
+    key = catalog_cache.related_key(slug, limit)
+    cached = catalog_cache.cache.get(key)
+    if cached is not None:
+        return _respond(request, response, cached, hit=True)
+    generation = catalog_cache.cache.generation
+
+    product_id = await db.scalar(select(Product.id).where(Product.slug == slug, Product.active == True))
+    if product_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+    related = (
+        await db.scalars(
+            select(Product)
+            .options(*PRODUCT_RESPONSE_OPTIONS)
+            .join(ProductRecommendation, ProductRecommendation.related_product_id == Product.id)
+            .where(ProductRecommendation.product_id == product_id, Product.active == True)
+            .order_by(ProductRecommendation.rank)
+            .limit(limit)
+        )
+    ).all()
+
+    stamps = [(p.id, _product_stamp(p)) for p in related]
+    cached = _CachedResponse(
+        body=[ProductResponse.model_validate(p) for p in related],
+        headers=http_cache.validator_headers(
+            # No Last-Modified: the job can reorder the list without touching any product
+            http_cache.make_etag(key, stamps),
+            None,
+            settings.catalog_detail_max_age_seconds,
+        ),
+    )
+    catalog_cache.cache.put(key, cached, [product_id, *(p.id for p in related)], generation)
+    return _respond(request, response, cached, hit=False)
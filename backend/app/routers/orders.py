@@ -2,206 +2,360 @@
 Order endpoints for customers and admins.
 """
 
-from typing import List
+import base64
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import Select, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.core.dependencies import get_current_admin_user, get_current_user
 from app.db.models import (
     Address,
     FulfillmentStatus,
-    Inventory,
     Nursery,
-    NurseryInventory,
     Order,
     OrderFulfillment,
     OrderFulfillmentItem,
     OrderItem,
     OrderStatus,
-    Product,
     User,
 )
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.schemas.fulfillment import (
+    AllocationRequest,
     AllocationSuggestionsResponse,
+    AutoAllocateRequest,
+    AutoAllocateResponse,
     CreateAllocationRequest,
     DeliveryContactRequest,
-    NurseryAllocationSuggestion,
-    OrderFulfillmentItemResponse,
+    OrderAllocationResult,
     OrderFulfillmentResponse,
 )
-from app.schemas.order import CreateOrderRequest, OrderResponse, UpdateOrderStatusRequest
+from app.schemas.order import (
+    AddressResponse,
+    CreateOrderRequest,
+    OrderItemResponse,
+    OrderListResponse,
+    OrderResponse,
+    QuoteRequest,
+    QuoteResponse,
+    UpdateOrderStatusRequest,
+)
+from app.services import allocation_service, allocation_solver, inventory_service, pricing
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+# Relationships read by _order_response; async sessions cannot lazy load.
+_ORDER_RESPONSE_OPTIONS = (
+    selectinload(Order.items),
+    joinedload(Order.shipping_address),
+)
+
+# Relationships read by _fulfillment_dict.
+_FULFILLMENT_RESPONSE_OPTIONS = (
+    joinedload(OrderFulfillment.nursery),
+    selectinload(OrderFulfillment.items).joinedload(OrderFulfillmentItem.order_item),
+)
+
+# The whole admin order graph in a fixed number of statements, however many
+# items and split shipments the order has.
+_ORDER_DETAIL_OPTIONS = _ORDER_RESPONSE_OPTIONS + (
+    selectinload(Order.fulfillments).options(*_FULFILLMENT_RESPONSE_OPTIONS),
+)
+
+
+async def _get_order(db: AsyncSession, order_id: int, *options) -> Optional[Order]:
+    return await db.scalar(
+        select(Order).options(*options).where(Order.id == order_id).execution_options(populate_existing=True)
+    )
+
+
+def _fulfillment_dict(fulfillment: OrderFulfillment) -> dict:
+    """Serialize a fulfillment loaded with _FULFILLMENT_RESPONSE_OPTIONS."""
+    return {
+        "id": fulfillment.id,
+        "order_id": fulfillment.order_id,
+        "nursery_id": fulfillment.nursery_id,
+        "nursery_name": fulfillment.nursery.internal_name if fulfillment.nursery else None,
+        "status": fulfillment.status,
+        "delivery_name": fulfillment.delivery_name,
+        "delivery_phone": fulfillment.delivery_phone,
+        "delivery_notes": fulfillment.delivery_notes,
+        "created_at": fulfillment.created_at.isoformat(),
+        "updated_at": fulfillment.updated_at.isoformat(),
+        "items": [
+            {
+                "id": item.id,
+                "fulfillment_id": item.fulfillment_id,
+                "order_item_id": item.order_item_id,
+                "quantity": item.quantity,
+                "order_item_product_name": item.order_item.product_name if item.order_item else None,
+            }
+            for item in fulfillment.items
+        ],
+    }
+
+
+async def _replace_proposed_fulfillments(
+    db: AsyncSession, allocations_by_order: Dict[int, List[AllocationRequest]]
+) -> List[OrderFulfillment]:
+    """Swap each order's PROPOSED fulfillments for new ones built from its allocations."""
+    existing_fulfillments = (
+        await db.scalars(
+            select(OrderFulfillment)
+            .options(selectinload(OrderFulfillment.items))
+            .where(
+                OrderFulfillment.order_id.in_(allocations_by_order),
+                OrderFulfillment.status == FulfillmentStatus.PROPOSED,
+            )
+        )
+    ).all()
+    for fulfillment in existing_fulfillments:
+        await db.delete(fulfillment)
+    await db.flush()
+
+    created_fulfillments = []
+    for order_id, allocations in allocations_by_order.items():
+        for allocation in allocations:
+            fulfillment = OrderFulfillment(
+                order_id=order_id,
+                nursery_id=allocation.nursery_id,
+                status=FulfillmentStatus.PROPOSED,
+                items=[
+                    OrderFulfillmentItem(order_item_id=item.order_item_id, quantity=item.quantity)
+                    for item in allocation.items
+                ],
+            )
+            db.add(fulfillment)
+            created_fulfillments.append(fulfillment)
+    await db.flush()
+    return created_fulfillments
+
+
+def _order_response(order: Order, include_fulfillments: bool = False) -> OrderResponse:
+    """Build an OrderResponse from an order loaded with _ORDER_RESPONSE_OPTIONS
+    (or _ORDER_DETAIL_OPTIONS when include_fulfillments is set)."""
+    address = order.shipping_address
+    return OrderResponse(
+        id=order.id,
+        user_id=order.user_id,
+        status=order.status,
+        subtotal_cents=order.subtotal_cents,
+        shipping_cents=order.shipping_cents,
+        tax_cents=order.tax_cents,
+        total_cents=order.total_cents,
+        currency=order.currency,
+        created_at=order.created_at.isoformat(),
+        items=[OrderItemResponse.model_validate(item) for item in order.items],
+        shipping_address=AddressResponse.model_validate(address) if address else None,
+        fulfillments=[_fulfillment_dict(f) for f in order.fulfillments] if include_fulfillments else None,
+    )
+
+
+def _unavailable(exc: pricing.UnavailableProducts) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail={"message": "Some products are not available", "missing": exc.missing, "inactive": exc.inactive},
+    )
+
+
+@router.post("/quote", response_model=QuoteResponse)
+async def quote_cart(
+    request: QuoteRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Price a cart without placing an order.
+
+    Returns the subtotal, shipping and tax checkout would charge for these
+    items and destination right now, in one product query. Quoting needs no
+    login, so carts can be re-quoted on every edit.
+    """
+    try:
+        cart = await pricing.quote(
+            db, [(item.product_id, item.quantity) for item in request.items], request.country, request.commune
+        )
+    except pricing.UnavailableProducts as exc:
+        raise _unavailable(exc)
+    return QuoteResponse.model_validate(cart)
+
 
 @router.post("", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     request: CreateOrderRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Create a new order from cart items."""
-    # Calculate totals
-    subtotal_cents = 0
-    order_items = []
-
+    """Create a new order from cart items.
+
+    Priced by app.services.pricing exactly as /orders/quote prices the same
+    cart: products are fetched in one query and every missing or inactive one
+    is reported at once. Items are inserted with one multi-row INSERT ... RETURNING
+    and the response is built from the returned rows, without a reload.
+    """
+    lines = []
     for item in request.items:
         product_id = item.get("product_id")
         quantity = item.get("quantity", 1)
 
         if not product_id:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="product_id is required")
+        if not isinstance(quantity, int) or quantity < 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"quantity for product {product_id} must be a positive integer",
+            )
+        lines.append((product_id, quantity))
 
-        product = db.query(Product).filter(Product.id == product_id, Product.active == True).first()
-        if not product:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product {product_id} not found")
-
-        item_total = product.price_cents * quantity
-        subtotal_cents += item_total
-
-        order_items.append(
-            {
-                "product_id": product.id,
-                "quantity": quantity,
-                "unit_price_cents": product.price_cents,
-                "product_name": product.name,
-            }
-        )
-
-    shipping_cents = 500  # Fixed shipping for now
-    tax_cents = int(subtotal_cents * 0.08)  # 8% tax
-    total_cents = subtotal_cents + shipping_cents + tax_cents
+    try:
+        cart = await pricing.quote(db, lines, request.shipping_address.country, request.shipping_address.commune)
+    except pricing.UnavailableProducts as exc:
+        raise _unavailable(exc)
 
-    # Create order
+    # Create order with its shipping address, then all items in one multi-row INSERT
     order = Order(
         user_id=current_user.id,
         status=OrderStatus.PLACED,
-        subtotal_cents=subtotal_cents,
-        shipping_cents=shipping_cents,
-        tax_cents=tax_cents,
-        total_cents=total_cents,
+        subtotal_cents=cart.subtotal_cents,
+        shipping_cents=cart.shipping_cents,
+        tax_cents=cart.tax_cents,
+        total_cents=cart.total_cents,
+        shipping_address=Address(
+            full_name=request.shipping_address.full_name,
+            street_address=request.shipping_address.street_address,
+            city=request.shipping_address.city,
+            commune=request.shipping_address.commune,
+            state=request.shipping_address.state,
+            postal_code=request.shipping_address.postal_code,
+            country=request.shipping_address.country,
+            phone=request.shipping_address.phone,
+        ),
     )
     db.add(order)
-    db.flush()
-
-    # Create order items
-    for item_data in order_items:
-        order_item = OrderItem(
-            order_id=order.id,
-            product_id=item_data["product_id"],
-            quantity=item_data["quantity"],
-            unit_price_cents=item_data["unit_price_cents"],
-            product_name=item_data["product_name"],
+    await db.flush()
+
+    items = (
+        await db.scalars(
+            insert(OrderItem).returning(OrderItem, sort_by_parameter_order=True),
+            [
+                {
+                    "order_id": order.id,
+                    "product_id": line.product_id,
+                    "quantity": line.quantity,
+                    "unit_price_cents": line.unit_price_cents,
+                    "product_name": line.product_name,
+                }
+                for line in cart.lines
+            ],
         )
-        db.add(order_item)
-
-    # Create shipping address
-    address = Address(
-        order_id=order.id,
-        full_name=request.shipping_address.full_name,
-        street_address=request.shipping_address.street_address,
-        city=request.shipping_address.city,
-        commune=getattr(request.shipping_address, 'commune', None),
-        state=request.shipping_address.state,
-        postal_code=request.shipping_address.postal_code,
-        country=request.shipping_address.country,
-        phone=request.shipping_address.phone,
-    )
-    db.add(address)
-
-    db.commit()
-    db.refresh(order)
-
-    return OrderResponse.model_validate(order)
+    ).all()
+    set_committed_value(order, "items", list(items))  # in cart order
+    await db.commit()
+
+    return _order_response(order)
+
+
+def _encode_cursor(order: Order) -> str:
+    return base64.urlsafe_b64encode(f"{order.created_at.isoformat()}|{order.id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+async def _order_page(
+    db: AsyncSession,
+    query: Select,
+    cursor: Optional[str],
+    page_size: int,
+    status_filter: Optional[OrderStatus],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime],
+) -> OrderListResponse:
+    """One page of `query`, newest first, continuing after `cursor`.
+
+    Pages are cut on (created_at, id) rather than OFFSET, so each one costs an
+    index range scan however deep the client has paged.
+    """
+    if status_filter is not None:
+        query = query.where(Order.status == status_filter)
+    if created_from is not None:
+        query = query.where(Order.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Order.created_at < created_to)
+    if cursor:
+        query = query.where(tuple_(Order.created_at, Order.id) < tuple_(*_decode_cursor(cursor)))
+
+    orders = (
+        await db.scalars(
+            query.options(*_ORDER_RESPONSE_OPTIONS)
+            .order_by(Order.created_at.desc(), Order.id.desc())
+            .limit(page_size + 1)
+        )
+    ).all()
+    next_cursor = _encode_cursor(orders[page_size - 1]) if len(orders) > page_size else None
+    return OrderListResponse(items=[_order_response(o) for o in orders[:page_size]], next_cursor=next_cursor)
 
 
-@router.get("/me", response_model=List[OrderResponse])
+@router.get("/me", response_model=OrderListResponse)
 async def get_my_orders(
+    cursor: Optional[str] = None,
+    page_size: int = Query(20, ge=1, le=100),
+    status_filter: Optional[OrderStatus] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Get current user's orders."""
-    orders = db.query(Order).filter(Order.user_id == current_user.id).order_by(Order.created_at.desc()).all()
-    return [OrderResponse.model_validate(o) for o in orders]
+    """Get current user's orders, newest first, one page at a time."""
+    return await _order_page(
+        db,
+        select(Order).where(Order.user_id == current_user.id),
+        cursor,
+        page_size,
+        status_filter,
+        created_from,
+        created_to,
+    )
 
 
-@router.get("/admin", response_model=List[OrderResponse])
+@router.get("/admin", response_model=OrderListResponse)
 async def list_all_orders(
+    cursor: Optional[str] = None,
+    page_size: int = Query(20, ge=1, le=100),
+    status_filter: Optional[OrderStatus] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """List all orders (admin only)."""
-    orders = db.query(Order).order_by(Order.created_at.desc()).all()
-    return [OrderResponse.model_validate(o) for o in orders]
+    """List all orders, newest first, one page at a time (admin only).
+
+    Filter by status and by a created_at range (created_from inclusive,
+    created_to exclusive).
+    """
+    return await _order_page(db, select(Order), cursor, page_size, status_filter, created_from, created_to)
 
 
 @router.get("/admin/{order_id}", response_model=OrderResponse)
 async def get_order_admin(
     order_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get a single order with fulfillments (admin only)."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await _get_order(db, order_id, *_ORDER_DETAIL_OPTIONS)
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
-    
-    # Load fulfillments for the response
-    from app.schemas.fulfillment import OrderFulfillmentResponse
-    fulfillments = db.query(OrderFulfillment).filter(OrderFulfillment.order_id == order_id).all()
-    
-    # Build response with fulfillments
-    order_dict = {
-        "id": order.id,
-        "user_id": order.user_id,
-        "status": order.status,
-        "subtotal_cents": order.subtotal_cents,
-        "shipping_cents": order.shipping_cents,
-        "tax_cents": order.tax_cents,
-        "total_cents": order.total_cents,
-        "currency": order.currency,
-        "created_at": order.created_at.isoformat(),
-        "items": [{"id": item.id, "product_id": item.product_id, "quantity": item.quantity, "unit_price_cents": item.unit_price_cents, "product_name": item.product_name} for item in order.items],
-        "shipping_address": {
-            "full_name": order.shipping_address.full_name,
-            "street_address": order.shipping_address.street_address,
-            "city": order.shipping_address.city,
-            "commune": order.shipping_address.commune,
-            "state": order.shipping_address.state,
-            "postal_code": order.shipping_address.postal_code,
-            "country": order.shipping_address.country,
-            "phone": order.shipping_address.phone,
-        } if order.shipping_address else None,
-        "fulfillments": [
-            {
-                "id": f.id,
-                "order_id": f.order_id,
-                "nursery_id": f.nursery_id,
-                "nursery_name": f.nursery.internal_name if f.nursery else None,
-                "status": f.status,
-                "delivery_name": f.delivery_name,
-                "delivery_phone": f.delivery_phone,
-                "delivery_notes": f.delivery_notes,
-                "created_at": f.created_at.isoformat(),
-                "updated_at": f.updated_at.isoformat(),
-                "items": [
-                    {
-                        "id": item.id,
-                        "fulfillment_id": item.fulfillment_id,
-                        "order_item_id": item.order_item_id,
-                        "quantity": item.quantity,
-                        "order_item_product_name": db.query(OrderItem).filter(OrderItem.id == item.order_item_id).first().product_name if db.query(OrderItem).filter(OrderItem.id == item.order_item_id).first() else None,
-                    }
-                    for item in f.items
-                ],
-            }
-            for f in fulfillments
-        ],
-    }
-    return OrderResponse(**order_dict)
+    return _order_response(order, include_fulfillments=True)
 
 
 @router.patch("/admin/{order_id}", response_model=OrderResponse)
@@ -209,29 +363,40 @@ async def update_order_status(
     order_id: int,
     request: UpdateOrderStatusRequest,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Update order status (admin only)."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    """Update order status (admin only).
+
+    The first move into CONFIRMED stamps confirmed_at, as /confirm does, so
+    the order's sales reach the popularity scores. The stamp is kept if the
+    order later leaves and re-enters CONFIRMED: a new one would put it past
+    the popularity watermark again and count its units twice.
+    """
+    order = await db.scalar(select(Order).where(Order.id == order_id))
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
 
+    if request.status == OrderStatus.CONFIRMED and order.confirmed_at is None:
+        order.confirmed_at = datetime.utcnow()
     order.status = request.status
-    db.commit()
-    db.refresh(order)
+    await db.commit()
+    order = await _get_order(db, order_id, *_ORDER_RESPONSE_OPTIONS)
 
-    return OrderResponse.model_validate(order)
+    return _order_response(order)
 
 
 # Fulfillment endpoints
 @router.get("/admin/{order_id}/allocation-suggestions", response_model=AllocationSuggestionsResponse)
 async def get_allocation_suggestions(
     order_id: int,
+    plan: Optional[Literal["single_nursery", "min_splits"]] = Query(
+        None, description="Also propose a complete allocation with this strategy"
+    ),
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get allocation suggestions for an order based on commune/city matching (admin only)."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await _get_order(db, order_id, *_ORDER_RESPONSE_OPTIONS)
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
 
@@ -240,77 +405,22 @@ async def get_allocation_suggestions(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Order has no shipping address"
         )
 
-    address = order.shipping_address
-    order_items = order.items
-
-    # Get all nurseries with inventory for products in this order
-    product_ids = [item.product_id for item in order_items if item.product_id]
-    if not product_ids:
-        return AllocationSuggestionsResponse(order_id=order_id, suggestions=[])
-
-    # Get nurseries with available inventory for these products
-    nurseries_with_inventory = (
-        db.query(Nursery)
-        .join(NurseryInventory)
-        .filter(
-            NurseryInventory.product_id.in_(product_ids),
-            NurseryInventory.quantity > 0,
-        )
-        .distinct()
-        .all()
+    order_items = [item for item in order.items if item.product_id]
+    nurseries = await allocation_service.load_nursery_stock(
+        db, order.shipping_address, {item.product_id for item in order_items}
     )
 
-    suggestions = []
-    for nursery in nurseries_with_inventory:
-        # Determine match tier: 1=same commune, 2=same city, 3=other
-        match_tier = 3
-        if address.commune and nursery.commune and address.commune.lower() == nursery.commune.lower():
-            match_tier = 1
-        elif address.city.lower() == nursery.city.lower():
-            match_tier = 2
-
-        # Calculate available items for this nursery
-        available_items = []
-        for order_item in order_items:
-            if not order_item.product_id:
-                continue
-
-            nursery_inv = (
-                db.query(NurseryInventory)
-                .filter(
-                    NurseryInventory.nursery_id == nursery.id,
-                    NurseryInventory.product_id == order_item.product_id,
-                )
-                .first()
-            )
-
-            if nursery_inv and nursery_inv.quantity > 0:
-                available_qty = min(nursery_inv.quantity, order_item.quantity)
-                available_items.append(
-                    {
-                        "order_item_id": order_item.id,
-                        "product_name": order_item.product_name,
-                        "requested_qty": order_item.quantity,
-                        "available_qty": available_qty,
-                    }
-                )
+    allocation_plan = None
+    if plan == allocation_service.PLAN_SINGLE_NURSERY:
+        allocation_plan = allocation_service.plan_single_nursery(order_items, nurseries)
+    elif plan == allocation_service.PLAN_MIN_SPLITS:
+        allocation_plan = allocation_service.plan_min_splits(order_items, nurseries)
 
-        if available_items:
-            suggestions.append(
-                NurseryAllocationSuggestion(
-                    nursery_id=nursery.id,
-                    nursery_name=nursery.internal_name,
-                    city=nursery.city,
-                    commune=nursery.commune,
-                    match_tier=match_tier,
-                    available_items=available_items,
-                )
-            )
-
-    # Sort by match tier (1 first), then by number of available items
-    suggestions.sort(key=lambda s: (s.match_tier, -len(s.available_items)))
-
-    return AllocationSuggestionsResponse(order_id=order_id, suggestions=suggestions)
+    return AllocationSuggestionsResponse(
+        order_id=order_id,
+        suggestions=allocation_service.build_suggestions(order_items, nurseries),
+        plan=allocation_plan,
+    )
 
 
 @router.post("/admin/{order_id}/allocate", response_model=List[OrderFulfillmentResponse])
@@ -318,18 +428,18 @@ async def create_allocation(
     order_id: int,
     request: CreateAllocationRequest,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Create or update order fulfillments based on admin allocation (admin only)."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await _get_order(db, order_id, selectinload(Order.items))
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
 
     # Validate all allocations
-    order_item_ids = {item.id for item in order.items}
+    order_items_by_id = {item.id: item for item in order.items}
     for allocation in request.allocations:
         # Verify nursery exists
-        nursery = db.query(Nursery).filter(Nursery.id == allocation.nursery_id).first()
+        nursery = await db.scalar(select(Nursery).where(Nursery.id == allocation.nursery_id))
         if not nursery:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -338,120 +448,100 @@ async def create_allocation(
 
         # Verify order items belong to this order and validate quantities
         for item in allocation.items:
-            if item.order_item_id not in order_item_ids:
+            if item.order_item_id not in order_items_by_id:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Order item {item.order_item_id} does not belong to order {order_id}",
                 )
 
-            order_item = db.query(OrderItem).filter(OrderItem.id == item.order_item_id).first()
+            order_item = order_items_by_id[item.order_item_id]
             if item.quantity > order_item.quantity:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Allocated quantity {item.quantity} exceeds order quantity {order_item.quantity} for item {item.order_item_id}",
                 )
 
-    # Delete existing proposed fulfillments for this order
-    existing_fulfillments = (
-        db.query(OrderFulfillment)
-        .filter(
-            OrderFulfillment.order_id == order_id,
-            OrderFulfillment.status == FulfillmentStatus.PROPOSED,
+    created_fulfillments = await _replace_proposed_fulfillments(db, {order_id: request.allocations})
+    await db.commit()
+
+    # Reload with relationships and return
+    created_fulfillments = (
+        await db.scalars(
+            select(OrderFulfillment)
+            .options(*_FULFILLMENT_RESPONSE_OPTIONS)
+            .where(OrderFulfillment.id.in_([f.id for f in created_fulfillments]))
+            .order_by(OrderFulfillment.id)
+            .execution_options(populate_existing=True)
         )
-        .all()
-    )
-    for fulfillment in existing_fulfillments:
-        db.delete(fulfillment)
+    ).all()
+    return [OrderFulfillmentResponse(**_fulfillment_dict(f)) for f in created_fulfillments]
 
-    db.flush()
 
-    # Create new fulfillments
-    created_fulfillments = []
-    for allocation in request.allocations:
-        fulfillment = OrderFulfillment(
-            order_id=order_id,
-            nursery_id=allocation.nursery_id,
-            status=FulfillmentStatus.PROPOSED,
+@router.post("/admin/auto-allocate", response_model=AutoAllocateResponse)
+async def auto_allocate(
+    request: AutoAllocateRequest,
+    current_user: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Allocate a batch of PLACED orders automatically (admin only).
+
+    Each order gets the fewest fulfillments, then the nearest nurseries; stock
+    wanted by several orders in the batch is shared out across the whole batch.
+    Fully allocated orders get their PROPOSED fulfillments replaced, ready to
+    confirm. Orders without a shipping address or catalog items are skipped.
+    """
+    query = select(Order).options(*_ORDER_RESPONSE_OPTIONS).where(Order.status == OrderStatus.PLACED)
+    if request.order_ids is not None:
+        query = query.where(Order.id.in_(request.order_ids))
+    orders = (await db.scalars(query.order_by(Order.id))).all()
+
+    product_ids = {item.product_id for order in orders for item in order.items if item.product_id}
+    nurseries = await allocation_service.load_stock_matrix(db, product_ids)
+    demands = allocation_solver.demands_for_orders(orders, nurseries)
+    solutions = allocation_solver.solve_batch(demands, allocation_solver.stock_cells(nurseries))
+
+    results = [
+        OrderAllocationResult(
+            order_id=demand.order_id,
+            plan=allocation_solver.solution_plan(demand, solutions[demand.order_id]),
         )
-        db.add(fulfillment)
-        db.flush()
+        for demand in demands
+    ]
 
-        # Create fulfillment items
-        for item in allocation.items:
-            fulfillment_item = OrderFulfillmentItem(
-                fulfillment_id=fulfillment.id,
-                order_item_id=item.order_item_id,
-                quantity=item.quantity,
-            )
-            db.add(fulfillment_item)
-
-        created_fulfillments.append(fulfillment)
-
-    db.commit()
-
-    # Refresh and return
-    result = []
-    for fulfillment in created_fulfillments:
-        db.refresh(fulfillment)
-        # Load relationships
-        fulfillment_items = (
-            db.query(OrderFulfillmentItem)
-            .filter(OrderFulfillmentItem.fulfillment_id == fulfillment.id)
-            .all()
+    if not request.dry_run:
+        await _replace_proposed_fulfillments(
+            db, {result.order_id: result.plan.allocations for result in results if result.plan.fully_allocated}
         )
-        
-        # Build response with populated data
-        items_data = []
-        for item in fulfillment_items:
-            order_item = db.query(OrderItem).filter(OrderItem.id == item.order_item_id).first()
-            items_data.append(
-                OrderFulfillmentItemResponse(
-                    id=item.id,
-                    fulfillment_id=item.fulfillment_id,
-                    order_item_id=item.order_item_id,
-                    quantity=item.quantity,
-                    order_item_product_name=order_item.product_name if order_item else None,
-                )
-            )
+        await db.commit()
 
-        fulfillment_dict = {
-            "id": fulfillment.id,
-            "order_id": fulfillment.order_id,
-            "nursery_id": fulfillment.nursery_id,
-            "nursery_name": fulfillment.nursery.internal_name if fulfillment.nursery else None,
-            "status": fulfillment.status,
-            "delivery_name": fulfillment.delivery_name,
-            "delivery_phone": fulfillment.delivery_phone,
-            "delivery_notes": fulfillment.delivery_notes,
-            "created_at": fulfillment.created_at.isoformat(),
-            "updated_at": fulfillment.updated_at.isoformat(),
-            "items": items_data,
-        }
-        result.append(OrderFulfillmentResponse(**fulfillment_dict))
-
-    return result
+    return AutoAllocateResponse(results=results)
 
 
 @router.post("/admin/{order_id}/confirm", response_model=OrderResponse)
 async def confirm_order_allocation(
     order_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Confirm order allocation: validate inventory, decrement stock, mark fulfillments confirmed (admin only)."""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    """Confirm order allocation: validate inventory, decrement stock, mark fulfillments confirmed (admin only).
+
+    Stock is checked and taken in one pass; if any nursery is short, nothing
+    changes and every shortage is reported.
+    """
+    order = await db.scalar(select(Order).where(Order.id == order_id))
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
 
-    # Get all proposed fulfillments for this order
     fulfillments = (
-        db.query(OrderFulfillment)
-        .filter(
-            OrderFulfillment.order_id == order_id,
-            OrderFulfillment.status == FulfillmentStatus.PROPOSED,
+        await db.scalars(
+            select(OrderFulfillment)
+            .options(selectinload(OrderFulfillment.items).joinedload(OrderFulfillmentItem.order_item))
+            .where(
+                OrderFulfillment.order_id == order_id,
+                OrderFulfillment.status == FulfillmentStatus.PROPOSED,
+            )
         )
-        .all()
-    )
+    ).all()
 
     if not fulfillments:
         raise HTTPException(
@@ -459,85 +549,49 @@ async def confirm_order_allocation(
             detail="No proposed fulfillments found for this order",
         )
 
-    # Validate inventory availability
-    for fulfillment in fulfillments:
-        fulfillment_items = (
-            db.query(OrderFulfillmentItem)
-            .filter(OrderFulfillmentItem.fulfillment_id == fulfillment.id)
-            .all()
+    # Claim the fulfillments first: a concurrent confirmation of the same order
+    # waits on these rows and then finds them no longer proposed.
+    claimed = await db.execute(
+        update(OrderFulfillment)
+        .where(
+            OrderFulfillment.id.in_([f.id for f in fulfillments]),
+            OrderFulfillment.status == FulfillmentStatus.PROPOSED,
         )
-
-        for fulfillment_item in fulfillment_items:
-            order_item = db.query(OrderItem).filter(OrderItem.id == fulfillment_item.order_item_id).first()
-            if not order_item or not order_item.product_id:
-                continue
-
-            nursery_inv = (
-                db.query(NurseryInventory)
-                .filter(
-                    NurseryInventory.nursery_id == fulfillment.nursery_id,
-                    NurseryInventory.product_id == order_item.product_id,
-                )
-                .first()
-            )
-
-            if not nursery_inv or nursery_inv.quantity < fulfillment_item.quantity:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Insufficient inventory for product {order_item.product_id} in nursery {fulfillment.nursery_id}",
-                )
-
-    # Decrement inventory and mark fulfillments as confirmed
-    product_ids_to_recompute = set()
-    for fulfillment in fulfillments:
-        fulfillment_items = (
-            db.query(OrderFulfillmentItem)
-            .filter(OrderFulfillmentItem.fulfillment_id == fulfillment.id)
-            .all()
+        .values(status=FulfillmentStatus.CONFIRMED)
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount != len(fulfillments):
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Order allocation is already being confirmed",
         )
 
-        for fulfillment_item in fulfillment_items:
-            order_item = db.query(OrderItem).filter(OrderItem.id == fulfillment_item.order_item_id).first()
-            if not order_item or not order_item.product_id:
-                continue
-
-            nursery_inv = (
-                db.query(NurseryInventory)
-                .filter(
-                    NurseryInventory.nursery_id == fulfillment.nursery_id,
-                    NurseryInventory.product_id == order_item.product_id,
-                )
-                .first()
-            )
-
-            nursery_inv.quantity -= fulfillment_item.quantity
-            product_ids_to_recompute.add(order_item.product_id)
-
-        fulfillment.status = FulfillmentStatus.CONFIRMED
-
-    # Recompute global inventory for affected products
-    for product_id in product_ids_to_recompute:
-        total = (
-            db.query(func.sum(NurseryInventory.quantity))
-            .filter(NurseryInventory.product_id == product_id)
-            .scalar()
-            or 0
+    requested: Dict[Tuple[int, int], int] = {}
+    for fulfillment in fulfillments:
+        for fulfillment_item in fulfillment.items:
+            product_id = fulfillment_item.order_item.product_id
+            if product_id:
+                cell = (fulfillment.nursery_id, product_id)
+                requested[cell] = requested.get(cell, 0) + fulfillment_item.quantity
+
+    try:
+        await inventory_service.decrement_stock(db, requested)
+    except inventory_service.InsufficientStock as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": "Insufficient inventory",
+                "shortages": [asdict(shortage) for shortage in exc.shortages],
+            },
         )
 
-        inventory = db.query(Inventory).filter(Inventory.product_id == product_id).first()
-        if inventory:
-            inventory.quantity = total
-        else:
-            inventory = Inventory(product_id=product_id, quantity=total)
-            db.add(inventory)
-
-    # Update order status to confirmed
     order.status = OrderStatus.CONFIRMED
+    order.confirmed_at = datetime.utcnow()
+    await db.commit()
+    order = await _get_order(db, order_id, *_ORDER_RESPONSE_OPTIONS)
 
-    db.commit()
-    db.refresh(order)
-
-    return OrderResponse.model_validate(order)
+    return _order_response(order)
 
 
 @router.post("/admin/fulfillments/{fulfillment_id}/delivery-contact", response_model=OrderFulfillmentResponse)
@@ -545,10 +599,10 @@ async def set_delivery_contact(
     fulfillment_id: int,
     request: DeliveryContactRequest,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Attach delivery contact details to a fulfillment (admin only)."""
-    fulfillment = db.query(OrderFulfillment).filter(OrderFulfillment.id == fulfillment_id).first()
+    fulfillment = await db.scalar(select(OrderFulfillment).where(OrderFulfillment.id == fulfillment_id))
     if not fulfillment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Fulfillment not found")
 
@@ -556,43 +610,12 @@ async def set_delivery_contact(
     fulfillment.delivery_phone = request.delivery_phone
     fulfillment.delivery_notes = request.delivery_notes
 
-    db.commit()
-    db.refresh(fulfillment)
+    await db.commit()
 
-    # Load relationships
-    fulfillment_items = (
-        db.query(OrderFulfillmentItem)
-        .filter(OrderFulfillmentItem.fulfillment_id == fulfillment.id)
-        .all()
+    fulfillment = await db.scalar(
+        select(OrderFulfillment)
+        .options(*_FULFILLMENT_RESPONSE_OPTIONS)
+        .where(OrderFulfillment.id == fulfillment_id)
+        .execution_options(populate_existing=True)
     )
-
-    # Build response with populated data
-    items_data = []
-    for item in fulfillment_items:
-        order_item = db.query(OrderItem).filter(OrderItem.id == item.order_item_id).first()
-        items_data.append(
-            OrderFulfillmentItemResponse(
-                id=item.id,
-                fulfillment_id=item.fulfillment_id,
-                order_item_id=item.order_item_id,
-                quantity=item.quantity,
-                order_item_product_name=order_item.product_name if order_item else None,
-            )
-        )
-
-    fulfillment_dict = {
-        "id": fulfillment.id,
-        "order_id": fulfillment.order_id,
-        "nursery_id": fulfillment.nursery_id,
-        "nursery_name": fulfillment.nursery.internal_name if fulfillment.nursery else None,
-        "status": fulfillment.status,
-        "delivery_name": fulfillment.delivery_name,
-        "delivery_phone": fulfillment.delivery_phone,
-        "delivery_notes": fulfillment.delivery_notes,
-        "created_at": fulfillment.created_at.isoformat(),
-        "updated_at": fulfillment.updated_at.isoformat(),
-        "items": items_data,
-    }
-    return OrderFulfillmentResponse(**fulfillment_dict)
-
-
+    return OrderFulfillmentResponse(**_fulfillment_dict(fulfillment))
@@ -4,13 +4,13 @@ Super admin endpoints for system-wide management and monitoring.
 
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.dependencies import get_current_super_admin_user
 from app.core.security import get_password_hash
 from app.db.models import User, UserRole, Order, Product, Nursery
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.schemas.auth import UserResponse
 
 router = APIRouter(prefix="/super-admin", tags=["super-admin"])
@@ -19,32 +19,27 @@ router = APIRouter(prefix="/super-admin", tags=["super-admin"])
 @router.get("/metrics")
 async def get_system_metrics(
     current_user: User = Depends(get_current_super_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get system-wide metrics for the super admin dashboard."""
     # User counts by role
     user_counts = (
-        db.query(User.role, func.count(User.id))
-        .group_by(User.role)
-        .all()
-    )
+        await db.execute(select(User.role, func.count(User.id)).group_by(User.role))
+    ).all()
     users_by_role = {role.value: count for role, count in user_counts}
     
     # Order statistics
-    total_orders = db.query(func.count(Order.id)).scalar()
-    total_revenue = db.query(func.sum(Order.total_cents)).scalar() or 0
+    total_orders = await db.scalar(select(func.count(Order.id)))
+    total_revenue = await db.scalar(select(func.sum(Order.total_cents))) or 0
     
     # Product and nursery counts
-    total_products = db.query(func.count(Product.id)).scalar()
-    total_nurseries = db.query(func.count(Nursery.id)).scalar()
+    total_products = await db.scalar(select(func.count(Product.id)))
+    total_nurseries = await db.scalar(select(func.count(Nursery.id)))
     
     # Recent activity
     recent_orders = (
-        db.query(Order)
-        .order_by(Order.created_at.desc())
-        .limit(10)
-        .all()
-    )
+        await db.scalars(select(Order).order_by(Order.created_at.desc()).limit(10))
+    ).all()
     
     return {
         "users": {
@@ -78,12 +73,12 @@ async def get_system_metrics(
 @router.get("/users", response_model=List[UserResponse])
 async def list_all_users(
     current_user: User = Depends(get_current_super_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
     limit: int = 100,
 ):
     """List all users in the system."""
-    users = db.query(User).offset(skip).limit(limit).all()
+    users = (await db.scalars(select(User).offset(skip).limit(limit))).all()
     return [UserResponse.model_validate(user) for user in users]
 
 
@@ -91,10 +86,10 @@ async def list_all_users(
 async def get_user_by_id(
     user_id: int,
     current_user: User = Depends(get_current_super_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get a specific user by ID."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -108,10 +103,10 @@ async def update_user_role(
     user_id: int,
     role: UserRole,
     current_user: User = Depends(get_current_super_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Update a user's role."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -126,8 +121,8 @@ async def update_user_role(
         )
     
     user.role = role
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return UserResponse.model_validate(user)
 
 
@@ -135,10 +130,10 @@ async def update_user_role(
 async def delete_user(
     user_id: int,
     current_user: User = Depends(get_current_super_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Delete a user from the system."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -152,8 +147,8 @@ async def delete_user(
             detail="Cannot delete your own account",
         )
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     return {"message": "User deleted successfully"}
 
 
@@ -164,11 +159,11 @@ async def create_user(
     role: UserRole,
     password: str = None,
     current_user: User = Depends(get_current_super_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Create a new user."""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await db.scalar(select(User).where(User.email == email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -182,7 +177,7 @@ async def create_user(
         hashed_password=get_password_hash(password) if password else None,
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return UserResponse.model_validate(new_user)
 
@@ -66,8 +66,28 @@ class NurseryAllocationSuggestion(BaseModel):
     available_items: List[dict]  # {order_item_id, product_name, requested_qty, available_qty}
 
 
+class AllocationPlan(BaseModel):
+    strategy: str  # "single_nursery" or "min_splits"
+    allocations: List[AllocationRequest]  # Can be posted as-is to /orders/admin/{order_id}/allocate
+    fully_allocated: bool
+    unallocated_items: List[AllocationItemRequest] = []  # Quantities no nursery could cover
+
+
 class AllocationSuggestionsResponse(BaseModel):
     order_id: int
     suggestions: List[NurseryAllocationSuggestion]
+    plan: Optional[AllocationPlan] = None
+
+
+class AutoAllocateRequest(BaseModel):
+    order_ids: Optional[List[int]] = None  # Defaults to every PLACED order
+    dry_run: bool = False  # Only compute plans, do not write fulfillments
+
+
+class OrderAllocationResult(BaseModel):
+    order_id: int
+    plan: AllocationPlan
 
 
+class AutoAllocateResponse(BaseModel):
+    results: List[OrderAllocationResult]
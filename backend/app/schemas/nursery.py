@@ -2,10 +2,10 @@
 Pydantic schemas for nurseries and nursery inventory.
 """
 
-from typing import Optional
+from typing import List, Optional
 from decimal import Decimal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class NurseryResponse(BaseModel):
@@ -54,3 +54,24 @@ class UpsertNurseryInventoryRequest(BaseModel):
     quantity: int
 
 
+
+
+class BulkInventoryRow(BaseModel):
+    nursery_id: int
+    product_id: int
+    quantity: int = Field(ge=0)
+
+
+class BulkInventoryRequest(BaseModel):
+    rows: List[BulkInventoryRow]
+
+
+class BulkInventoryRowError(BaseModel):
+    row: int  # 1-based position in the feed (CSV header not counted)
+    error: str
+
+
+class BulkInventoryResponse(BaseModel):
+    applied: int
+    affected_products: int
+    errors: List[BulkInventoryRowError] = []
@@ -4,7 +4,7 @@ Pydantic schemas for orders.
 
 from typing import Optional, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.db.models import OrderStatus
 
@@ -52,11 +52,54 @@ class OrderResponse(BaseModel):
         from_attributes = True
 
 
+class OrderListResponse(BaseModel):
+    items: list[OrderResponse]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; None on the last page
+
+
 class CreateOrderRequest(BaseModel):
     items: list[dict]  # Simplified for now: {product_id, quantity}
     shipping_address: AddressResponse
 
 
+MAX_QUOTE_LINES = 500
+
+
+class QuoteItem(BaseModel):
+    product_id: int
+    quantity: int = Field(default=1, ge=1)
+
+
+class QuoteRequest(BaseModel):
+    items: list[QuoteItem] = Field(min_length=1, max_length=MAX_QUOTE_LINES)
+    # Destination the shipping and tax rules are matched against; defaults apply without one
+    country: Optional[str] = None
+    commune: Optional[str] = None
+
+
+class QuoteLineResponse(BaseModel):
+    product_id: int
+    product_name: str
+    quantity: int
+    unit_price_cents: int
+    line_total_cents: int
+
+    class Config:
+        from_attributes = True
+
+
+class QuoteResponse(BaseModel):
+    lines: list[QuoteLineResponse]
+    subtotal_cents: int
+    shipping_cents: int
+    tax_cents: int
+    total_cents: int
+    currency: str = "USD"
+
+    class Config:
+        from_attributes = True
+
+
 class UpdateOrderStatusRequest(BaseModel):
     status: OrderStatus
 
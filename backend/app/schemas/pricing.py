@@ -0,0 +1,41 @@
+"""
+Pydantic schemas for shipping and tax pricing rules.
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from app.db.models import PricingRuleKind
+
+
+class PricingRuleResponse(BaseModel):
+    id: int
+    kind: PricingRuleKind
+    country: Optional[str] = None
+    commune: Optional[str] = None
+    min_subtotal_cents: int
+    amount_cents: Optional[int] = None
+    rate_bps: Optional[int] = None
+    active: bool
+    created_at: str
+    updated_at: str
+
+
+class CreatePricingRuleRequest(BaseModel):
+    kind: PricingRuleKind
+    country: Optional[str] = None  # None matches every country
+    commune: Optional[str] = None  # None matches every commune
+    min_subtotal_cents: int = Field(default=0, ge=0)
+    amount_cents: Optional[int] = Field(default=None, ge=0)  # Required for shipping rules
+    rate_bps: Optional[int] = Field(default=None, ge=0)  # Required for tax rules; 800 = 8%
+    active: bool = True
+
+
+class UpdatePricingRuleRequest(BaseModel):
+    country: Optional[str] = None
+    commune: Optional[str] = None
+    min_subtotal_cents: Optional[int] = Field(default=None, ge=0)
+    amount_cents: Optional[int] = Field(default=None, ge=0)
+    rate_bps: Optional[int] = Field(default=None, ge=0)
+    active: Optional[bool] = None
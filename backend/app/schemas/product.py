@@ -2,11 +2,13 @@
 Pydantic schemas for products.
 """
 
+from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import joinedload
 
-from app.db.models import PlantEnvironment, ProductKind
+from app.db.models import PlantEnvironment, Product, ProductKind
 
 
 class ProductAttributesResponse(BaseModel):
@@ -42,11 +44,67 @@ class ProductResponse(BaseModel):
         from_attributes = True
 
 
+# Loader options for the relationships ProductResponse reads. Both are
+# one-to-one, so they join into the product query itself: a page of products
+# is one statement, with no per-product lazy loads.
+PRODUCT_RESPONSE_OPTIONS = (
+    joinedload(Product.attributes),
+    joinedload(Product.inventory),
+)
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
 class ProductListResponse(BaseModel):
     items: list[ProductResponse]
-    total: int
+    total: Optional[int]  # None when the client passed include_total=false
     page: int
     page_size: int
+    total_is_estimate: bool = False
+    next_cursor: Optional[str] = None
+    # kind, plant_environment, color and size -> counts, when requested with facets=true
+    facets: Optional[dict[str, list[FacetCount]]] = None
+
+
+class ProductSuggestion(BaseModel):
+    slug: str
+    name: str
+
+
+# Per list in a ProductLookupRequest
+MAX_LOOKUP_REFS = 500
+
+
+class ProductLookupRequest(BaseModel):
+    ids: list[int] = Field(default_factory=list, max_length=MAX_LOOKUP_REFS)
+    slugs: list[str] = Field(default_factory=list, max_length=MAX_LOOKUP_REFS)
+
+
+class ProductRefs(BaseModel):
+    ids: list[int] = []
+    slugs: list[str] = []
+
+
+class ProductLookupResponse(BaseModel):
+    items: list[ProductResponse]  # active products, in request order (ids, then slugs), each once
+    missing: ProductRefs
+    inactive: ProductRefs
+
+
+class ImageMatch(BaseModel):
+    distance: int  # bits between the photo's hash and the closest one registered for the product
+    product: ProductResponse
+
+
+class ProductImageResponse(BaseModel):
+    id: int
+    product_id: int
+    hash: str  # 16 hex digits
+    filename: Optional[str]
+    created_at: datetime
 
 
 class ProductAttributesRequest(BaseModel):
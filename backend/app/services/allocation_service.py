@@ -0,0 +1,232 @@
+"""
+Set-based allocation suggestions for orders.
+
+The stock of every nursery holding any product of an order is fetched in a
+single query; match tiers, per-nursery coverage and allocation plans are then
+computed in memory.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Address, Nursery, NurseryInventory, OrderItem
+from app.schemas.fulfillment import (
+    AllocationItemRequest,
+    AllocationPlan,
+    AllocationRequest,
+    NurseryAllocationSuggestion,
+)
+
+MATCH_SAME_COMMUNE = 1
+MATCH_SAME_CITY = 2
+MATCH_OTHER = 3
+
+PLAN_SINGLE_NURSERY = "single_nursery"
+PLAN_MIN_SPLITS = "min_splits"
+
+
+@dataclass
+class NurseryStock:
+    nursery_id: int
+    name: str
+    city: str
+    commune: Optional[str]
+    match_tier: int
+    stock: Dict[int, int] = field(default_factory=dict)  # product_id -> quantity on hand
+
+
+def match_tier(address: Address, city: str, commune: Optional[str]) -> int:
+    """1 = same commune, 2 = same city, 3 = other."""
+    if address.commune and commune and address.commune.lower() == commune.lower():
+        return MATCH_SAME_COMMUNE
+    if address.city.lower() == city.lower():
+        return MATCH_SAME_CITY
+    return MATCH_OTHER
+
+
+async def load_stock_matrix(db: AsyncSession, product_ids: Iterable[int]) -> List[NurseryStock]:
+    """Fetch the (nursery x product) stock matrix for the given products in one query.
+
+    Match tiers are left at MATCH_OTHER; see with_match_tiers.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return []
+
+    rows = await db.execute(
+        select(
+            Nursery.id,
+            Nursery.internal_name,
+            Nursery.city,
+            Nursery.commune,
+            NurseryInventory.product_id,
+            NurseryInventory.quantity,
+        )
+        .join(NurseryInventory, NurseryInventory.nursery_id == Nursery.id)
+        .where(NurseryInventory.product_id.in_(product_ids), NurseryInventory.quantity > 0)
+        .order_by(Nursery.id)
+    )
+
+    nurseries: Dict[int, NurseryStock] = {}
+    for nursery_id, name, city, commune, product_id, quantity in rows:
+        nursery = nurseries.get(nursery_id)
+        if nursery is None:
+            nursery = nurseries[nursery_id] = NurseryStock(
+                nursery_id=nursery_id, name=name, city=city, commune=commune, match_tier=MATCH_OTHER
+            )
+        nursery.stock[product_id] = quantity
+    return list(nurseries.values())
+
+
+def with_match_tiers(nurseries: Sequence[NurseryStock], address: Address) -> List[NurseryStock]:
+    """Copies of `nurseries` with match tiers relative to `address` (stock is shared)."""
+    return [
+        NurseryStock(
+            nursery_id=n.nursery_id,
+            name=n.name,
+            city=n.city,
+            commune=n.commune,
+            match_tier=match_tier(address, n.city, n.commune),
+            stock=n.stock,
+        )
+        for n in nurseries
+    ]
+
+
+async def load_nursery_stock(
+    db: AsyncSession, address: Address, product_ids: Iterable[int]
+) -> List[NurseryStock]:
+    """Stock matrix for one order's products, with match tiers for its address."""
+    return with_match_tiers(await load_stock_matrix(db, product_ids), address)
+
+
+def build_suggestions(
+    order_items: Sequence[OrderItem], nurseries: Sequence[NurseryStock]
+) -> List[NurseryAllocationSuggestion]:
+    """Per-nursery coverage of the order, best match tier and widest coverage first."""
+    suggestions = []
+    for nursery in nurseries:
+        available_items = [
+            {
+                "order_item_id": item.id,
+                "product_name": item.product_name,
+                "requested_qty": item.quantity,
+                "available_qty": min(nursery.stock[item.product_id], item.quantity),
+            }
+            for item in order_items
+            if item.product_id in nursery.stock
+        ]
+        if available_items:
+            suggestions.append(
+                NurseryAllocationSuggestion(
+                    nursery_id=nursery.nursery_id,
+                    nursery_name=nursery.name,
+                    city=nursery.city,
+                    commune=nursery.commune,
+                    match_tier=nursery.match_tier,
+                    available_items=available_items,
+                )
+            )
+
+    suggestions.sort(key=lambda s: (s.match_tier, -len(s.available_items), s.nursery_id))
+    return suggestions
+
+
+def _take(
+    nursery: NurseryStock, remaining: Dict[int, int], products: Dict[int, int]
+) -> Dict[int, int]:
+    """What `nursery` can ship of the remaining quantities (order_item_id -> qty).
+
+    Order lines sharing a product draw on the same stock.
+    """
+    stock_left = dict(nursery.stock)
+    taken = {}
+    for order_item_id, quantity in remaining.items():
+        product_id = products[order_item_id]
+        available = min(quantity, stock_left.get(product_id, 0))
+        if available > 0:
+            taken[order_item_id] = available
+            stock_left[product_id] -= available
+    return taken
+
+
+def _plan(
+    strategy: str,
+    chosen: List[Tuple[NurseryStock, Dict[int, int]]],
+    remaining: Dict[int, int],
+) -> AllocationPlan:
+    unallocated = [
+        AllocationItemRequest(order_item_id=order_item_id, quantity=quantity)
+        for order_item_id, quantity in remaining.items()
+        if quantity > 0
+    ]
+    return AllocationPlan(
+        strategy=strategy,
+        allocations=[
+            AllocationRequest(
+                nursery_id=nursery.nursery_id,
+                items=[
+                    AllocationItemRequest(order_item_id=order_item_id, quantity=quantity)
+                    for order_item_id, quantity in taken.items()
+                ],
+            )
+            for nursery, taken in chosen
+        ],
+        fully_allocated=not unallocated,
+        unallocated_items=unallocated,
+    )
+
+
+def plan_single_nursery(
+    order_items: Sequence[OrderItem], nurseries: Sequence[NurseryStock]
+) -> AllocationPlan:
+    """Ship everything from one nursery: the one covering the most units, nearest first."""
+    remaining = {item.id: item.quantity for item in order_items if item.product_id}
+    products = {item.id: item.product_id for item in order_items if item.product_id}
+
+    best: Optional[Tuple[NurseryStock, Dict[int, int]]] = None
+    best_key = None
+    for nursery in nurseries:
+        taken = _take(nursery, remaining, products)
+        key = (-sum(taken.values()), nursery.match_tier, nursery.nursery_id)
+        if taken and (best_key is None or key < best_key):
+            best, best_key = (nursery, taken), key
+
+    if best is None:
+        return _plan(PLAN_SINGLE_NURSERY, [], remaining)
+    for order_item_id, quantity in best[1].items():
+        remaining[order_item_id] -= quantity
+    return _plan(PLAN_SINGLE_NURSERY, [best], remaining)
+
+
+def plan_min_splits(
+    order_items: Sequence[OrderItem], nurseries: Sequence[NurseryStock]
+) -> AllocationPlan:
+    """Cover the order with as few nurseries as possible.
+
+    Greedy set cover: repeatedly pick the nursery shipping the most remaining
+    units, preferring the better match tier on ties. A nursery that covers the
+    whole order on its own always wins the first round.
+    """
+    remaining = {item.id: item.quantity for item in order_items if item.product_id}
+    products = {item.id: item.product_id for item in order_items if item.product_id}
+
+    chosen: List[Tuple[NurseryStock, Dict[int, int]]] = []
+    candidates = list(nurseries)
+    while any(remaining.values()) and candidates:
+        best_index, best_taken, best_key = None, None, None
+        for index, nursery in enumerate(candidates):
+            taken = _take(nursery, remaining, products)
+            key = (-sum(taken.values()), nursery.match_tier, nursery.nursery_id)
+            if taken and (best_key is None or key < best_key):
+                best_index, best_taken, best_key = index, taken, key
+        if best_index is None:
+            break
+        chosen.append((candidates.pop(best_index), best_taken))
+        for order_item_id, quantity in best_taken.items():
+            remaining[order_item_id] -= quantity
+
+    return _plan(PLAN_MIN_SPLITS, chosen, remaining)
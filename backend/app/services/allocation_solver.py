@@ -0,0 +1,304 @@
+"""
+Automatic allocation of orders to nurseries.
+
+solve_order finds, for one order, the allocation with the fewest fulfillments
+and then the lowest total match tier (branch and bound over the nurseries that
+stock any of its products, seeded with a greedy solution). solve_batch
+allocates many orders against shared stock: when several orders want the same
+(nursery, product) stock, the order that would lose the most by being denied
+it is served first, and the others are re-solved on what is left.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.db.models import Order
+from app.schemas.fulfillment import AllocationItemRequest, AllocationPlan, AllocationRequest
+from app.services.allocation_service import NurseryStock, match_tier
+
+Cell = Tuple[int, int]  # (nursery_id, product_id)
+Cost = Tuple[int, int]  # (fulfillments, sum of match tiers)
+
+PLAN_SOLVER = "solver"
+
+# Node budget for the exact search of one order; past it the best solution
+# found so far (at worst the greedy seed) is returned.
+DEFAULT_NODE_BUDGET = 20_000
+
+# Weight of one extra fulfillment when comparing costs as scalars (regrets).
+_FULFILLMENT_WEIGHT = 1_000
+
+
+@dataclass
+class OrderDemand:
+    order_id: int
+    lines: List[Tuple[int, int, int]]  # (order_item_id, product_id, quantity)
+    tiers: Dict[int, int]  # nursery_id -> match tier for the order's address
+
+    @property
+    def needs(self) -> Dict[int, int]:
+        needs: Dict[int, int] = {}
+        for _, product_id, quantity in self.lines:
+            needs[product_id] = needs.get(product_id, 0) + quantity
+        return needs
+
+
+@dataclass
+class OrderSolution:
+    order_id: int
+    allocations: Dict[int, Dict[int, int]]  # nursery_id -> {order_item_id: quantity}
+    cost: Cost
+    usage: Dict[Cell, int] = field(default_factory=dict)
+
+    def fits(self, stock: Dict[Cell, int]) -> bool:
+        return all(stock.get(cell, 0) >= quantity for cell, quantity in self.usage.items())
+
+
+def demands_for_orders(orders: Iterable[Order], nurseries: Sequence[NurseryStock]) -> List[OrderDemand]:
+    """Build solver input from orders loaded with items and shipping address."""
+    demands = []
+    for order in orders:
+        address = order.shipping_address
+        lines = [(item.id, item.product_id, item.quantity) for item in order.items if item.product_id]
+        if address is None or not lines:
+            continue
+        demands.append(
+            OrderDemand(
+                order_id=order.id,
+                lines=lines,
+                tiers={n.nursery_id: match_tier(address, n.city, n.commune) for n in nurseries},
+            )
+        )
+    return demands
+
+
+def stock_cells(nurseries: Sequence[NurseryStock]) -> Dict[Cell, int]:
+    return {
+        (n.nursery_id, product_id): quantity
+        for n in nurseries
+        for product_id, quantity in n.stock.items()
+    }
+
+
+def _coverage(vector: Dict[int, int], remaining: Dict[int, int]) -> int:
+    return sum(min(quantity, remaining.get(product_id, 0)) for product_id, quantity in vector.items())
+
+
+def _subtract(vector: Dict[int, int], remaining: Dict[int, int]) -> Dict[int, int]:
+    left = dict(remaining)
+    for product_id, quantity in vector.items():
+        if product_id in left:
+            left[product_id] -= min(quantity, left[product_id])
+            if not left[product_id]:
+                del left[product_id]
+    return left
+
+
+def _greedy(candidates: List[int], vectors: Dict[int, Dict[int, int]], needs: Dict[int, int]) -> List[int]:
+    """Most remaining units first; candidates are already in preference order for ties."""
+    remaining, chosen = dict(needs), []
+    pool = list(candidates)
+    while remaining:
+        best = max(pool, key=lambda n: _coverage(vectors[n], remaining))
+        pool.remove(best)
+        chosen.append(best)
+        remaining = _subtract(vectors[best], remaining)
+    return chosen
+
+
+def _split_lines(demand: OrderDemand, nursery_ids: List[int], stock: Dict[Cell, int]) -> OrderSolution:
+    """Assign order lines to the chosen nurseries, nearest first."""
+    stock_left = {(n, p): stock.get((n, p), 0) for n in nursery_ids for p in demand.needs}
+    allocations: Dict[int, Dict[int, int]] = {}
+    usage: Dict[Cell, int] = {}
+    for nursery_id in sorted(nursery_ids, key=lambda n: (demand.tiers[n], n)):
+        for order_item_id, product_id, quantity in demand.lines:
+            already = sum(a.get(order_item_id, 0) for a in allocations.values())
+            take = min(quantity - already, stock_left[(nursery_id, product_id)])
+            if take > 0:
+                allocations.setdefault(nursery_id, {})[order_item_id] = take
+                stock_left[(nursery_id, product_id)] -= take
+                usage[(nursery_id, product_id)] = usage.get((nursery_id, product_id), 0) + take
+    cost = (len(allocations), sum(demand.tiers[n] for n in allocations))
+    return OrderSolution(order_id=demand.order_id, allocations=allocations, cost=cost, usage=usage)
+
+
+def solve_order(
+    demand: OrderDemand, stock: Dict[Cell, int], node_budget: int = DEFAULT_NODE_BUDGET
+) -> Optional[OrderSolution]:
+    """Fewest fulfillments, then lowest total match tier; None if stock cannot cover the order."""
+    needs = demand.needs
+    tiers = demand.tiers
+
+    # What each nursery can contribute to each needed product, clipped to the need.
+    vectors: Dict[int, Dict[int, int]] = {}
+    for nursery_id in tiers:
+        vector = {}
+        for product_id, quantity in needs.items():
+            available = stock.get((nursery_id, product_id), 0)
+            if available > 0:
+                vector[product_id] = min(available, quantity)
+        if vector:
+            vectors[nursery_id] = vector
+    for product_id, quantity in needs.items():
+        if sum(v.get(product_id, 0) for v in vectors.values()) < quantity:
+            return None
+
+    # Drop a nursery when an earlier one (no worse tier) alone covers the full need
+    # of every product it could supply: it can always take its place.
+    candidates = []
+    covers_fully = []
+    for nursery_id in sorted(vectors, key=lambda n: (tiers[n], -sum(vectors[n].values()), n)):
+        supplies = vectors[nursery_id].keys()
+        if any(supplies <= full for full in covers_fully):
+            continue
+        candidates.append(nursery_id)
+        covers_fully.append({p for p, q in vectors[nursery_id].items() if q == needs[p]})
+
+    # Upper bound on what any candidate from index i onwards can cover.
+    suffix_cover = [0] * (len(candidates) + 1)
+    for index in range(len(candidates) - 1, -1, -1):
+        suffix_cover[index] = max(suffix_cover[index + 1], sum(vectors[candidates[index]].values()))
+
+    best_set = _greedy(candidates, vectors, needs)
+    best_cost: Cost = (len(best_set), sum(tiers[n] for n in best_set))
+    nodes = 0
+
+    def search(start: int, remaining: Dict[int, int], chosen: List[int], tier_sum: int) -> None:
+        nonlocal best_set, best_cost, nodes
+        nodes += 1
+        if nodes > node_budget:
+            return
+        if not remaining:
+            if (len(chosen), tier_sum) < best_cost:
+                best_set, best_cost = list(chosen), (len(chosen), tier_sum)
+            return
+        if start >= len(candidates):
+            return
+        # Lower bound: each further nursery covers at most suffix_cover units and
+        # costs at least the tier of the next candidate (candidates are tier-sorted).
+        units = sum(remaining.values())
+        extra = math.ceil(units / min(units, suffix_cover[start]))
+        if (len(chosen) + extra, tier_sum + extra * tiers[candidates[start]]) >= best_cost:
+            return
+        for index in range(start, len(candidates)):
+            nursery_id = candidates[index]
+            if (len(chosen) + 1, tier_sum + tiers[nursery_id]) >= best_cost:
+                # Later candidates have the same or a worse tier.
+                break
+            if _coverage(vectors[nursery_id], remaining) == 0:
+                continue
+            chosen.append(nursery_id)
+            search(index + 1, _subtract(vectors[nursery_id], remaining), chosen, tier_sum + tiers[nursery_id])
+            chosen.pop()
+
+    search(0, needs, [], 0)
+    return _split_lines(demand, best_set, stock)
+
+
+def _scalar(cost: Optional[Cost]) -> float:
+    if cost is None:
+        return math.inf
+    fulfillments, tier_sum = cost
+    return fulfillments * _FULFILLMENT_WEIGHT + tier_sum
+
+
+def solve_batch(
+    demands: Sequence[OrderDemand], stock: Dict[Cell, int], node_budget: int = DEFAULT_NODE_BUDGET
+) -> Dict[int, Optional[OrderSolution]]:
+    """Allocate every order against shared stock; None for orders that cannot be covered.
+
+    Each order first gets its best solution on the full stock. Orders whose
+    solutions fit together are committed as they are. Where solutions compete
+    for the same cells, orders are committed by decreasing regret (cost
+    increase if denied the contested cells); the rest are re-solved on the
+    remaining stock and the round repeats.
+    """
+    stock = dict(stock)
+    by_id = {d.order_id: d for d in demands}
+    results: Dict[int, Optional[OrderSolution]] = {}
+    solutions: Dict[int, OrderSolution] = {}
+    for demand in demands:
+        solution = solve_order(demand, stock, node_budget)
+        if solution is None:
+            results[demand.order_id] = None
+        else:
+            solutions[demand.order_id] = solution
+
+    def commit(order_id: int) -> None:
+        solution = solutions.pop(order_id)
+        for cell, quantity in solution.usage.items():
+            stock[cell] -= quantity
+        results[order_id] = solution
+
+    while solutions:
+        wanted: Dict[Cell, int] = {}
+        for solution in solutions.values():
+            for cell, quantity in solution.usage.items():
+                wanted[cell] = wanted.get(cell, 0) + quantity
+        contested = {cell for cell, quantity in wanted.items() if quantity > stock.get(cell, 0)}
+
+        contenders = []
+        for order_id in sorted(solutions):
+            if contested.isdisjoint(solutions[order_id].usage):
+                commit(order_id)
+            else:
+                contenders.append(order_id)
+        if not contenders:
+            break
+
+        regrets = {}
+        for order_id in contenders:
+            denied = dict(stock)
+            for cell in contested.intersection(solutions[order_id].usage):
+                denied[cell] = 0
+            alternative = solve_order(by_id[order_id], denied, node_budget)
+            regrets[order_id] = _scalar(alternative.cost if alternative else None) - _scalar(
+                solutions[order_id].cost
+            )
+
+        # Highest regret first, older orders first on ties. A solution that still
+        # fits is still optimal for its order (stock only shrinks), so keep it.
+        for order_id in sorted(contenders, key=lambda order_id: (-regrets[order_id], order_id)):
+            if solutions[order_id].fits(stock):
+                commit(order_id)
+
+        for order_id in list(solutions):
+            if not solutions[order_id].fits(stock):
+                solution = solve_order(by_id[order_id], stock, node_budget)
+                if solution is None:
+                    del solutions[order_id]
+                    results[order_id] = None
+                else:
+                    solutions[order_id] = solution
+
+    return results
+
+
+def solution_plan(demand: OrderDemand, solution: Optional[OrderSolution]) -> AllocationPlan:
+    """Express a solution as an AllocationPlan; an unsolved order is left entirely unallocated."""
+    if solution is None:
+        return AllocationPlan(
+            strategy=PLAN_SOLVER,
+            allocations=[],
+            fully_allocated=False,
+            unallocated_items=[
+                AllocationItemRequest(order_item_id=order_item_id, quantity=quantity)
+                for order_item_id, _, quantity in demand.lines
+            ],
+        )
+    return AllocationPlan(
+        strategy=PLAN_SOLVER,
+        allocations=[
+            AllocationRequest(
+                nursery_id=nursery_id,
+                items=[
+                    AllocationItemRequest(order_item_id=order_item_id, quantity=quantity)
+                    for order_item_id, quantity in items.items()
+                ],
+            )
+            for nursery_id, items in sorted(solution.allocations.items(), key=lambda a: (demand.tiers[a[0]], a[0]))
+        ],
+        fully_allocated=True,
+    )
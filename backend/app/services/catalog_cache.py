@@ -0,0 +1,229 @@
+"""
+In-process read cache for the public catalog endpoints.
+
+Listing pages are keyed on their normalised filters, listing totals on
+the filters alone, facet counts on the search query and price range,
+product pages on slug and related-product lists on slug and limit.
+Entries are evicted least-recently-used beyond CATALOG_CACHE_SIZE and
+expire after CATALOG_CACHE_TTL_SECONDS.
+
+Writers call invalidate_on_commit with what they changed; the entries are
+dropped only once the session commits (nothing happens on rollback), so a
+concurrent reader cannot re-cache the pre-commit state:
+
+* product created or edited: its product page and every listing page and
+  total and facet counts, since any edit can change which pages the
+  product belongs on;
+* stock changed (apply_global_deltas): its product page and only the
+  listing pages that contain it;
+* a product came into or ran out of stock at a location
+  (apply_availability_deltas): every in_stock_near listing page, total
+  and facet count, since those may gain or lose it.
+
+The cache is per process. With several workers, a write only invalidates
+the worker that handled it; the TTL bounds how stale the others can get.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+_PENDING_KEY = "catalog_cache_pending"
+
+# First element of every cache key
+LISTING = "listing"
+PRODUCT = "product"
+COUNT = "count"
+FACETS = "facets"
+RELATED = "related"
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+    product_ids: Tuple[int, ...]
+
+
+class CatalogCache:
+    """Size-bounded LRU with a TTL, indexed by the product ids each entry holds."""
+
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._by_product: Dict[int, Set[Hashable]] = {}
+        # Bumped by every invalidation; see put(generation=...)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= self._clock():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def put(self, key: Hashable, value: Any, product_ids: Iterable[int] = (), generation: Optional[int] = None) -> None:
+        """Store `value`, unless an invalidation happened since `generation` was read.
+
+        Readers take cache.generation before querying, so a result computed from
+        data that a write has since replaced is not cached.
+        """
+        if self.max_size <= 0 or (generation is not None and generation != self.generation):
+            return
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(value=value, expires_at=self._clock() + self.ttl_seconds, product_ids=tuple(product_ids))
+        self._entries[key] = entry
+        for product_id in entry.product_ids:
+            self._by_product.setdefault(product_id, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, product_ids: Iterable[int] = (), listings: bool = False, nearby: bool = False) -> None:
+        """Drop every entry holding one of `product_ids`, and every listing page, total and facet count if `listings`.
+
+        `nearby` drops only the listing pages, totals and facet counts filtered by in_stock_near.
+        """
+        self.generation += 1
+        doomed: Set[Hashable] = set()
+        for product_id in product_ids:
+            doomed |= self._by_product.get(product_id, set())
+        if listings or nearby:
+            # Listing, count and facet keys carry their in_stock_near location second
+            doomed |= {
+                key for key in self._entries if key[0] in (LISTING, COUNT, FACETS) and (listings or key[1] is not None)
+            }
+        for key in doomed:
+            self._remove(key)
+        self.invalidations += len(doomed)
+
+    def clear(self) -> None:
+        # Like invalidate: a fill that started before the clear must not store its result
+        self.generation += 1
+        self._entries.clear()
+        self._by_product.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        for product_id in entry.product_ids:
+            keys = self._by_product.get(product_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_product[product_id]
+
+
+cache = CatalogCache(settings.catalog_cache_size, settings.catalog_cache_ttl_seconds)
+
+
+def listing_key(
+    kind: Optional[str],
+    plant_environment: Optional[str],
+    q: Optional[str],
+    page: int,
+    page_size: int,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    color: Optional[str] = None,
+    size: Optional[str] = None,
+    facets: bool = False,
+    sort: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    near: Optional[str] = None,
+    semantic: bool = False,
+) -> Tuple:
+    return (
+        LISTING, near, kind, plant_environment, color, size, min_price, max_price, q, semantic,
+        sort, page, page_size, cursor, include_total, facets,
+    )
+
+
+def count_key(
+    kind: Optional[str],
+    plant_environment: Optional[str],
+    q: Optional[str],
+    color: Optional[str] = None,
+    size: Optional[str] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    near: Optional[str] = None,
+    semantic: bool = False,
+) -> Tuple:
+    return (COUNT, near, kind, plant_environment, color, size, min_price, max_price, q, semantic)
+
+
+def facets_key(
+    q: Optional[str],
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    near: Optional[str] = None,
+    semantic: bool = False,
+) -> Tuple:
+    return (FACETS, near, q, semantic, min_price, max_price)
+
+
+def product_key(slug: str) -> Tuple:
+    return (PRODUCT, slug)
+
+
+def related_key(slug: str, limit: int) -> Tuple:
+    return (RELATED, slug, limit)
+
+
+def invalidate_on_commit(
+    db: AsyncSession, product_ids: Iterable[int] = (), listings: bool = False, nearby: bool = False
+) -> None:
+    """Queue invalidations for when `db` commits.
+
+    product_ids drops the product pages and listing pages holding those
+    products; listings drops every listing page, total and facet count;
+    nearby drops those filtered by in_stock_near.
+    """
+    pending = db.sync_session.info.setdefault(
+        _PENDING_KEY, {"product_ids": set(), "listings": False, "nearby": False}
+    )
+    pending["product_ids"].update(product_ids)
+    pending["listings"] = pending["listings"] or listings
+    pending["nearby"] = pending["nearby"] or nearby
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        cache.invalidate(pending["product_ids"], pending["listings"], pending["nearby"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
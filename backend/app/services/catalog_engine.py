@@ -0,0 +1,512 @@
+"""
+In-process columnar catalog for the storefront listing.
+
+With CATALOG_BACKEND=memory, list_products answers from NumPy columns
+holding every product (active or not) instead of querying the database:
+filters, search, ordering, pagination and facets are boolean masks and
+sorts over those arrays. Only the returned page is turned into
+ProductResponse objects.
+
+The engine refreshes incrementally, re-reading products whose own or
+inventory updated_at is past the newest stamp it has seen (minus
+REFRESH_OVERLAP, so rows from transactions that committed late are not
+missed), and sort=popular scores whose product_popularity row changed
+since the newest it has seen. It refreshes before answering when:
+
+* a catalog write was committed in this process (the catalog cache
+  generation moved on), or
+* CATALOG_ENGINE_REFRESH_SECONDS have passed, which bounds staleness for
+  writes handled by other workers.
+
+Names sort by code point (as SQLite and the C collation do); a PostgreSQL
+database with a linguistic collation may order some names differently.
+
+Search mirrors the PostgreSQL semantics (every term matches a word prefix
+in name or description) with the SQLite fallback's simple rank: name
+prefix, then all terms in the name, then the rest. Each row keeps the
+vocabulary ids of its distinct words (name first, at most MAX_ROW_WORDS),
+so a term becomes a lookup table over the vocabulary gathered across that
+matrix. Products are never hard deleted (deactivated instead), so updates
+are all the engine needs to see.
+"""
+
+import asyncio
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import Inventory, PlantEnvironment, Product, ProductKind, ProductPopularity
+from app.schemas.product import PRODUCT_RESPONSE_OPTIONS, ProductResponse
+from app.services import catalog_cache
+from app.services.catalog_facets import FacetRow
+
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+# Distinct words indexed per product; later description words are not searchable
+MAX_ROW_WORDS = 64
+
+_KINDS = list(ProductKind)
+_ENVIRONMENTS = list(PlantEnvironment)
+_BOTH = _ENVIRONMENTS.index(PlantEnvironment.BOTH)
+_NONE = -1
+
+
+def _words(text: Optional[str]) -> List[str]:
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def _stamp(product: Product) -> datetime:
+    if product.inventory is None:
+        return product.updated_at
+    return max(product.updated_at, product.inventory.updated_at)
+
+
+class EnginePage(NamedTuple):
+    items: List[ProductResponse]
+    stamps: List[Tuple[int, datetime]]
+    total: int
+    next_after: Optional[Tuple[Any, int]]  # (sort value, id) of the last row when there is a next page
+    facet_rows: Optional[Tuple[FacetRow, ...]]
+
+
+class _Dictionary:
+    """Codes for the free-text color and size attributes."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NONE
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+    def decode(self, code: int) -> Optional[str]:
+        return None if code == _NONE else self.values[code]
+
+
+class _Vocabulary:
+    """Word ids for the token matrix; id 0 pads short rows."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {"": 0}
+        self._sorted_words: Optional[np.ndarray] = None
+        self._sorted_ids: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def encode(self, words: List[str]) -> List[int]:
+        size = len(self._ids)
+        ids = [self._ids.setdefault(word, len(self._ids)) for word in words]
+        if len(self._ids) != size:
+            self._sorted_words = None
+        return ids
+
+    def prefix_hits(self, term: str) -> np.ndarray:
+        """Lookup table over word ids: True for words starting with `term`."""
+        if self._sorted_words is None:
+            words = np.array(list(self._ids), dtype=str)
+            order = np.argsort(words)
+            self._sorted_words, self._sorted_ids = words[order], order
+        low = np.searchsorted(self._sorted_words, term, side="left")
+        high = np.searchsorted(self._sorted_words, term + "\U0010ffff", side="left")
+        hits = np.zeros(len(self._ids), dtype=bool)
+        hits[self._sorted_ids[low:high]] = True
+        hits[0] = False
+        return hits
+
+
+class CatalogEngine:
+    """Every product as one row across parallel columns, sorted by id."""
+
+    # (attribute, dtype) of the NumPy columns
+    _ARRAYS = (
+        ("ids", np.int64),
+        ("active", np.bool_),
+        ("kind", np.int8),
+        ("environment", np.int8),
+        ("color", np.int32),
+        ("size", np.int32),
+        ("price_cents", np.int64),
+        ("quantity", np.int64),  # -1 without an inventory row
+        ("stamp", "datetime64[us]"),
+        ("created", "datetime64[us]"),
+        ("popularity", np.float64),  # product_popularity.score, 0 for products never sold
+        ("name_length", np.int16),  # leading entries of the row's tokens that come from the name
+    )
+    # Only needed to build responses for the returned page
+    _LISTS = ("slug", "name", "description", "currency", "care_instructions", "has_attributes")
+
+    def __init__(self, refresh_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._lock = asyncio.Lock()
+        self._colors = _Dictionary()
+        self._sizes = _Dictionary()
+        self._vocabulary = _Vocabulary()
+        self._row_of: Dict[int, int] = {}
+        self._scores: Dict[int, float] = {}  # product_popularity.score by product id
+        for name, dtype in self._ARRAYS:
+            setattr(self, name, np.empty(0, dtype=dtype))
+        for name in self._LISTS:
+            setattr(self, f"_{name}", [])
+        self.tokens = np.zeros((0, 1), dtype=np.int32)
+        self._names: Optional[np.ndarray] = None  # for sort=name; rebuilt after name changes
+        self.watermark: Optional[datetime] = None
+        self.popularity_watermark: Optional[datetime] = None
+        self._generation: Optional[int] = None
+        self._refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # -- loading ---------------------------------------------------------
+
+    def is_stale(self) -> bool:
+        return (
+            self._refreshed_at is None
+            or self._generation != catalog_cache.cache.generation
+            or self._clock() - self._refreshed_at >= self.refresh_seconds
+        )
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        if self.is_stale():
+            async with self._lock:
+                if self.is_stale():
+                    await self.refresh(db)
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """Load products changed since the watermark (all of them the first time); returns how many."""
+        generation = catalog_cache.cache.generation
+        query = select(Product).options(*PRODUCT_RESPONSE_OPTIONS).order_by(Product.id)
+        if self.watermark is not None:
+            since = self.watermark - REFRESH_OVERLAP
+            query = query.where(
+                or_(
+                    Product.updated_at >= since,
+                    Product.id.in_(select(Inventory.product_id).where(Inventory.updated_at >= since)),
+                )
+            )
+        products = (await db.scalars(query)).all()
+        self.apply(products)
+        await self._refresh_popularity(db)
+        self._generation = generation
+        self._refreshed_at = self._clock()
+        return len(products)
+
+    async def _refresh_popularity(self, db: AsyncSession) -> None:
+        query = select(ProductPopularity.product_id, ProductPopularity.score, ProductPopularity.updated_at)
+        if self.popularity_watermark is not None:
+            query = query.where(ProductPopularity.updated_at >= self.popularity_watermark - REFRESH_OVERLAP)
+        rows = (await db.execute(query)).all()
+        for product_id, score, _ in rows:
+            self._scores[product_id] = score
+            row = self._row_of.get(product_id)
+            if row is not None:
+                self.popularity[row] = score
+        if rows:
+            newest = max(row.updated_at for row in rows)
+            self.popularity_watermark = (
+                newest if self.popularity_watermark is None else max(self.popularity_watermark, newest)
+            )
+
+    def apply(self, products: Sequence[Product]) -> None:
+        """Insert or overwrite rows for `products`."""
+        if products:
+            newest = max(_stamp(product) for product in products)
+            self.watermark = newest if self.watermark is None else max(self.watermark, newest)
+        new_rows = []
+        for product in products:
+            row = self._row_of.get(product.id)
+            values = self._row_values(product)
+            if row is None:
+                new_rows.append(values)
+                continue
+            arrays, tokens, lists = values
+            if self._name[row] != product.name:
+                self._names = None
+            for (name, _), value in zip(self._ARRAYS, arrays):
+                getattr(self, name)[row] = value
+            self._widen_tokens(len(tokens))
+            self.tokens[row] = 0
+            self.tokens[row, :len(tokens)] = tokens
+            for name, value in zip(self._LISTS, lists):
+                getattr(self, f"_{name}")[row] = value
+
+        if new_rows:
+            start = len(self)
+            for index, (name, dtype) in enumerate(self._ARRAYS):
+                column = np.array([values[0][index] for values in new_rows], dtype=dtype)
+                setattr(self, name, np.concatenate([getattr(self, name), column]))
+            self._widen_tokens(max(len(values[1]) for values in new_rows))
+            tokens = np.zeros((len(new_rows), self.tokens.shape[1]), dtype=np.int32)
+            for index, values in enumerate(new_rows):
+                tokens[index, :len(values[1])] = values[1]
+            self.tokens = np.concatenate([self.tokens, tokens])
+            for index, name in enumerate(self._LISTS):
+                getattr(self, f"_{name}").extend(values[2][index] for values in new_rows)
+            for row in range(start, len(self)):
+                self._row_of[int(self.ids[row])] = row
+            self._names = None
+            # New rows arrive in id order; a late-committed older id needs a re-sort
+            if start and self.ids[start] < self.ids[start - 1]:
+                self._sort_by_id()
+
+    def _widen_tokens(self, width: int) -> None:
+        if width > self.tokens.shape[1]:
+            self.tokens = np.pad(self.tokens, ((0, 0), (0, width - self.tokens.shape[1])))
+
+    def _row_values(self, product: Product) -> Tuple[tuple, List[int], tuple]:
+        attributes, inventory = product.attributes, product.inventory
+        arrays = (
+            product.id,
+            product.active,
+            _KINDS.index(product.kind),
+            _ENVIRONMENTS.index(attributes.plant_environment) if attributes and attributes.plant_environment else _NONE,
+            self._colors.encode(attributes.color if attributes else None),
+            self._sizes.encode(attributes.size if attributes else None),
+            product.price_cents,
+            inventory.quantity if inventory is not None else -1,
+            np.datetime64(_stamp(product), "us"),
+            np.datetime64(product.created_at, "us"),
+            self._scores.get(product.id, 0.0),
+        )
+        name_words = list(dict.fromkeys(_words(product.name)))[:MAX_ROW_WORDS]
+        words = list(dict.fromkeys(name_words + _words(product.description)))[:MAX_ROW_WORDS]
+        arrays += (len(name_words),)
+        lists = (
+            product.slug,
+            product.name,
+            product.description,
+            product.currency,
+            attributes.care_instructions if attributes else None,
+            attributes is not None,
+        )
+        return arrays, self._vocabulary.encode(words), lists
+
+    def _sort_by_id(self) -> None:
+        self._names = None
+        order = np.argsort(self.ids, kind="stable")
+        for name, _ in self._ARRAYS:
+            setattr(self, name, getattr(self, name)[order])
+        self.tokens = self.tokens[order]
+        for name in self._LISTS:
+            column = getattr(self, f"_{name}")
+            setattr(self, f"_{name}", [column[i] for i in order])
+        self._row_of = {int(product_id): row for row, product_id in enumerate(self.ids)}
+
+    # -- queries ---------------------------------------------------------
+
+    def _search_mask(self, terms: List[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Rows matching every term, and their rank (None without terms)."""
+        mask = self.active.copy()
+        if not terms:
+            return mask, None
+        hits = [self._vocabulary.prefix_hits(term) for term in terms]
+        # Only the first term looks at every row; later terms check the survivors
+        rows = np.flatnonzero(mask)
+        for term_hits in hits:
+            rows = rows[term_hits[self.tokens[rows]].any(axis=1)]
+
+        tokens = self.tokens[rows]
+        in_name_position = np.arange(tokens.shape[1]) < self.name_length[rows, None]
+        in_name = np.ones(len(rows), dtype=bool)
+        for term_hits in hits:
+            in_name &= (term_hits[tokens] & in_name_position).any(axis=1)
+        name_prefix = hits[0][tokens[:, 0]] & (self.name_length[rows] > 0)
+        rank = np.zeros(len(self), dtype=np.int8)
+        rank[rows] = np.where(name_prefix, 3, np.where(in_name, 2, 1))
+        mask[:] = False
+        mask[rows] = True
+        return mask, rank
+
+    def page(
+        self,
+        *,
+        kind: Optional[ProductKind] = None,
+        plant_environment: Optional[PlantEnvironment] = None,
+        color: Optional[str] = None,
+        size: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        sort: Optional[str] = None,
+        terms: Optional[List[str]] = None,
+        searching: bool = False,
+        page: int = 1,
+        page_size: int = 20,
+        after: Optional[Tuple[Any, int]] = None,
+        facets: bool = False,
+        product_ids: Optional[Sequence[int]] = None,
+        ranking: Optional[Sequence[int]] = None,
+    ) -> EnginePage:
+        """The same page list_products would return from SQL.
+
+        `searching` with no `terms` (a query without word characters)
+        matches nothing, like catalog_search.apply_search. `after` is a
+        decoded cursor: the (sort value, id) of the previous page's last row.
+        `product_ids` restricts the page to those products, like in_stock_near.
+        `ranking` (product ids, best first) replaces `terms`: only those
+        products match, ranked in that order, as for semantic search.
+        """
+        mask, rank = self._search_mask(terms or [])
+        if ranking is not None:
+            rows = np.array(
+                [self._row_of[product_id] for product_id in ranking if product_id in self._row_of], dtype=np.intp
+            )
+            mask[:] = False
+            mask[rows] = self.active[rows]
+            rank = np.zeros(len(self), dtype=np.int64)
+            rank[rows] = -np.arange(len(rows))
+        if searching and not terms:
+            mask[:] = False
+        if min_price is not None:
+            mask &= self.price_cents >= min_price
+        if max_price is not None:
+            mask &= self.price_cents <= max_price
+        if product_ids is not None:
+            mask &= np.isin(self.ids, np.fromiter(product_ids, dtype=self.ids.dtype))
+
+        facet_rows = self._facet_rows(mask) if facets else None
+
+        if kind is not None:
+            mask &= self.kind == _KINDS.index(kind)
+        if plant_environment is not None:
+            environment = _ENVIRONMENTS.index(plant_environment)
+            mask &= (self.environment == environment) | (self.environment == _BOTH)
+        for value, dictionary, column in ((color, self._colors, self.color), (size, self._sizes, self.size)):
+            if value is not None:
+                code = dictionary.lookup(value)
+                mask &= column == (code if code is not None else -2)
+
+        rows = np.flatnonzero(mask)
+        total = len(rows)
+        if sort is None and rank is not None:
+            # Relevance: best rank first, offset paging only
+            rows = rows[np.lexsort((self.ids[rows], -rank[rows]))][(page - 1) * page_size:]
+        else:
+            rows = self._ordered(rows, sort, after)
+            if after is None:
+                rows = rows[(page - 1) * page_size:]
+
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_after = None
+        if has_more and (sort is not None or rank is None):
+            next_after = (self._sort_value(sort, rows[-1]), int(self.ids[rows[-1]]))
+        return EnginePage(
+            items=[self._response(row) for row in rows],
+            stamps=[(int(self.ids[row]), self.stamp[row].item()) for row in rows],
+            total=total,
+            next_after=next_after,
+            facet_rows=facet_rows,
+        )
+
+    def _sort_column(self, sort: Optional[str]) -> Tuple[np.ndarray, bool]:
+        """(values, descending) that rows are ordered by, ties broken by id."""
+        if sort == "price":
+            return self.price_cents, False
+        if sort == "newest":
+            return self.created, True
+        if sort == "name":
+            if self._names is None:
+                self._names = np.array(self._name, dtype=str)
+            return self._names, False
+        if sort == "popular":
+            return self.popularity, True
+        return self.ids, False
+
+    def _sort_value(self, sort: Optional[str], row: int) -> Any:
+        if sort == "price":
+            return int(self.price_cents[row])
+        if sort == "newest":
+            return self.created[row].item()
+        if sort == "name":
+            return self._name[row]
+        if sort == "popular":
+            return float(self.popularity[row])
+        return None
+
+    def _ordered(self, rows: np.ndarray, sort: Optional[str], after: Optional[Tuple[Any, int]]) -> np.ndarray:
+        """`rows` in `sort` order, starting after the (sort value, id) keyset `after`."""
+        values, descending = self._sort_column(sort)
+        if after is not None:
+            value, last_id = after
+            if sort is None:
+                value = last_id
+            elif sort == "newest":
+                value = np.datetime64(value, "us")
+            keys, ids = values[rows], self.ids[rows]
+            if descending:
+                rows = rows[(keys < value) | ((keys == value) & (ids < last_id))]
+            else:
+                rows = rows[(keys > value) | ((keys == value) & (ids > last_id))]
+        if sort is None:
+            return rows  # rows are stored in id order
+        order = np.lexsort((self.ids[rows], values[rows]))
+        return rows[order[::-1] if descending else order]
+
+    def _facet_rows(self, mask: np.ndarray) -> Tuple[FacetRow, ...]:
+        # One int64 per row encodes its (kind, environment, color, size) combination
+        radix = (len(_ENVIRONMENTS) + 1, len(self._colors.values) + 1, len(self._sizes.values) + 1)
+        combined = self.kind[mask].astype(np.int64)
+        for column, base in zip((self.environment, self.color, self.size), radix):
+            combined = combined * base + (column[mask].astype(np.int64) + 1)
+        keys, counts = np.unique(combined, return_counts=True)
+        facet_rows = []
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            codes = []
+            for base in reversed(radix):
+                key, code = divmod(key, base)
+                codes.append(code - 1)
+            size, color, environment = codes
+            facet_rows.append(
+                FacetRow(
+                    _KINDS[key].value,
+                    None if environment == _NONE else _ENVIRONMENTS[environment].value,
+                    self._colors.decode(color),
+                    self._sizes.decode(size),
+                    count,
+                )
+            )
+        return tuple(facet_rows)
+
+    def _response(self, row: int) -> ProductResponse:
+        quantity = int(self.quantity[row])
+        attributes = None
+        if self._has_attributes[row]:
+            environment = int(self.environment[row])
+            attributes = {
+                "plant_environment": None if environment == _NONE else _ENVIRONMENTS[environment],
+                "size": self._sizes.decode(int(self.size[row])),
+                "color": self._colors.decode(int(self.color[row])),
+                "care_instructions": self._care_instructions[row],
+            }
+        return ProductResponse(
+            id=int(self.ids[row]),
+            slug=self._slug[row],
+            name=self._name[row],
+            description=self._description[row],
+            price_cents=int(self.price_cents[row]),
+            currency=self._currency[row],
+            kind=_KINDS[int(self.kind[row])],
+            active=bool(self.active[row]),
+            attributes=attributes,
+            inventory={"quantity": quantity} if quantity >= 0 else None,
+        )
+
+
+engine = CatalogEngine(settings.catalog_engine_refresh_seconds)
@@ -0,0 +1,102 @@
+"""
+Facet counts for catalog listings.
+
+One grouped query counts the active products matching the search query,
+price range and location per (kind, plant_environment, color, size) combination;
+the catalog has few distinct combinations, so this stays small however
+many products match. Each facet's counts are then derived in Python with
+every *other* selected filter applied, so picking "indoor" still shows how
+many outdoor products there are, and each count is what selecting that
+value would return (a "both" product counts toward indoor and outdoor).
+The grouped rows are cached per search query, price range and location in the
+catalog cache and dropped with the listing pages on product writes.
+"""
+
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import PlantEnvironment, Product, ProductAttributes
+from app.services import catalog_cache
+
+FACETS = ("kind", "plant_environment", "color", "size")
+
+
+class FacetRow(NamedTuple):
+    kind: Optional[str]
+    plant_environment: Optional[str]
+    color: Optional[str]
+    size: Optional[str]
+    count: int
+
+
+async def load_facet_rows(
+    db: AsyncSession,
+    base_query: Select,
+    search: Optional[str],
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    near: Optional[str] = None,
+    semantic: bool = False,
+) -> Tuple[FacetRow, ...]:
+    """Product counts per attribute combination for `base_query` (over Product, facet filters not applied).
+
+    `search`, the price range, `near` and `semantic` only key the cache; `base_query` must already apply them.
+    """
+    key = catalog_cache.facets_key(search, min_price, max_price, near, semantic)
+    cached = catalog_cache.cache.get(key)
+    if cached is not None:
+        return cached
+    generation = catalog_cache.cache.generation
+
+    columns = (Product.kind, ProductAttributes.plant_environment, ProductAttributes.color, ProductAttributes.size)
+    result = await db.execute(
+        base_query.outerjoin(ProductAttributes, ProductAttributes.product_id == Product.id)
+        .with_only_columns(*columns, func.count())
+        .group_by(*columns)
+        .order_by(None)
+    )
+    rows = tuple(
+        FacetRow(
+            kind.value if kind else None,
+            environment.value if environment else None,
+            color,
+            size,
+            count,
+        )
+        for kind, environment, color, size, count in result
+    )
+    catalog_cache.cache.put(key, rows, generation=generation)
+    return rows
+
+
+def _matches(row: FacetRow, facet: str, value: str) -> bool:
+    # Same rule as the plant_environment filter: "both" suits either environment
+    if facet == "plant_environment":
+        return row.plant_environment in (value, PlantEnvironment.BOTH.value)
+    return getattr(row, facet) == value
+
+
+def facet_counts(rows: Tuple[FacetRow, ...], selected: Dict[str, Optional[str]]) -> Dict[str, List[Tuple[str, int]]]:
+    """(value, count) per facet, most common first, with the other facets' selections applied."""
+    counts = {}
+    for facet in FACETS:
+        counter: Counter = Counter()
+        for row in rows:
+            value = getattr(row, facet)
+            if value is None:
+                continue
+            if all(
+                _matches(row, other, chosen)
+                for other, chosen in selected.items()
+                if other != facet and chosen is not None
+            ):
+                if facet == "plant_environment" and value == PlantEnvironment.BOTH.value:
+                    for environment in PlantEnvironment:
+                        counter[environment.value] += row.count
+                else:
+                    counter[value] += row.count
+        counts[facet] = sorted(counter.items(), key=lambda item: (-item[1], item[0]))
+    return counts
@@ -0,0 +1,179 @@
+"""
+Find products by photo: POST /catalog/products/similar-image.
+
+Admins register reference photos of a product (POST
+/admin/products/{id}/images); only a 64-bit perceptual hash of each is
+kept, in product_image_hashes. The hash is a pHash: the photo is shrunk to
+32x32 greyscale, transformed with a 2-D DCT, and each of the 8x8 lowest
+frequencies gives one bit, set if it is above their median. Resizing,
+re-compression, mild colour and brightness changes and small crops move
+few bits, so a customer's screenshot or re-shared copy of one of our
+photos lands within a few bits of its hash. A different photo of the same
+kind of flower generally does not; telling those apart still needs the
+Gemini endpoints.
+
+Each worker keeps every hash in one uint64 array and answers a search
+with an XOR and popcount over all of it, then keeps the nearest hash per
+product: well under a millisecond for 100k photos (see
+tests/manual_bench_image_index.py). Metric trees such as BK-trees prune
+little at the distances that matter between 64-bit hashes and end up
+visiting most of their nodes, so the flat scan is faster as well as
+simpler. The index refreshes like the pricing rules: when a photo was
+added or removed in this process (invalidate()) or
+CATALOG_IMAGE_INDEX_REFRESH_SECONDS have passed. New rows are read by id,
+and all of them after a removal. Whether a product is active is checked
+when its matches are loaded.
+"""
+
+import asyncio
+import io
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import ProductImageHash
+
+HASH_SIZE = 8  # bits per side: 64-bit hashes
+_SAMPLE_SIZE = HASH_SIZE * 4
+
+# Bits a photo may differ from a product's hash and still match it
+MAX_DISTANCE = 10
+
+# Nearest products checked for being active per search; farther ones are not listed
+MAX_CANDIDATES = 200
+
+# Uploads larger than this are refused before decoding
+MAX_IMAGE_BYTES = 10 * 2**20
+
+_UNSIGNED = 1 << 64
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix: `matrix @ x` transforms the columns of x."""
+    k = np.arange(n)
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(_SAMPLE_SIZE)[:HASH_SIZE]  # only the lowest frequencies are kept
+
+
+class UnreadableImage(ValueError):
+    pass
+
+
+def image_hash(data: bytes) -> int:
+    """64-bit pHash of an encoded image, as an unsigned int. Raises UnreadableImage.
+
+    Decoding takes milliseconds of CPU; async callers run it in the threadpool.
+    """
+    if len(data) > MAX_IMAGE_BYTES:
+        raise UnreadableImage(f"Image is larger than {MAX_IMAGE_BYTES // 2**20} MiB")
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # JPEGs can be decoded straight at 1/2 .. 1/8 scale, far cheaper for phone photos
+            image.draft("L", (_SAMPLE_SIZE * 2, _SAMPLE_SIZE * 2))
+            image = ImageOps.exif_transpose(image).convert("L")
+            image = image.resize((_SAMPLE_SIZE, _SAMPLE_SIZE), Image.Resampling.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise UnreadableImage(str(exc)) from exc
+    pixels = np.asarray(image, dtype=np.float64)
+    frequencies = (_DCT @ pixels @ _DCT.T).ravel()
+    bits = frequencies > np.median(frequencies)
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def to_signed(value: int) -> int:
+    """A hash as stored in the (signed) BIGINT column."""
+    return value - _UNSIGNED if value >= _UNSIGNED // 2 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value % _UNSIGNED
+
+
+def distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class ImageIndex:
+    def __init__(self, refresh_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._lock = asyncio.Lock()
+        self._hashes: List[int] = []
+        self._product_ids: List[int] = []
+        self._hash_array = np.zeros(0, dtype=np.uint64)
+        self._product_id_array = np.zeros(0, dtype=np.int64)
+        self._stacked = True
+        self._last_id = 0
+        # Bumped by invalidate(); a refresh that read hashes before then stays stale
+        self.generation = 0
+        self._generation: Optional[int] = None
+        self._refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def is_stale(self) -> bool:
+        return (
+            self._refreshed_at is None
+            or self._generation != self.generation
+            or self._clock() - self._refreshed_at >= self.refresh_seconds
+        )
+
+    def invalidate(self) -> None:
+        """Re-read the hashes before the next search; call after committing a photo change."""
+        self.generation += 1
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        if self.is_stale():
+            async with self._lock:
+                if self.is_stale():
+                    await self.refresh(db)
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """Add hashes registered since the last refresh (all of them after a removal); returns how many were read."""
+        generation = self.generation
+        query = select(ProductImageHash.id, ProductImageHash.product_id, ProductImageHash.hash)
+        rows = (await db.execute(query.where(ProductImageHash.id > self._last_id))).all()
+        total = await db.scalar(select(func.count()).select_from(ProductImageHash))
+        # Also catches rows committed after one with a higher id had been read
+        if len(self) + len(rows) != total:
+            self._hashes, self._product_ids, self._last_id = [], [], 0
+            self._stacked = False
+            rows = (await db.execute(query)).all()
+        for row in rows:
+            self.add(to_unsigned(row.hash), row.product_id)
+            self._last_id = max(self._last_id, row.id)
+        self._generation = generation
+        self._refreshed_at = self._clock()
+        return len(rows)
+
+    def add(self, value: int, product_id: int) -> None:
+        self._hashes.append(value)
+        self._product_ids.append(product_id)
+        self._stacked = False
+
+    def search(self, value: int, max_distance: int = MAX_DISTANCE) -> List[Tuple[int, int]]:
+        """(product id, distance) of every product within `max_distance` bits, nearest first, ties by id."""
+        if not self._stacked:
+            self._hash_array = np.array(self._hashes, dtype=np.uint64)
+            self._product_id_array = np.array(self._product_ids, dtype=np.int64)
+            self._stacked = True
+        distances = np.bitwise_count(self._hash_array ^ np.uint64(value))
+        matches = np.flatnonzero(distances <= max_distance)
+        matches = matches[np.lexsort((self._product_id_array[matches], distances[matches]))]
+        # The first row of each product is its nearest photo
+        _, first = np.unique(self._product_id_array[matches], return_index=True)
+        nearest = matches[np.sort(first)]
+        return list(zip(self._product_id_array[nearest].tolist(), distances[nearest].tolist()))
+
+
+index = ImageIndex(settings.catalog_image_index_refresh_seconds)
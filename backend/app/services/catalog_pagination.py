@@ -0,0 +1,142 @@
+"""
+Totals and keyset cursors for paginated catalog listings.
+
+Counting every match doubles the cost of a listing page, so totals are
+bounded: the count stops at CATALOG_EXACT_COUNT_LIMIT + 1 rows. Below the
+limit the total is exact; above it PostgreSQL's planner estimate is
+returned instead and flagged as an estimate (other databases count
+exactly). Counts are cached per filter set in the catalog cache and
+dropped with the listing pages when products change.
+
+Listings in a fixed order (browse by id, or an explicit sort) can be paged
+with an opaque cursor instead of OFFSET, so page 500 costs the same as page
+1. The cursor carries the sort it was issued for and the last row's
+(sort value, id); each sort on a product column has a matching
+(active, column, id) index. sort=popular orders by the product_popularity
+rollup (app/services/popularity.py), joined by primary key; products that
+never sold have no row there and score 0.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.config import settings
+from app.db.models import Product, ProductPopularity
+from app.services import catalog_cache
+
+
+# Explicit sort orders: sort -> (column, descending); id breaks ties in the same direction
+SORTS = {
+    "price": (Product.price_cents, False),
+    "newest": (Product.created_at, True),
+    "name": (Product.name, False),
+    "popular": (func.coalesce(ProductPopularity.score, 0.0), True),
+}
+
+
+def sort_value(sort: Optional[str], product: Product) -> Any:
+    """The value `product` is ordered by under `sort` (None: id order).
+
+    For sort=popular, `product` must come from a query ordered by after_cursor.
+    """
+    if sort == "popular":
+        return product.popularity.score if product.popularity is not None else 0.0
+    return getattr(product, SORTS[sort][0].key) if sort else None
+
+
+def encode_cursor(sort: Optional[str], value: Any, product_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([sort, value, product_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: Optional[str]) -> Tuple[Any, int]:
+    """(sort value, product id) after which the next page starts; ValueError if malformed or for another sort."""
+    try:
+        cursor_sort, value, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if cursor_sort != sort or not isinstance(product_id, int):
+            raise ValueError("Cursor was issued for another sort order")
+        if sort == "newest":
+            value = datetime.fromisoformat(value)
+        elif (
+            (sort == "price" and not isinstance(value, int))
+            or (sort == "name" and not isinstance(value, str))
+            or (sort == "popular" and (isinstance(value, bool) or not isinstance(value, (int, float))))
+        ):
+            raise ValueError("Invalid cursor value")
+        return value, product_id
+    except (ValueError, TypeError, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a statement, with its parameters bound as usual."""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element: _Explain, compiler, **kw) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def planner_estimate(db: AsyncSession, query: Select) -> int:
+    """PostgreSQL's row estimate for `query`, from EXPLAIN without running it."""
+    plan = (await db.execute(_Explain(query))).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_matches(db: AsyncSession, query: Select, count_key: Tuple) -> Tuple[int, bool]:
+    """(total, is_estimate) for the rows of `query`, cached under `count_key`."""
+    cached = catalog_cache.cache.get(count_key)
+    if cached is not None:
+        return cached
+    generation = catalog_cache.cache.generation
+
+    limit = settings.catalog_exact_count_limit
+    total = await db.scalar(select(func.count()).select_from(query.order_by(None).limit(limit + 1).subquery()))
+    is_estimate = False
+    if total > limit:
+        if db.bind.dialect.name == "postgresql":
+            # The estimate can undershoot; we know there are more than `limit`.
+            total = max(await planner_estimate(db, query.order_by(None)), limit + 1)
+            is_estimate = True
+        else:
+            total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+    catalog_cache.cache.put(count_key, (total, is_estimate), generation=generation)
+    return total, is_estimate
+
+
+def after_cursor(query: Select, sort: Optional[str], cursor: Optional[str]) -> Select:
+    """Order `query` by `sort` (None: id) and start after `cursor`, if given.
+
+    Replaces any existing ordering, such as search relevance.
+    """
+    query = query.order_by(None)
+    if not sort:
+        if cursor:
+            query = query.where(Product.id > decode_cursor(cursor, sort)[1])
+        return query.order_by(Product.id)
+
+    column, descending = SORTS[sort]
+    if sort == "popular":
+        query = query.outerjoin(Product.popularity).options(contains_eager(Product.popularity))
+    if cursor:
+        key = tuple_(column, Product.id)
+        last = tuple_(*decode_cursor(cursor, sort))
+        query = query.where(key < last if descending else key > last)
+    if descending:
+        return query.order_by(column.desc(), Product.id.desc())
+    return query.order_by(column, Product.id)
@@ -0,0 +1,67 @@
+"""
+Ranked product search for the catalog.
+
+On PostgreSQL, products carry a generated ``search_vector`` tsvector column
+(name weighted above description) with a GIN index; see migration
+c4a8e2f7d913. Every query term matches as a prefix, so "ros whi" finds
+"White Roses" while the user is still typing, and results are ordered by
+ts_rank_cd.
+
+Other databases (SQLite in tests) fall back to LIKE on each term with a
+simple rank: name prefix, then name match, then description-only match.
+"""
+
+import re
+from typing import List
+
+from sqlalchemy import Select, and_, case, false, func, literal_column, or_
+
+from app.db.models import Product
+
+# Terms beyond this are ignored; keeps tsquery and LIKE chains bounded.
+MAX_TERMS = 8
+
+TEXT_SEARCH_CONFIG = "simple"
+
+_search_vector = literal_column("products.search_vector")
+
+
+def search_terms(q: str) -> List[str]:
+    """Lowercased word tokens of `q`; punctuation and tsquery operators are dropped."""
+    return re.findall(r"\w+", q.lower())[:MAX_TERMS]
+
+
+def prefix_tsquery(terms: List[str]) -> str:
+    """to_tsquery input matching every term as a prefix: "ros:* & whi:*"."""
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def apply_search(query: Select, q: str, dialect_name: str) -> Select:
+    """Restrict `query` (over Product) to products matching `q`, best matches first.
+
+    A query with no word characters matches nothing.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return query.where(false())
+
+    if dialect_name == "postgresql":
+        tsquery = func.to_tsquery(TEXT_SEARCH_CONFIG, prefix_tsquery(terms))
+        return query.where(_search_vector.op("@@")(tsquery)).order_by(
+            func.ts_rank_cd(_search_vector, tsquery).desc(), Product.id
+        )
+
+    name = func.lower(Product.name)
+    description = func.lower(func.coalesce(Product.description, ""))
+    in_name = and_(*(name.contains(term, autoescape=True) for term in terms))
+    rank = case(
+        (name.startswith(terms[0], autoescape=True), 3),
+        (in_name, 2),
+        else_=1,
+    )
+    return query.where(
+        *(
+            or_(name.contains(term, autoescape=True), description.contains(term, autoescape=True))
+            for term in terms
+        )
+    ).order_by(rank.desc(), Product.id)
@@ -0,0 +1,291 @@
+"""
+Semantic product search: q=...&semantic=true on the catalog listing.
+
+Products and queries are embedded offline with hashed n-grams: every word
+and every 3- and 4-character piece of it ("<bedroom>" gives "<be", "bed",
+"edr", ...) adds +-1 to one of DIMENSIONS coordinates chosen by a CRC32
+of the feature, and the vector is L2-normalised. Two texts are as similar
+as the words and word pieces they share, so "low-light plant for a
+bedroom" finds "thrives in low light, ideal for bedrooms". There is no
+model of synonyms: "dim" will not find "low light". A product's vector
+covers its name (counted twice), description and care instructions.
+
+Vectors live in a contiguous float32 matrix memory-mapped from disk, so
+workers share one copy through the page cache and a restart does not
+re-embed the catalog. build_semantic_index.py writes a new build into its
+own subdirectory of CATALOG_SEMANTIC_INDEX_DIR and then points the
+CURRENT file at it. Between builds each worker keeps a small in-memory
+overlay: products changed since the build's watermark are re-embedded and
+their build rows masked out. Like catalog_suggest, the overlay refreshes
+from Product.updated_at when a catalog write was committed in this
+process or CATALOG_SEMANTIC_REFRESH_SECONDS have passed; the CURRENT file
+is checked at the same time. Without a build, every product goes to the
+overlay.
+
+A query scores every product with one matrix-vector product and keeps the
+best MAX_RESULTS at or above MIN_SIMILARITY (argpartition, then a sort of
+those few).
+"""
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import time
+import zlib
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Select, case, false, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import Product, ProductAttributes
+from app.services import catalog_cache
+
+DIMENSIONS = 256
+
+# Cosine similarity below which a product is not a match
+MIN_SIMILARITY = 0.2
+
+# Matches handed to the listing, best first; later ones are not listed
+MAX_RESULTS = 500
+
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+NAME_WEIGHT = 2.0
+PIECE_WEIGHT = 0.5  # of a 3- or 4-character piece, relative to the whole word
+
+# Words that say nothing about the product; ignored everywhere
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it its me my of on or our that the this to we with you your"
+    .split()
+)
+
+_CURRENT = "CURRENT"
+
+
+@lru_cache(maxsize=100_000)
+def _word_features(word: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(coordinates, signed weights) one occurrence of `word` adds."""
+    padded = f"<{word}>"
+    features = [word] + [padded[i : i + n] for n in (3, 4) for i in range(len(padded) - n + 1)]
+    weights = [1.0] + [PIECE_WEIGHT] * (len(features) - 1)
+    hashes = np.array([zlib.crc32(feature.encode()) for feature in features], dtype=np.uint32)
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    return (hashes % DIMENSIONS).astype(np.intp), signs * np.array(weights)
+
+
+def query_words(text: Optional[str]) -> List[str]:
+    """Lowercased words of `text` that count towards its vector."""
+    return [word for word in re.findall(r"\w+", (text or "").lower()) if word not in _STOPWORDS]
+
+
+def embed(texts: Sequence[Tuple[Optional[str], float]]) -> np.ndarray:
+    """Unit float32 vector of (text, weight) pairs; all zeros if they have no words."""
+    coordinates, weights = [], []
+    for text, weight in texts:
+        for word in query_words(text):
+            word_coordinates, word_weights = _word_features(word)
+            coordinates.append(word_coordinates)
+            weights.append(word_weights * weight)
+    if not coordinates:
+        return np.zeros(DIMENSIONS, dtype=np.float32)
+    vector = np.bincount(np.concatenate(coordinates), weights=np.concatenate(weights), minlength=DIMENSIONS)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).astype(np.float32)
+
+
+def embed_product(name: str, description: Optional[str], care_instructions: Optional[str]) -> np.ndarray:
+    return embed([(name, NAME_WEIGHT), (description, 1.0), (care_instructions, 1.0)])
+
+
+def apply_ranking(query: Select, product_ids: Sequence[int]) -> Select:
+    """Restrict `query` (over Product) to `product_ids`, in that order."""
+    if not product_ids:
+        return query.where(false())
+    position = case({product_id: n for n, product_id in enumerate(product_ids)}, value=Product.id)
+    return query.where(Product.id.in_(product_ids)).order_by(position, Product.id)
+
+
+def _product_rows() -> Select:
+    return select(
+        Product.id,
+        Product.name,
+        Product.description,
+        ProductAttributes.care_instructions,
+        Product.active,
+        Product.updated_at,
+    ).outerjoin(ProductAttributes, ProductAttributes.product_id == Product.id)
+
+
+def current_build(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, _CURRENT)) as current:
+            return current.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def save_build(
+    directory: str,
+    products: Sequence[Tuple[int, str, Optional[str], Optional[str]]],
+    watermark: Optional[datetime],
+) -> str:
+    """Embed (id, name, description, care instructions) rows into a new build under `directory`, made current.
+
+    `watermark` is the newest Product.updated_at the rows reflect.
+    """
+    build = datetime.utcnow().strftime("build-%Y%m%dT%H%M%S%f")
+    path = os.path.join(directory, build)
+    os.makedirs(path)
+
+    vectors = np.lib.format.open_memmap(
+        os.path.join(path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(len(products), DIMENSIONS)
+    )
+    for n, (_, name, description, care_instructions) in enumerate(products):
+        vectors[n] = embed_product(name, description, care_instructions)
+    vectors.flush()
+    del vectors
+    np.save(os.path.join(path, "ids.npy"), np.array([product[0] for product in products], dtype=np.int64))
+    with open(os.path.join(path, "meta.json"), "w") as meta:
+        json.dump({"dimensions": DIMENSIONS, "watermark": watermark.isoformat() if watermark else None}, meta)
+
+    # Readers switch on the next refresh; ones still mapping an old build keep it until then
+    previous = current_build(directory)
+    with open(os.path.join(directory, _CURRENT + ".tmp"), "w") as current:
+        current.write(build)
+    os.replace(os.path.join(directory, _CURRENT + ".tmp"), os.path.join(directory, _CURRENT))
+    if previous and previous != build:
+        shutil.rmtree(os.path.join(directory, previous), ignore_errors=True)
+    return build
+
+
+async def write_build(db: AsyncSession, directory: str) -> Tuple[str, int]:
+    """Embed every active product into a new build under `directory` and make it current; (build, products)."""
+    rows = (await db.execute(_product_rows().order_by(Product.id))).all()
+    active = [(row.id, row.name, row.description, row.care_instructions) for row in rows if row.active]
+    watermark = max((row.updated_at for row in rows), default=None)
+    return save_build(directory, active, watermark), len(active)
+
+
+class SemanticIndex:
+    def __init__(self, directory: str, refresh_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.directory = directory
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._lock = asyncio.Lock()
+        self.build: Optional[str] = None
+        self._vectors: np.ndarray = np.zeros((0, DIMENSIONS), dtype=np.float32)  # the build's, memory-mapped
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._live = np.zeros(0, dtype=bool)  # build rows not superseded by the overlay
+        self._row_of: Dict[int, int] = {}
+        self._overlay: Dict[int, np.ndarray] = {}
+        self._overlay_ids = np.zeros(0, dtype=np.int64)
+        self._overlay_vectors = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self._overlay_stacked = True
+        self.watermark: Optional[datetime] = None
+        self._generation: Optional[int] = None
+        self._refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return int(self._live.sum()) + len(self._overlay)
+
+    def is_stale(self) -> bool:
+        return (
+            self._refreshed_at is None
+            or self._generation != catalog_cache.cache.generation
+            or self._clock() - self._refreshed_at >= self.refresh_seconds
+        )
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        if self.is_stale():
+            async with self._lock:
+                if self.is_stale():
+                    await self.refresh(db)
+
+    def load(self, build: Optional[str]) -> None:
+        """Map `build` (None: start empty) and drop the overlay."""
+        vectors, ids, watermark = np.zeros((0, DIMENSIONS), dtype=np.float32), np.zeros(0, dtype=np.int64), None
+        if build is not None:
+            path = os.path.join(self.directory, build)
+            with open(os.path.join(path, "meta.json")) as meta_file:
+                meta = json.load(meta_file)
+            if meta["dimensions"] == DIMENSIONS:
+                vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+                ids = np.load(os.path.join(path, "ids.npy"))
+                watermark = datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None
+        self.build = build
+        self._vectors, self._ids = vectors, ids
+        self._live = np.ones(len(ids), dtype=bool)
+        self._row_of = {product_id: row for row, product_id in enumerate(ids.tolist())}
+        self._overlay = {}
+        self._overlay_stacked = False
+        self.watermark = watermark
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """Pick up a new build and re-embed products changed since the watermark; returns how many."""
+        generation = catalog_cache.cache.generation
+        build = current_build(self.directory)
+        if build != self.build or self._refreshed_at is None:
+            self.load(build)
+        query = _product_rows()
+        if self.watermark is not None:
+            query = query.where(Product.updated_at >= self.watermark - REFRESH_OVERLAP)
+        rows = (await db.execute(query)).all()
+        for product_id, name, description, care_instructions, active, _ in rows:
+            self.put(product_id, name, description, care_instructions, active)
+        if rows:
+            newest = max(row.updated_at for row in rows)
+            self.watermark = newest if self.watermark is None else max(self.watermark, newest)
+        self._generation = generation
+        self._refreshed_at = self._clock()
+        return len(rows)
+
+    def put(
+        self,
+        product_id: int,
+        name: str,
+        description: Optional[str] = None,
+        care_instructions: Optional[str] = None,
+        active: bool = True,
+    ) -> None:
+        """Add, update or (inactive) remove one product."""
+        vector = embed_product(name, description, care_instructions) if active else None
+        row = self._row_of.get(product_id)
+        if row is not None:
+            # Refreshes re-read some unchanged products (REFRESH_OVERLAP); their build row stays
+            self._live[row] = vector is not None and np.array_equal(self._vectors[row], vector)
+            if self._live[row]:
+                vector = None
+        if vector is not None:
+            self._overlay[product_id] = vector
+        else:
+            self._overlay.pop(product_id, None)
+        self._overlay_stacked = False
+
+    def search(self, q: str, limit: int = MAX_RESULTS) -> List[Tuple[int, float]]:
+        """(product id, cosine similarity) of up to `limit` matches for `q`, best first, ties by id."""
+        vector = embed([(q, 1.0)])
+        if not vector.any():
+            return []
+        if not self._overlay_stacked:
+            self._overlay_ids = np.fromiter(self._overlay, dtype=np.int64, count=len(self._overlay))
+            self._overlay_vectors = np.array(list(self._overlay.values()), dtype=np.float32).reshape(-1, DIMENSIONS)
+            self._overlay_stacked = True
+
+        scores = np.concatenate(
+            [np.where(self._live, self._vectors @ vector, -1.0), self._overlay_vectors @ vector]
+        )
+        ids = np.concatenate([self._ids, self._overlay_ids])
+        matches = np.flatnonzero(scores >= MIN_SIMILARITY)
+        if len(matches) > limit:
+            matches = matches[np.argpartition(-scores[matches], limit - 1)[:limit]]
+        matches = matches[np.lexsort((ids[matches], -scores[matches]))]
+        return list(zip(ids[matches].tolist(), scores[matches].tolist()))
+
+
+index = SemanticIndex(settings.catalog_semantic_index_dir, settings.catalog_semantic_refresh_seconds)
@@ -0,0 +1,167 @@
+"""
+In-process prefix index for search-box suggestions.
+
+Active product names are kept in two sorted lists searched with bisect:
+
+* normalised full names ("red roses"), so names starting with what was
+  typed come first, alphabetically;
+* every distinct name word, so "ros" also finds "Red Roses".
+
+Every query word matches as a prefix, as in catalog search. A lookup walks
+the matching ranges in order (for word matches, the range of the query
+word with the fewest matches) and stops once it has enough suggestions,
+so its cost depends on the limit rather than the catalog size, except for
+multi-word queries whose words rarely occur together.
+
+The index refreshes like the catalog engine: incrementally from
+Product.updated_at, when a catalog write was committed in this process or
+CATALOG_SUGGEST_REFRESH_SECONDS have passed.
+"""
+
+import asyncio
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import Product
+from app.services import catalog_cache, catalog_search
+
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+# Refreshes touching more products than this re-sort the lists instead of inserting one by one
+BULK_REFRESH = 1000
+
+_AFTER_PREFIX = "\U0010ffff"
+
+
+class Suggestion(NamedTuple):
+    slug: str
+    name: str
+
+
+class _Entry(NamedTuple):
+    slug: str
+    name: str
+    normalised: str
+    words: Tuple[str, ...]
+
+
+def _entry(slug: str, name: str) -> _Entry:
+    # Words past catalog_search.MAX_TERMS are not indexed; names are short
+    words = catalog_search.search_terms(name)
+    return _Entry(slug, name, " ".join(words), tuple(dict.fromkeys(words)))
+
+
+def _range(keys: List[Tuple[str, int]], prefix: str) -> Tuple[int, int]:
+    """Slice of `keys` whose text starts with `prefix`."""
+    return bisect_left(keys, (prefix,)), bisect_left(keys, (prefix + _AFTER_PREFIX,))
+
+
+class SuggestIndex:
+    def __init__(self, refresh_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._lock = asyncio.Lock()
+        self._entries: Dict[int, _Entry] = {}
+        self._names: List[Tuple[str, int]] = []
+        self._words: List[Tuple[str, int]] = []
+        self.watermark: Optional[datetime] = None
+        self._generation: Optional[int] = None
+        self._refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_stale(self) -> bool:
+        return (
+            self._refreshed_at is None
+            or self._generation != catalog_cache.cache.generation
+            or self._clock() - self._refreshed_at >= self.refresh_seconds
+        )
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        if self.is_stale():
+            async with self._lock:
+                if self.is_stale():
+                    await self.refresh(db)
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """Apply products changed since the watermark (all of them the first time); returns how many."""
+        generation = catalog_cache.cache.generation
+        query = select(Product.id, Product.slug, Product.name, Product.active, Product.updated_at)
+        if self.watermark is not None:
+            query = query.where(Product.updated_at >= self.watermark - REFRESH_OVERLAP)
+        rows = (await db.execute(query)).all()
+        if len(rows) > BULK_REFRESH:
+            for product_id, slug, name, active, _ in rows:
+                self._entries.pop(product_id, None)
+                if active:
+                    self._entries[product_id] = _entry(slug, name)
+            self._names = sorted((entry.normalised, product_id) for product_id, entry in self._entries.items())
+            self._words = sorted(
+                (word, product_id) for product_id, entry in self._entries.items() for word in entry.words
+            )
+        else:
+            for product_id, slug, name, active, _ in rows:
+                self.put(product_id, slug, name, active)
+        if rows:
+            newest = max(row.updated_at for row in rows)
+            self.watermark = newest if self.watermark is None else max(self.watermark, newest)
+        self._generation = generation
+        self._refreshed_at = self._clock()
+        return len(rows)
+
+    def put(self, product_id: int, slug: str, name: str, active: bool = True) -> None:
+        """Add, update or (inactive) remove one product."""
+        old = self._entries.pop(product_id, None)
+        if old is not None:
+            self._remove_key(self._names, (old.normalised, product_id))
+            for word in old.words:
+                self._remove_key(self._words, (word, product_id))
+        if not active:
+            return
+        entry = self._entries[product_id] = _entry(slug, name)
+        insort(self._names, (entry.normalised, product_id))
+        for word in entry.words:
+            insort(self._words, (word, product_id))
+
+    @staticmethod
+    def _remove_key(keys: List[Tuple[str, int]], key: Tuple[str, int]) -> None:
+        index = bisect_left(keys, key)
+        if index < len(keys) and keys[index] == key:
+            del keys[index]
+
+    def suggest(self, q: str, limit: int) -> List[Suggestion]:
+        """Up to `limit` products: names starting with `q` first, then names where every word of `q` prefixes a word."""
+        terms = catalog_search.search_terms(q)
+        if not terms:
+            return []
+        found: Dict[int, None] = {}
+
+        start, stop = _range(self._names, " ".join(terms))
+        for _, product_id in self._names[start:min(stop, start + limit)]:
+            found[product_id] = None
+
+        # Walk the narrowest term's words and check the other terms per product
+        ranges = {term: _range(self._words, term) for term in terms}
+        driver = min(terms, key=lambda term: ranges[term][1] - ranges[term][0])
+        others = [term for term in terms if term != driver]
+        index, stop = ranges[driver]
+        while len(found) < limit and index < stop:
+            product_id = self._words[index][1]
+            index += 1
+            if product_id in found:
+                continue
+            words = self._entries[product_id].words
+            if all(any(word.startswith(term) for word in words) for term in others):
+                found[product_id] = None
+
+        return [Suggestion(self._entries[product_id].slug, self._entries[product_id].name) for product_id in found]
+
+
+index = SuggestIndex(settings.catalog_suggest_refresh_seconds)
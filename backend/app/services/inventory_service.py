@@ -0,0 +1,385 @@
+"""
+Nursery stock movements.
+
+Two aggregates of nursery stock are maintained with deltas applied in the
+same transaction as the nursery stock change (apply_stock_deltas):
+Inventory.quantity, the per-product total, and ProductAvailability, the
+stock per (city, commune, product) behind the catalog's in_stock_near
+filter. find_drift / find_availability_drift and their repair functions (see
+reconcile_inventory.py) catch anything written around them.
+
+Stock is decremented with conditional UPDATE statements
+(``quantity = quantity - n WHERE quantity >= n``) issued in (nursery, product)
+order. The check and the write are one statement, so concurrent transactions
+cannot both pass validation on the same stock, and taking row locks in a fixed
+order keeps them from deadlocking each other.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Select, and_, func, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Inventory, Nursery, NurseryInventory, Product, ProductAvailability
+from app.services import catalog_cache
+
+Cell = Tuple[int, int]  # (nursery_id, product_id)
+Location = Tuple[str, str]  # (city, commune) as normalised by location_key
+Spot = Tuple[str, str, int]  # (city, commune, product_id)
+
+
+def location_key(city: str, commune: Optional[str] = None) -> Location:
+    """How a nursery's city and commune are stored in ProductAvailability."""
+    return city.strip().lower(), (commune or "").strip().lower()
+
+
+@dataclass
+class Shortage:
+    nursery_id: int
+    product_id: int
+    requested: int
+    available: int
+
+
+class InsufficientStock(Exception):
+    """Raised with every shortage found; no stock has been changed."""
+
+    def __init__(self, shortages: List[Shortage]):
+        super().__init__(f"Insufficient inventory for {len(shortages)} nursery product(s)")
+        self.shortages = shortages
+
+
+async def decrement_stock(db: AsyncSession, requested: Dict[Cell, int]) -> None:
+    """Take `requested` quantities from nursery stock, all or nothing.
+
+    Inventory.quantity is decremented by the same amounts in the same transaction.
+
+    On any shortage the transaction is rolled back and InsufficientStock lists
+    every cell that could not be served, with the quantity currently on hand.
+    """
+    short: List[Cell] = []
+    for cell in sorted(requested):
+        nursery_id, product_id = cell
+        quantity = requested[cell]
+        result = await db.execute(
+            update(NurseryInventory)
+            .where(
+                NurseryInventory.nursery_id == nursery_id,
+                NurseryInventory.product_id == product_id,
+                NurseryInventory.quantity >= quantity,
+            )
+            .values(quantity=NurseryInventory.quantity - quantity)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            short.append(cell)
+
+    if not short:
+        await apply_stock_deltas(db, {cell: -quantity for cell, quantity in requested.items()})
+        return
+
+    await db.rollback()
+    rows = await db.execute(
+        select(NurseryInventory.nursery_id, NurseryInventory.product_id, NurseryInventory.quantity).where(
+            tuple_(NurseryInventory.nursery_id, NurseryInventory.product_id).in_(short)
+        )
+    )
+    available = {(nursery_id, product_id): quantity for nursery_id, product_id, quantity in rows}
+    raise InsufficientStock(
+        [
+            Shortage(
+                nursery_id=nursery_id,
+                product_id=product_id,
+                requested=requested[(nursery_id, product_id)],
+                available=available.get((nursery_id, product_id), 0),
+            )
+            for nursery_id, product_id in short
+        ]
+    )
+
+
+async def apply_stock_deltas(
+    db: AsyncSession, deltas: Dict[Cell, int], locations: Optional[Dict[int, Location]] = None
+) -> None:
+    """Add nursery stock changes to Inventory.quantity and ProductAvailability in the caller's transaction.
+
+    Call after the nursery rows are written. Nursery locations are looked up
+    unless given in `locations` (nursery_id -> location_key), which is
+    required when the nurseries have just been deleted.
+    """
+    product_deltas: Dict[int, int] = {}
+    for (_, product_id), delta in deltas.items():
+        product_deltas[product_id] = product_deltas.get(product_id, 0) + delta
+    await apply_global_deltas(db, product_deltas)
+
+    if locations is None:
+        rows = await db.execute(
+            select(Nursery.id, Nursery.city, Nursery.commune).where(Nursery.id.in_({n for n, _ in deltas}))
+        )
+        locations = {nursery_id: location_key(city, commune) for nursery_id, city, commune in rows}
+    spot_deltas: Dict[Spot, int] = {}
+    for (nursery_id, product_id), delta in deltas.items():
+        spot = (*locations[nursery_id], product_id)
+        spot_deltas[spot] = spot_deltas.get(spot, 0) + delta
+    await apply_availability_deltas(db, spot_deltas)
+
+
+async def apply_global_deltas(db: AsyncSession, deltas: Dict[int, int]) -> None:
+    """Add per-product stock changes to Inventory.quantity in the caller's transaction.
+
+    Call after the nursery rows are written: a product without an Inventory row
+    gets one seeded from the sum of its nursery stock.
+    """
+    for product_id in sorted(deltas):
+        delta = deltas[product_id]
+        if not delta:
+            continue
+        result = await db.execute(
+            update(Inventory)
+            .where(Inventory.product_id == product_id)
+            .values(quantity=Inventory.quantity + delta)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            total = await db.scalar(
+                select(func.coalesce(func.sum(NurseryInventory.quantity), 0)).where(
+                    NurseryInventory.product_id == product_id
+                )
+            )
+            db.add(Inventory(product_id=product_id, quantity=total))
+    await db.flush()
+    catalog_cache.invalidate_on_commit(db, product_ids=[p for p, delta in deltas.items() if delta])
+
+
+async def lock_nurseries(db: AsyncSession, nursery_ids: Iterable[int]) -> None:
+    """Serialise stock writes that set nursery quantities, per nursery, until the caller's transaction ends.
+
+    Row locks on nursery_inventory only cover cells that already exist: two
+    writers creating the same cell would both read no stock and both apply
+    the full quantity as a delta. FOR NO KEY UPDATE on the nurseries, in id
+    order, makes the second writer wait and then read the first one's row,
+    without blocking inserts that merely reference the nursery.
+    """
+    await db.execute(
+        select(Nursery.id)
+        .where(Nursery.id.in_(set(nursery_ids)))
+        .order_by(Nursery.id)
+        .with_for_update(key_share=True)
+    )
+
+
+# Rows per INSERT statement; keeps bind parameters well under driver limits.
+UPSERT_BATCH_SIZE = 5_000
+
+
+async def upsert_stock(db: AsyncSession, quantities: Dict[Cell, int]) -> int:
+    """Set nursery stock for many cells and apply the changes to Inventory.quantity.
+
+    The nurseries are locked first (lock_nurseries), then their current rows
+    are read once to compute per-product deltas and written with INSERT ...
+    ON CONFLICT (nursery_id, product_id) DO UPDATE. Returns the number of
+    distinct products affected.
+    """
+    if not quantities:
+        return 0
+    nursery_ids = {nursery_id for nursery_id, _ in quantities}
+    product_ids = {product_id for _, product_id in quantities}
+    await lock_nurseries(db, nursery_ids)
+
+    # Over-fetches pairs outside `quantities`; cheaper than a row-value IN list of thousands.
+    existing = await db.execute(
+        select(NurseryInventory.nursery_id, NurseryInventory.product_id, NurseryInventory.quantity)
+        .where(NurseryInventory.nursery_id.in_(nursery_ids), NurseryInventory.product_id.in_(product_ids))
+        .order_by(NurseryInventory.nursery_id, NurseryInventory.product_id)
+        .with_for_update()
+    )
+    previous = {(nursery_id, product_id): quantity for nursery_id, product_id, quantity in existing}
+
+    deltas = {cell: quantity - previous.get(cell, 0) for cell, quantity in quantities.items()}
+
+    insert = _insert(db)
+
+    now = datetime.utcnow()
+    rows = [
+        {"nursery_id": nursery_id, "product_id": product_id, "quantity": quantity, "updated_at": now}
+        for (nursery_id, product_id), quantity in sorted(quantities.items())
+    ]
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        statement = insert(NurseryInventory).values(rows[start : start + UPSERT_BATCH_SIZE])
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[NurseryInventory.nursery_id, NurseryInventory.product_id],
+                set_={"quantity": statement.excluded.quantity, "updated_at": statement.excluded.updated_at},
+            )
+        )
+
+    await apply_stock_deltas(db, deltas)
+    return len(product_ids)
+
+
+def _insert(db: AsyncSession):
+    return postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+
+
+async def apply_availability_deltas(db: AsyncSession, deltas: Dict[Spot, int]) -> None:
+    """Add stock changes to ProductAvailability with INSERT ... ON CONFLICT DO UPDATE, in (city, commune, product) order.
+
+    A product coming into or running out of stock at a location changes
+    which products in_stock_near listings hold, so that drops the cached
+    in_stock_near listings; other changes only touch the product's own
+    cache entries (see apply_global_deltas).
+    """
+    rows = [
+        {"city": city, "commune": commune, "product_id": product_id, "quantity": delta}
+        for (city, commune, product_id), delta in sorted(deltas.items())
+        if delta
+    ]
+    insert = _insert(db)
+    flipped = False
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        statement = insert(ProductAvailability).values(rows[start : start + UPSERT_BATCH_SIZE])
+        statement = statement.on_conflict_do_update(
+            index_elements=[ProductAvailability.city, ProductAvailability.commune, ProductAvailability.product_id],
+            set_={"quantity": ProductAvailability.quantity + statement.excluded.quantity},
+        ).returning(
+            ProductAvailability.city,
+            ProductAvailability.commune,
+            ProductAvailability.product_id,
+            ProductAvailability.quantity,
+        )
+        for city, commune, product_id, quantity in await db.execute(statement):
+            before = quantity - deltas[(city, commune, product_id)]
+            flipped = flipped or (before > 0) != (quantity > 0)
+    if flipped:
+        catalog_cache.invalidate_on_commit(db, nearby=True)
+
+
+async def move_nursery_stock(db: AsyncSession, nursery_id: int, old: Location, new: Location) -> None:
+    """Re-file a relocated nursery's stock under its new location in ProductAvailability."""
+    if old == new:
+        return
+    deltas: Dict[Spot, int] = {}
+    stock = await db.execute(
+        select(NurseryInventory.product_id, NurseryInventory.quantity).where(NurseryInventory.nursery_id == nursery_id)
+    )
+    for product_id, quantity in stock:
+        deltas[(*old, product_id)] = -quantity
+        deltas[(*new, product_id)] = quantity
+    await apply_availability_deltas(db, deltas)
+
+
+def products_in_stock_near(city: str, commune: Optional[str] = None) -> Select:
+    """Ids of products with nursery stock in `city` (and `commune`, if given), from ProductAvailability.
+
+    Arguments must already be normalised with location_key; one index range scan.
+    """
+    query = select(ProductAvailability.product_id).where(
+        ProductAvailability.city == city, ProductAvailability.quantity > 0
+    )
+    if commune is not None:
+        query = query.where(ProductAvailability.commune == commune)
+    return query
+
+
+@dataclass
+class Drift:
+    product_id: int
+    recorded: Optional[int]  # None when the product has no Inventory row
+    actual: int
+
+
+async def find_drift(db: AsyncSession) -> List[Drift]:
+    """Products whose Inventory.quantity differs from the sum of their nursery stock."""
+    totals = (
+        select(NurseryInventory.product_id, func.sum(NurseryInventory.quantity).label("total"))
+        .group_by(NurseryInventory.product_id)
+        .subquery()
+    )
+    actual = func.coalesce(totals.c.total, 0)
+    rows = await db.execute(
+        select(Product.id, Inventory.quantity, actual)
+        .outerjoin(Inventory, Inventory.product_id == Product.id)
+        .outerjoin(totals, totals.c.product_id == Product.id)
+        .where(
+            or_(
+                and_(Inventory.id.is_(None), totals.c.total.is_not(None)),
+                Inventory.quantity != actual,
+            )
+        )
+        .order_by(Product.id)
+    )
+    return [Drift(product_id=product_id, recorded=recorded, actual=total) for product_id, recorded, total in rows]
+
+
+async def repair_drift(db: AsyncSession, drifts: List[Drift]) -> None:
+    """Overwrite drifted aggregates with the nursery totals found by find_drift."""
+    for drift in drifts:
+        if drift.recorded is None:
+            db.add(Inventory(product_id=drift.product_id, quantity=drift.actual))
+        else:
+            await db.execute(
+                update(Inventory)
+                .where(Inventory.product_id == drift.product_id)
+                .values(quantity=drift.actual)
+                .execution_options(synchronize_session=False)
+            )
+    await db.flush()
+    catalog_cache.invalidate_on_commit(db, product_ids=[drift.product_id for drift in drifts])
+
+
+@dataclass
+class AvailabilityDrift:
+    city: str
+    commune: str
+    product_id: int
+    recorded: Optional[int]  # None when there is no ProductAvailability row
+    actual: int
+
+
+async def find_availability_drift(db: AsyncSession) -> List[AvailabilityDrift]:
+    """ProductAvailability rows that differ from the nursery stock at their location."""
+    actual: Dict[Spot, int] = {}
+    stock = await db.execute(
+        select(Nursery.city, Nursery.commune, NurseryInventory.product_id, NurseryInventory.quantity).join(
+            Nursery, Nursery.id == NurseryInventory.nursery_id
+        )
+    )
+    for city, commune, product_id, quantity in stock:
+        spot = (*location_key(city, commune), product_id)
+        actual[spot] = actual.get(spot, 0) + quantity
+    recorded: Dict[Spot, int] = {
+        (city, commune, product_id): quantity
+        for city, commune, product_id, quantity in await db.execute(
+            select(
+                ProductAvailability.city,
+                ProductAvailability.commune,
+                ProductAvailability.product_id,
+                ProductAvailability.quantity,
+            )
+        )
+    }
+    drifts = []
+    for spot in sorted(actual.keys() | recorded.keys()):
+        if recorded.get(spot, 0) != actual.get(spot, 0):
+            city, commune, product_id = spot
+            drifts.append(
+                AvailabilityDrift(
+                    city=city,
+                    commune=commune,
+                    product_id=product_id,
+                    recorded=recorded.get(spot),
+                    actual=actual.get(spot, 0),
+                )
+            )
+    return drifts
+
+
+async def repair_availability_drift(db: AsyncSession, drifts: List[AvailabilityDrift]) -> None:
+    """Bring drifted ProductAvailability rows back to the nursery stock found by find_availability_drift."""
+    await apply_availability_deltas(
+        db,
+        {(d.city, d.commune, d.product_id): d.actual - (d.recorded or 0) for d in drifts},
+    )
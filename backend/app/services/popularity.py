@@ -0,0 +1,199 @@
+"""
+Best-seller scores for the "popular" catalog sort.
+
+A product's popularity is the units it sold in confirmed orders, each unit
+counting half as much every POPULARITY_HALF_LIFE_DAYS after its order was
+confirmed. Summing order items per listing would cost more as the order
+history grows, so a batch job (refresh_popularity.py) keeps the sums in
+product_popularity instead. It reads only orders confirmed since its
+watermark, a (confirmed_at, id) keyset, and adds their units with
+INSERT ... ON CONFLICT DO UPDATE; the watermark moves in the same
+transaction, so a failed run is simply retried.
+
+Decay needs no rewrite of old rows: a unit's weight is scaled to the fixed
+EPOCH, 2 ** ((confirmed_at - EPOCH) / half-life), rather than to the
+current time. Every score would be divided by the same factor to bring it
+to any later moment, so stored scores rank products exactly as their
+decayed units would, and decayed_units() converts one back. Weights
+double every half-life, which leaves float64 room for about 1000
+half-lives past EPOCH (some 38 years at 14 days). Scores computed with
+another half-life do not mix, so changing the setting needs a rebuild.
+
+Orders cancelled before the job reads them are skipped; a later
+cancellation is not taken back, as for related products.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, tuple_, update as update_rows
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import JobWatermark, Order, OrderItem, OrderStatus, ProductPopularity
+
+JOB_NAME = "popularity"
+
+EPOCH = datetime(2025, 1, 1)
+
+# Orders confirmed more recently than this are left for the next run, so
+# one still being committed cannot slip behind the watermark.
+SETTLE_TIME = timedelta(minutes=1)
+
+# Rows per INSERT
+BATCH_SIZE = 5_000
+
+_MICROSECONDS_PER_DAY = 86_400_000_000
+
+
+def weights(confirmed_at: np.ndarray, half_life_days: float) -> np.ndarray:
+    """Weight of one unit sold at each of `confirmed_at` (datetime64), scaled to EPOCH."""
+    elapsed = (confirmed_at - np.datetime64(EPOCH, "us")).astype("timedelta64[us]").astype(np.float64)
+    return np.exp2(elapsed / (half_life_days * _MICROSECONDS_PER_DAY))
+
+
+def decayed_units(score: float, at: datetime, half_life_days: Optional[float] = None) -> float:
+    """The units sold that `score` stands for once decayed to `at`."""
+    half_life_days = half_life_days or settings.popularity_half_life_days
+    return score * 2.0 ** (-(at - EPOCH).total_seconds() / (half_life_days * 86_400))
+
+
+def sum_scores(
+    product_ids: np.ndarray, quantities: np.ndarray, confirmed_at: np.ndarray, half_life_days: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(product, units, score, last sold) per distinct product, from one entry per order item."""
+    products, index = np.unique(product_ids, return_inverse=True)
+    units = np.bincount(index, weights=quantities, minlength=len(products)).astype(np.int64)
+    scores = np.bincount(index, weights=quantities * weights(confirmed_at, half_life_days), minlength=len(products))
+    last_sold = np.full(len(products), np.datetime64("NaT"), dtype=confirmed_at.dtype)
+    np.fmax.at(last_sold, index, confirmed_at)
+    return products, units, scores, last_sold
+
+
+@dataclass
+class RunStats:
+    orders: int = 0
+    products: int = 0  # product_popularity rows added to or updated, per chunk
+
+
+def _insert(db: AsyncSession):
+    return postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+
+
+async def _watermark(db: AsyncSession) -> Optional[Tuple[datetime, int]]:
+    row = (
+        await db.execute(select(JobWatermark.last_at, JobWatermark.last_id).where(JobWatermark.name == JOB_NAME))
+    ).first()
+    return (row.last_at, row.last_id) if row and row.last_at else None
+
+
+async def _set_watermark(db: AsyncSession, last_at: datetime, last_id: int) -> None:
+    statement = _insert(db)(JobWatermark).values(
+        name=JOB_NAME, last_at=last_at, last_id=last_id, updated_at=datetime.utcnow()
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[JobWatermark.name],
+            set_={
+                "last_at": statement.excluded.last_at,
+                "last_id": statement.excluded.last_id,
+                "updated_at": statement.excluded.updated_at,
+            },
+        )
+    )
+
+
+async def _add_scores(
+    db: AsyncSession, products: np.ndarray, units: np.ndarray, scores: np.ndarray, last_sold: np.ndarray
+) -> None:
+    updated_at = datetime.utcnow()
+    rows = [
+        {"product_id": product_id, "units": count, "score": score, "last_sold_at": sold_at, "updated_at": updated_at}
+        for product_id, count, score, sold_at in zip(
+            products.tolist(), units.tolist(), scores.tolist(), last_sold.astype("datetime64[us]").tolist()
+        )
+    ]
+    insert_ = _insert(db)
+    for start in range(0, len(rows), BATCH_SIZE):
+        statement = insert_(ProductPopularity).values(rows[start : start + BATCH_SIZE])
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[ProductPopularity.product_id],
+                set_={
+                    "units": ProductPopularity.units + statement.excluded.units,
+                    "score": ProductPopularity.score + statement.excluded.score,
+                    # Chunks are read in confirmation order
+                    "last_sold_at": statement.excluded.last_sold_at,
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+        )
+
+
+async def update(
+    db: AsyncSession, chunk_orders: int = 10_000, half_life_days: Optional[float] = None, now: Optional[datetime] = None
+) -> RunStats:
+    """Add the orders confirmed since the last run, `chunk_orders` at a time, committing after each chunk."""
+    half_life_days = half_life_days or settings.popularity_half_life_days
+    cutoff = (now or datetime.utcnow()) - SETTLE_TIME
+    stats = RunStats()
+    while True:
+        watermark = await _watermark(db)
+        confirmed = Order.confirmed_at.is_not(None)
+        if watermark:
+            confirmed = tuple_(Order.confirmed_at, Order.id) > tuple_(*watermark)
+        orders = (
+            await db.execute(
+                select(Order.confirmed_at, Order.id)
+                .where(confirmed, Order.confirmed_at <= cutoff)
+                .order_by(Order.confirmed_at, Order.id)
+                .limit(chunk_orders)
+            )
+        ).all()
+        if not orders:
+            return stats
+
+        last_at, last_id = orders[-1]
+        rows = (
+            await db.execute(
+                select(OrderItem.product_id, OrderItem.quantity, Order.confirmed_at)
+                .join(Order, Order.id == OrderItem.order_id)
+                .where(
+                    confirmed,
+                    tuple_(Order.confirmed_at, Order.id) <= tuple_(last_at, last_id),
+                    Order.status == OrderStatus.CONFIRMED,
+                    OrderItem.product_id.is_not(None),
+                )
+            )
+        ).all()
+        products = np.empty(0, dtype=np.int64)
+        if rows:
+            product_ids, quantities, confirmed_at = zip(*rows)
+            products, units, scores, last_sold = sum_scores(
+                np.array(product_ids, dtype=np.int64),
+                np.array(quantities, dtype=np.float64),
+                np.array(confirmed_at, dtype="datetime64[us]"),
+                half_life_days,
+            )
+            await _add_scores(db, products, units, scores, last_sold)
+        await _set_watermark(db, last_at, last_id)
+        await db.commit()
+
+        stats.orders += len(orders)
+        stats.products += len(products)
+
+
+async def rebuild(db: AsyncSession, chunk_orders: int = 10_000, now: Optional[datetime] = None) -> RunStats:
+    """Recompute every score from the whole order history, e.g. after changing the half-life.
+
+    Scores are zeroed rather than deleted, so the catalog engine sees them change.
+    """
+    await db.execute(
+        update_rows(ProductPopularity).values(units=0, score=0.0, last_sold_at=None, updated_at=datetime.utcnow())
+    )
+    await db.execute(update_rows(JobWatermark).where(JobWatermark.name == JOB_NAME).values(last_at=None, last_id=0))
+    await db.commit()
+    return await update(db, chunk_orders=chunk_orders, now=now)
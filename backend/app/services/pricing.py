@@ -0,0 +1,194 @@
+"""
+Order pricing: subtotal, shipping and tax for a cart.
+
+The quote endpoint and checkout both price carts here, so customers are
+charged exactly what they were quoted. A quote costs one query, a single IN
+over the cart's products, however many lines the cart has.
+
+Shipping charges and tax rates come from the pricing_rules table. It is
+small, so it is kept in memory and re-read when a rule is changed through
+this process, or every PRICING_RULES_REFRESH_SECONDS for changes made
+through other workers. For each kind the most specific active rule for the
+destination wins (commune, then country, then catch-all), and among those
+the one with the highest min_subtotal_cents the cart reaches, so free
+shipping over 50 000 is a second shipping rule with amount 0. Without a
+matching rule the DEFAULT_SHIPPING_CENTS / DEFAULT_TAX_RATE_BPS settings
+apply.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import PricingRule, PricingRuleKind, Product
+
+Line = Tuple[int, int]  # (product_id, quantity)
+
+
+class _Rule(NamedTuple):
+    country: Optional[str]
+    commune: Optional[str]
+    min_subtotal_cents: int
+    value: int  # amount_cents for shipping, rate_bps for tax
+
+
+def _normalise(place: Optional[str]) -> Optional[str]:
+    return (place.strip().casefold() or None) if place else None
+
+
+def _precedence(rule: _Rule) -> Tuple[int, int, int]:
+    # Checked in this order; the first rule that applies wins
+    return (rule.commune is None, rule.country is None, -rule.min_subtotal_cents)
+
+
+class PricingRules:
+    def __init__(self, refresh_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._lock = asyncio.Lock()
+        self._rules: Dict[PricingRuleKind, List[_Rule]] = {}
+        # Bumped by invalidate(); a refresh that read rules before then stays stale
+        self.generation = 0
+        self._generation: Optional[int] = None
+        self._refreshed_at: Optional[float] = None
+
+    def is_stale(self) -> bool:
+        return (
+            self._refreshed_at is None
+            or self._generation != self.generation
+            or self._clock() - self._refreshed_at >= self.refresh_seconds
+        )
+
+    def invalidate(self) -> None:
+        """Re-read the rules before the next quote; call after committing a rule change."""
+        self.generation += 1
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        if self.is_stale():
+            async with self._lock:
+                if self.is_stale():
+                    await self.refresh(db)
+
+    async def refresh(self, db: AsyncSession) -> None:
+        generation = self.generation
+        rows = await db.execute(
+            select(
+                PricingRule.kind,
+                PricingRule.country,
+                PricingRule.commune,
+                PricingRule.min_subtotal_cents,
+                PricingRule.amount_cents,
+                PricingRule.rate_bps,
+            ).where(PricingRule.active.is_(True))
+        )
+        rules: Dict[PricingRuleKind, List[_Rule]] = {kind: [] for kind in PricingRuleKind}
+        for kind, country, commune, min_subtotal_cents, amount_cents, rate_bps in rows:
+            value = amount_cents if kind == PricingRuleKind.SHIPPING else rate_bps
+            if value is not None:
+                rules[kind].append(_Rule(_normalise(country), _normalise(commune), min_subtotal_cents, value))
+        for kind_rules in rules.values():
+            kind_rules.sort(key=_precedence)
+        self._rules = rules
+        self._generation = generation
+        self._refreshed_at = self._clock()
+
+    def _match(
+        self, kind: PricingRuleKind, subtotal_cents: int, country: Optional[str], commune: Optional[str]
+    ) -> Optional[int]:
+        country, commune = _normalise(country), _normalise(commune)
+        for rule in self._rules.get(kind, ()):
+            if (
+                rule.country in (None, country)
+                and rule.commune in (None, commune)
+                and subtotal_cents >= rule.min_subtotal_cents
+            ):
+                return rule.value
+        return None
+
+    def shipping_cents(self, subtotal_cents: int, country: Optional[str], commune: Optional[str]) -> int:
+        amount = self._match(PricingRuleKind.SHIPPING, subtotal_cents, country, commune)
+        return settings.default_shipping_cents if amount is None else amount
+
+    def tax_cents(self, subtotal_cents: int, country: Optional[str], commune: Optional[str]) -> int:
+        rate_bps = self._match(PricingRuleKind.TAX, subtotal_cents, country, commune)
+        if rate_bps is None:
+            rate_bps = settings.default_tax_rate_bps
+        return subtotal_cents * rate_bps // 10_000
+
+
+rules = PricingRules(settings.pricing_rules_refresh_seconds)
+
+
+@dataclass
+class QuoteLine:
+    product_id: int
+    product_name: str
+    quantity: int
+    unit_price_cents: int
+    line_total_cents: int
+
+
+@dataclass
+class Quote:
+    lines: List[QuoteLine]
+    subtotal_cents: int
+    shipping_cents: int
+    tax_cents: int
+    total_cents: int
+
+
+class UnavailableProducts(Exception):
+    """Raised with every cart product that is missing or inactive."""
+
+    def __init__(self, missing: List[int], inactive: List[int]):
+        super().__init__(f"{len(missing) + len(inactive)} product(s) are not available")
+        self.missing = missing
+        self.inactive = inactive
+
+
+async def quote(
+    db: AsyncSession, lines: Sequence[Line], country: Optional[str] = None, commune: Optional[str] = None
+) -> Quote:
+    """Price `lines` at current product prices for delivery to (country, commune).
+
+    Lines keep their order; a product listed twice is priced twice.
+    """
+    await rules.ensure_fresh(db)
+
+    product_ids = {product_id for product_id, _ in lines}
+    products = {
+        row.id: row
+        for row in await db.execute(
+            select(Product.id, Product.name, Product.price_cents, Product.active).where(Product.id.in_(product_ids))
+        )
+    }
+    missing = sorted(product_id for product_id in product_ids if product_id not in products)
+    inactive = sorted(product_id for product_id, row in products.items() if not row.active)
+    if missing or inactive:
+        raise UnavailableProducts(missing, inactive)
+
+    quote_lines = [
+        QuoteLine(
+            product_id=product_id,
+            product_name=products[product_id].name,
+            quantity=quantity,
+            unit_price_cents=products[product_id].price_cents,
+            line_total_cents=products[product_id].price_cents * quantity,
+        )
+        for product_id, quantity in lines
+    ]
+    subtotal_cents = sum(line.line_total_cents for line in quote_lines)
+    shipping_cents = rules.shipping_cents(subtotal_cents, country, commune)
+    tax_cents = rules.tax_cents(subtotal_cents, country, commune)
+    return Quote(
+        lines=quote_lines,
+        subtotal_cents=subtotal_cents,
+        shipping_cents=shipping_cents,
+        tax_cents=tax_cents,
+        total_cents=subtotal_cents + shipping_cents + tax_cents,
+    )
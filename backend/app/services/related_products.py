@@ -0,0 +1,215 @@
+"""
+"Frequently bought together" recommendations from order history.
+
+A batch job (build_related_products.py) reads order items in chunks of new
+orders and counts, with NumPy, how many orders contained each pair of
+products. The counts are added to product_cooccurrence (one row per
+direction) with INSERT ... ON CONFLICT DO UPDATE, and the top
+RELATED_PRODUCTS_TOP_K list of every product those orders touched is
+rebuilt in product_recommendations with one INSERT ... SELECT. Only orders
+past the job's watermark, a (created_at, id) keyset, are read, and the
+watermark moves in the same transaction as the counts, so each run costs
+as much as the new orders, whatever the size of the history, and a failed
+run is simply retried.
+
+Cancelled and draft orders are skipped. An order cancelled after it was
+counted stays counted; the lists are a popularity signal, not a ledger.
+Orders with more than MAX_ORDER_PRODUCTS distinct products (wholesale
+carts) are skipped too: they would add thousands of weak pairs each.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import JobWatermark, Order, OrderItem, OrderStatus, ProductCooccurrence, ProductRecommendation
+
+JOB_NAME = "related_products"
+
+MAX_ORDER_PRODUCTS = 50
+
+# Orders younger than this are left for the next run, so one still being
+# written cannot slip behind the watermark.
+SETTLE_TIME = timedelta(minutes=1)
+
+# Rows per INSERT and ids per IN list
+BATCH_SIZE = 5_000
+
+_SKIPPED_STATUSES = (OrderStatus.DRAFT, OrderStatus.CANCELLED)
+
+
+def count_pairs(order_ids: np.ndarray, product_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(product, related, orders) for every ordered pair of distinct products bought in the same order.
+
+    Takes one entry per order item; repeated products within an order count once.
+    """
+    # One sorted key per distinct (order, product): orders grouped, products ascending
+    items = np.unique((order_ids.astype(np.int64) << 32) | product_ids.astype(np.int64))
+    orders, products = items >> 32, items & 0xFFFFFFFF
+
+    starts = np.flatnonzero(np.r_[True, orders[1:] != orders[:-1]])
+    sizes = np.diff(np.r_[starts, len(items)])
+    keep = (sizes >= 2) & (sizes <= MAX_ORDER_PRODUCTS)
+    starts, sizes = starts[keep], sizes[keep]
+    if not len(sizes):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # Every item of a kept order, each repeated once per item of its order (itself included)
+    item_index = np.repeat(starts, sizes) + (np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes))
+    repeats = np.repeat(sizes, sizes)
+    left = np.repeat(item_index, repeats)
+    # ...paired with every item of the same order
+    group_start = np.repeat(np.repeat(starts, sizes), repeats)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    right = group_start + offsets
+
+    distinct = left != right
+    pairs = (products[left[distinct]] << 32) | products[right[distinct]]
+    keys, counts = np.unique(pairs, return_counts=True)
+    return keys >> 32, keys & 0xFFFFFFFF, counts
+
+
+@dataclass
+class RunStats:
+    orders: int = 0
+    pairs: int = 0  # (product, related) rows added to or updated in product_cooccurrence
+    products: int = 0  # products whose top-K list was rebuilt
+
+
+def _insert(db: AsyncSession):
+    return postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+
+
+async def _watermark(db: AsyncSession) -> Optional[Tuple[datetime, int]]:
+    row = (
+        await db.execute(select(JobWatermark.last_at, JobWatermark.last_id).where(JobWatermark.name == JOB_NAME))
+    ).first()
+    if row is None or (row.last_at is None and not row.last_id):
+        return None
+    if row.last_at is None:
+        # Left by runs that kept an order id only; resume from that order's created_at
+        last_at = await db.scalar(
+            select(Order.created_at).where(Order.id <= row.last_id).order_by(Order.id.desc()).limit(1)
+        )
+        return (last_at, row.last_id) if last_at else None
+    return row.last_at, row.last_id
+
+
+async def _set_watermark(db: AsyncSession, last_at: datetime, last_id: int) -> None:
+    statement = _insert(db)(JobWatermark).values(
+        name=JOB_NAME, last_at=last_at, last_id=last_id, updated_at=datetime.utcnow()
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[JobWatermark.name],
+            set_={
+                "last_at": statement.excluded.last_at,
+                "last_id": statement.excluded.last_id,
+                "updated_at": statement.excluded.updated_at,
+            },
+        )
+    )
+
+
+async def _add_counts(db: AsyncSession, left: np.ndarray, right: np.ndarray, counts: np.ndarray) -> None:
+    rows = [
+        {"product_id": product_id, "related_product_id": related_id, "orders": count}
+        for product_id, related_id, count in zip(left.tolist(), right.tolist(), counts.tolist())
+    ]
+    insert_ = _insert(db)
+    for start in range(0, len(rows), BATCH_SIZE):
+        statement = insert_(ProductCooccurrence).values(rows[start : start + BATCH_SIZE])
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[ProductCooccurrence.product_id, ProductCooccurrence.related_product_id],
+                set_={"orders": ProductCooccurrence.orders + statement.excluded.orders},
+            )
+        )
+
+
+async def rebuild_top_k(db: AsyncSession, product_ids: Sequence[int], top_k: int) -> None:
+    """Replace the recommendation lists of `product_ids` with their current top `top_k` co-bought products."""
+    for start in range(0, len(product_ids), BATCH_SIZE):
+        chunk = product_ids[start : start + BATCH_SIZE]
+        ranked = (
+            select(
+                ProductCooccurrence.product_id,
+                ProductCooccurrence.related_product_id,
+                ProductCooccurrence.orders,
+                func.row_number()
+                .over(
+                    partition_by=ProductCooccurrence.product_id,
+                    order_by=(ProductCooccurrence.orders.desc(), ProductCooccurrence.related_product_id),
+                )
+                .label("rank"),
+            )
+            .where(ProductCooccurrence.product_id.in_(chunk))
+            .subquery()
+        )
+        await db.execute(delete(ProductRecommendation).where(ProductRecommendation.product_id.in_(chunk)))
+        await db.execute(
+            insert(ProductRecommendation).from_select(
+                ["product_id", "related_product_id", "orders", "rank"],
+                select(ranked.c.product_id, ranked.c.related_product_id, ranked.c.orders, ranked.c.rank).where(
+                    ranked.c.rank <= top_k
+                ),
+            )
+        )
+
+
+async def update(
+    db: AsyncSession, chunk_orders: int = 10_000, top_k: Optional[int] = None, now: Optional[datetime] = None
+) -> RunStats:
+    """Count the orders placed since the last run, `chunk_orders` at a time, committing after each chunk."""
+    top_k = top_k or settings.related_products_top_k
+    cutoff = (now or datetime.utcnow()) - SETTLE_TIME
+    stats = RunStats()
+    while True:
+        watermark = await _watermark(db)
+        # Keyed like the cutoff, so an order created late but given a lower id is not skipped
+        new_orders = Order.created_at <= cutoff
+        if watermark:
+            new_orders = new_orders & (tuple_(Order.created_at, Order.id) > tuple_(*watermark))
+        orders = (
+            await db.execute(
+                select(Order.created_at, Order.id)
+                .where(new_orders)
+                .order_by(Order.created_at, Order.id)
+                .limit(chunk_orders)
+            )
+        ).all()
+        if not orders:
+            return stats
+
+        order_ids = [order_id for _, order_id in orders]
+        rows = (
+            await db.execute(
+                select(OrderItem.order_id, OrderItem.product_id)
+                .join(Order, Order.id == OrderItem.order_id)
+                .where(
+                    OrderItem.order_id.in_(order_ids),
+                    Order.status.not_in(_SKIPPED_STATUSES),
+                    OrderItem.product_id.is_not(None),
+                )
+            )
+        ).all()
+        left = right = counts = np.empty(0, dtype=np.int64)
+        if rows:
+            items = np.array(rows, dtype=np.int64)
+            left, right, counts = count_pairs(items[:, 0], items[:, 1])
+        await _add_counts(db, left, right, counts)
+        touched = np.unique(left).tolist()
+        await rebuild_top_k(db, touched, top_k)
+        await _set_watermark(db, *orders[-1])
+        await db.commit()
+
+        stats.orders += len(order_ids)
+        stats.pairs += len(counts)
+        stats.products += len(touched)
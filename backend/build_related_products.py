@@ -0,0 +1,39 @@
+"""
+Script to update "frequently bought together" recommendations.
+Run this from the backend directory: python build_related_products.py [--chunk N]
+
+Counts co-purchases in orders placed since the previous run (see
+app/services/related_products.py) and rebuilds the recommendation lists of
+the products involved. Safe to run from cron as often as you like: a run
+with no new orders does two small queries. Workers pick up new lists once
+their catalog cache entries expire (CATALOG_CACHE_TTL_SECONDS).
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services import related_products
+
+
+async def build(chunk: int) -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            stats = await related_products.update(db, chunk_orders=chunk)
+            print(
+                f"Counted {stats.orders} new order(s): {stats.pairs} product pair(s) updated, "
+                f"{stats.products} recommendation list(s) rebuilt in {time.perf_counter() - start:.1f}s."
+            )
+            return 0
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update related-product recommendations from new orders.")
+    parser.add_argument("--chunk", type=int, default=10_000, help="orders counted and committed per batch")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(build(args.chunk)))
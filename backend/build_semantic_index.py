@@ -0,0 +1,34 @@
+"""
+Script to rebuild the vectors behind semantic catalog search.
+Run this from the backend directory: python build_semantic_index.py
+
+Embeds every active product (see app/services/catalog_semantic.py) into a
+new build under CATALOG_SEMANTIC_INDEX_DIR and makes it current. Workers
+switch to it on their next refresh and keep re-embedding products edited
+since, so run it from cron (e.g. nightly) to keep those overlays small.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services import catalog_semantic
+
+
+async def build() -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            os.makedirs(settings.catalog_semantic_index_dir, exist_ok=True)
+            name, products = await catalog_semantic.write_build(db, settings.catalog_semantic_index_dir)
+            print(f"Embedded {products} product(s) into {name} in {time.perf_counter() - start:.1f}s.")
+            return 0
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(build()))
@@ -0,0 +1,61 @@
+"""
+Script to check global inventory against nursery stock.
+Run this from the backend directory: python reconcile_inventory.py [--repair]
+
+Inventory.quantity and the per-location ProductAvailability index are kept
+up to date with deltas on every nursery stock write. This reports products
+whose totals have drifted from their nursery stock (e.g. after manual SQL)
+and, with --repair, fixes them. Exits with status 1 when drift was found and
+not repaired.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services import inventory_service
+
+
+async def reconcile(repair: bool) -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            drifts = await inventory_service.find_drift(db)
+            local_drifts = await inventory_service.find_availability_drift(db)
+            if not drifts and not local_drifts:
+                print("Global inventory and local availability match nursery stock.")
+                return 0
+
+            if drifts:
+                print(f"{'product':>8}  {'recorded':>9}  {'actual':>9}")
+                for drift in drifts:
+                    recorded = "missing" if drift.recorded is None else drift.recorded
+                    print(f"{drift.product_id:>8}  {recorded:>9}  {drift.actual:>9}")
+            if local_drifts:
+                print(f"\n{'location':<30}  {'product':>8}  {'recorded':>9}  {'actual':>9}")
+                for drift in local_drifts:
+                    location = f"{drift.city}/{drift.commune}" if drift.commune else drift.city
+                    recorded = "missing" if drift.recorded is None else drift.recorded
+                    print(f"{location:<30}  {drift.product_id:>8}  {recorded:>9}  {drift.actual:>9}")
+
+            if not repair:
+                print(
+                    f"\n{len(drifts)} product total(s) and {len(local_drifts)} local total(s) drifted. "
+                    "Run with --repair to fix."
+                )
+                return 1
+
+            await inventory_service.repair_drift(db, drifts)
+            await inventory_service.repair_availability_drift(db, local_drifts)
+            await db.commit()
+            print(f"\nRepaired {len(drifts)} product total(s) and {len(local_drifts)} local total(s).")
+            return 0
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect and repair global and local inventory drift.")
+    parser.add_argument("--repair", action="store_true", help="overwrite drifted totals with nursery sums")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(reconcile(args.repair)))
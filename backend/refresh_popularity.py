@@ -0,0 +1,43 @@
+"""
+Script to update the best-seller scores behind the "popular" catalog sort.
+Run this from the backend directory: python refresh_popularity.py [--chunk N] [--rebuild]
+
+Adds the units sold in orders confirmed since the previous run to
+product_popularity (see app/services/popularity.py). Safe to run from cron
+as often as you like: a run with no newly confirmed orders does one small
+query. After changing POPULARITY_HALF_LIFE_DAYS, run it once with
+--rebuild to recompute every score from the whole order history.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services import popularity
+
+
+async def refresh(chunk: int, rebuild: bool) -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            if rebuild:
+                stats = await popularity.rebuild(db, chunk_orders=chunk)
+            else:
+                stats = await popularity.update(db, chunk_orders=chunk)
+            print(
+                f"Counted {stats.orders} newly confirmed order(s): {stats.products} popularity score(s) "
+                f"updated in {time.perf_counter() - start:.1f}s."
+            )
+            return 0
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update product popularity scores from newly confirmed orders.")
+    parser.add_argument("--chunk", type=int, default=10_000, help="orders counted and committed per batch")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all scores from the whole order history")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(refresh(args.chunk, args.rebuild)))
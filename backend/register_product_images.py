@@ -0,0 +1,69 @@
+"""
+Script to register a folder of product photos for /catalog/products/similar-image.
+Run this from the backend directory: python register_product_images.py DIR
+
+Photos are matched to products by slug: DIR/<slug>.jpg for one photo, or
+any number of images under DIR/<slug>/. Only each photo's perceptual hash
+is stored (see app/services/catalog_images.py); a photo whose hash is
+already registered for its product is skipped, so re-running over the same
+folder is safe. Workers pick new photos up within
+CATALOG_IMAGE_INDEX_REFRESH_SECONDS.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from sqlalchemy import select
+
+from app.db.models import Product, ProductImageHash
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services import catalog_images
+
+
+def _photos(directory: str):
+    """(slug, path) of every file under `directory`."""
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        if entry.is_dir():
+            for name in sorted(os.listdir(entry.path)):
+                yield entry.name, os.path.join(entry.path, name)
+        elif not entry.name.startswith("."):
+            yield os.path.splitext(entry.name)[0], entry.path
+
+
+async def register(directory: str) -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            product_ids = dict((await db.execute(select(Product.slug, Product.id))).all())
+            known = set((await db.execute(select(ProductImageHash.product_id, ProductImageHash.hash))).all())
+            added, failed = 0, 0
+            for slug, path in _photos(directory):
+                product_id = product_ids.get(slug)
+                if product_id is None:
+                    print(f"{path}: no product with slug '{slug}'")
+                    failed += 1
+                    continue
+                with open(path, "rb") as photo:
+                    try:
+                        value = catalog_images.to_signed(catalog_images.image_hash(photo.read()))
+                    except catalog_images.UnreadableImage as exc:
+                        print(f"{path}: {exc}")
+                        failed += 1
+                        continue
+                if (product_id, value) not in known:
+                    db.add(ProductImageHash(product_id=product_id, hash=value, filename=os.path.basename(path)))
+                    known.add((product_id, value))
+                    added += 1
+            await db.commit()
+            print(f"Registered {added} new photo(s); {failed} skipped.")
+            return 1 if failed else 0
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Register product photos for search by photo.")
+    parser.add_argument("directory", help="folder of <slug>.<ext> files and/or <slug>/ folders of images")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(register(args.directory)))
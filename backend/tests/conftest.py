@@ -1,13 +1,19 @@
 
 import pytest
+from contextlib import contextmanager
 from typing import Generator
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
 
 from app.main import app
+from app.core.security import create_access_token
 from app.db.base import Base
-from app.db.session import get_db
+from app.db.models import User, UserRole
+from app.db.session import get_async_db, get_db
+from app.services import catalog_cache, pricing
 
 # Use an in-memory SQLite database for testing, or a separate test DB
 # For simplicity and speed, in-memory SQLite is often good, 
@@ -40,6 +46,16 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The request handlers use AsyncSession (see app.db.session.get_async_db), so the
+# app talks to the same SQLite file through aiosqlite. Data seeded by the sync
+# `db` fixture must be committed to be visible to the app.
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+)
+
 @pytest.fixture(scope="module")
 def db_engine():
     # Create tables
@@ -50,13 +66,14 @@ def db_engine():
 
 @pytest.fixture(scope="function")
 def db(db_engine) -> Generator[Session, None, None]:
-    connection = db_engine.connect()
-    transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+    session = TestingSessionLocal()
     yield session
+    session.rollback()
     session.close()
-    transaction.rollback()
-    connection.close()
+    # Commits are real (the app reads through its own connection), so clean up by hand.
+    with db_engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
 
 @pytest.fixture(scope="module")
 def client() -> Generator[TestClient, None, None]:
@@ -67,6 +84,58 @@ def client() -> Generator[TestClient, None, None]:
 def override_get_db(db: Session):
     def _get_db():
         yield db
+
+    async def _get_async_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
+
     app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_async_db] = _get_async_db
     yield
     app.dependency_overrides.pop(get_db)
+    app.dependency_overrides.pop(get_async_db)
+
+
+@pytest.fixture(scope="function")
+def admin_headers(db: Session) -> dict:
+    admin = User(email="admin@fixture.test", role=UserRole.ADMIN)
+    db.add(admin)
+    db.commit()
+    token = create_access_token(data={"sub": admin.id, "role": admin.role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="function")
+def count_statements():
+    """Context manager collecting the SQL statements the app executes."""
+
+    @contextmanager
+    def _count():
+        statements = []
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", _record)
+        try:
+            yield statements
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", _record)
+
+    return _count
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog_cache(monkeypatch):
+    """Each test gets an empty catalog cache; ids are reused once tables are cleaned."""
+    cache = catalog_cache.CatalogCache(max_size=128, ttl_seconds=60)
+    monkeypatch.setattr(catalog_cache, "cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_pricing_rules(monkeypatch):
+    """Each test reads pricing rules from its own tables."""
+    rules = pricing.PricingRules(refresh_seconds=60)
+    monkeypatch.setattr(pricing, "rules", rules)
+    return rules
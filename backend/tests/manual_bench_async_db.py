@@ -0,0 +1,107 @@
+"""
+Manual load benchmark: sync Session vs AsyncSession inside ``async def`` handlers.
+
+Every router used to call the synchronous ``get_db`` session from ``async def``
+handlers, so each query blocked the event loop. This script mounts the same
+slow query behind both dependencies and fires concurrent requests at them
+in-process, reporting wall time and requests/second for each.
+
+Needs a running PostgreSQL (``./start_db.sh`` from the project root) and
+DATABASE_URL pointing at it. Run from the backend directory:
+
+    python tests/manual_bench_async_db.py --requests 200 --concurrency 50 --query-ms 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add backend directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+
+
+def build_app(query_seconds: float, pool_size: int) -> FastAPI:
+    # Same settings as app.db.session, with pools sized so they are not the bottleneck.
+    engine = create_engine(settings.database_url, pool_size=pool_size)
+    async_engine = create_async_engine(settings.async_database_url, pool_size=pool_size)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, class_=Session)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    def get_db():
+        with SessionLocal() as db:
+            yield db
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+    stmt = text("SELECT pg_sleep(:s)")
+
+    @app.get("/sync")
+    async def sync_handler(db: Session = Depends(get_db)):
+        # Before: blocking call on the event loop thread.
+        db.execute(stmt, {"s": query_seconds})
+        return {"ok": True}
+
+    @app.get("/async")
+    async def async_handler(db: AsyncSession = Depends(get_async_db)):
+        # After: the loop keeps serving other requests while this one waits.
+        await db.execute(stmt, {"s": query_seconds})
+        return {"ok": True}
+
+    @app.on_event("shutdown")
+    async def dispose() -> None:
+        await async_engine.dispose()
+        engine.dispose()
+
+    return app
+
+
+async def run(app: FastAPI, path: str, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one() -> None:
+            async with semaphore:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        # Warm up the connection pools
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    app = build_app(args.query_ms / 1000, args.concurrency)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.query_ms:.0f} ms per query\n")
+    for label, path in (("before (sync Session)", "/sync"), ("after (AsyncSession)", "/async")):
+        elapsed = await run(app, path, args.requests, args.concurrency)
+        print(f"{label:<24} {elapsed:7.2f} s  {args.requests / elapsed:8.1f} req/s")
+
+    await app.router.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
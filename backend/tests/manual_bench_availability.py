@@ -0,0 +1,164 @@
+"""
+Manual benchmark: in_stock_near from the ProductAvailability index vs joins over nursery stock.
+
+Loads a synthetic catalog (50k products, 200 nurseries spread over 5 cities
+and 40 communes by default; slugs prefixed ``bench-near-``, nurseries named
+``bench-near-N``), stocks a random share of products at each nursery through
+inventory_service.upsert_stock so the index is maintained as in production,
+then times the product ids in stock near a commune and near a city:
+
+* ``index``: inventory_service.products_in_stock_near, one range scan;
+* ``join``: the same ids from nursery_inventory joined to nurseries.
+
+It also times a full /catalog/products?in_stock_near=... request. The
+catalog cache is disabled so every request reaches the database. The
+synthetic rows are deleted afterwards unless --keep is given.
+
+Needs a running PostgreSQL (``./start_db.sh`` from the project root) migrated
+to head (``alembic upgrade head``). Run from the backend directory:
+
+    python tests/manual_bench_availability.py --products 50000 --nurseries 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+# Add backend directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import Select, delete, distinct, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.db.models import Nursery, NurseryInventory, Product, ProductKind
+from app.db.session import AsyncSessionLocal, engine
+from app.main import app
+from app.services import catalog_cache, inventory_service
+
+PREFIX = "bench-near-"
+CITIES = ["Abidjan", "Bouaké", "Yamoussoukro", "San-Pédro", "Korhogo"]
+
+
+def load(db: Session, products: int, nurseries: int, batch_size: int = 5_000) -> None:
+    for start in range(0, products, batch_size):
+        rows = [
+            {
+                "slug": f"{PREFIX}{n}",
+                "name": f"Bench Plant {n}",
+                "price_cents": 500 + n % 20_000,
+                "currency": "USD",
+                "kind": ProductKind.PLANT,
+                "active": True,
+            }
+            for n in range(start, min(start + batch_size, products))
+        ]
+        db.execute(insert(Product), rows)
+    db.add_all(
+        Nursery(internal_name=f"{PREFIX}{n}", city=CITIES[n % len(CITIES)], commune=f"Commune {n % 40}")
+        for n in range(nurseries)
+    )
+    db.commit()
+
+
+async def stock(share: float) -> None:
+    """Stock `share` of the products at every synthetic nursery, through the index-maintaining service."""
+    rng = random.Random(7)
+    async with AsyncSessionLocal() as db:
+        product_ids = list(await db.scalars(select(Product.id).where(Product.slug.startswith(PREFIX))))
+        nursery_ids = list(await db.scalars(select(Nursery.id).where(Nursery.internal_name.startswith(PREFIX))))
+        for nursery_id in nursery_ids:
+            chosen = rng.sample(product_ids, int(len(product_ids) * share))
+            await inventory_service.upsert_stock(db, {(nursery_id, p): rng.randint(1, 20) for p in chosen})
+            await db.commit()
+        await db.execute(text("ANALYZE nursery_inventory"))
+        await db.execute(text("ANALYZE product_availability"))
+        await db.commit()
+
+
+def _joined(city: str, commune) -> Select:
+    query = (
+        select(distinct(NurseryInventory.product_id))
+        .join(Nursery, Nursery.id == NurseryInventory.nursery_id)
+        .where(func.lower(func.trim(Nursery.city)) == city, NurseryInventory.quantity > 0)
+    )
+    if commune is not None:
+        query = query.where(func.lower(func.trim(Nursery.commune)) == commune)
+    return query
+
+
+async def time_lookups(repeat: int) -> None:
+    async with AsyncSessionLocal() as db:
+        for city, commune in (("abidjan", "commune 0"), ("abidjan", None)):
+            timings = {"index": [], "join": []}
+            for _ in range(repeat):
+                for name, query in (
+                    ("index", inventory_service.products_in_stock_near(city, commune)),
+                    ("join", _joined(city, commune)),
+                ):
+                    start = time.perf_counter()
+                    ids = (await db.scalars(query)).all()
+                    timings[name].append((time.perf_counter() - start) * 1000)
+            where = f"{city}/{commune}" if commune else city
+            for name, values in timings.items():
+                print(f"{where:<20} {name:<6} {statistics.median(values):8.1f} ms  ({len(ids)} products)")
+
+
+async def time_listing(repeat: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = await client.get(
+                "/catalog/products", params={"in_stock_near": "Abidjan/Commune 0", "sort": "price"}
+            )
+            timings.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+    print(f"\n/catalog/products?in_stock_near=Abidjan/Commune 0: {statistics.median(timings):8.1f} ms")
+
+
+async def run(share: float, repeat: int) -> None:
+    await stock(share)
+    await time_lookups(repeat)
+    await time_listing(repeat)
+
+
+def cleanup() -> None:
+    with Session(engine) as db:
+        nursery_ids = select(Nursery.id).where(Nursery.internal_name.startswith(PREFIX))
+        db.execute(delete(NurseryInventory).where(NurseryInventory.nursery_id.in_(nursery_ids)))
+        db.execute(delete(Nursery).where(Nursery.internal_name.startswith(PREFIX)))
+        # ProductAvailability and Inventory rows go with the products (ON DELETE CASCADE)
+        db.execute(delete(Product).where(Product.slug.startswith(PREFIX)))
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--nurseries", type=int, default=200)
+    parser.add_argument("--share", type=float, default=0.05, help="share of products stocked at each nursery")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic rows in place")
+    args = parser.parse_args()
+
+    # Measure the database, not the read cache
+    catalog_cache.cache.max_size = 0
+
+    cleanup()
+    print(f"Loading {args.products} products and {args.nurseries} nurseries...")
+    with Session(engine) as db:
+        load(db, args.products, args.nurseries)
+    asyncio.run(run(args.share, args.repeat))
+
+    if not args.keep:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Manual benchmark: catalog listing latency, SQL backend vs in-memory engine.
+
+Loads a synthetic catalog (100k products by default, slugs prefixed
+``bench-engine-``) with attributes and inventory into the configured
+database, then sends a mix of /catalog/products requests (browse, filters,
+facets, search, deep pages) in-process with CATALOG_BACKEND=sql and with
+CATALOG_BACKEND=memory, reporting p50/p99 per request type. The catalog
+cache is disabled so every request reaches the backend under test; the
+engine's initial load time is reported separately. The synthetic rows are
+deleted afterwards unless --keep is given.
+
+Needs a running PostgreSQL (``./start_db.sh`` from the project root) migrated
+to head (``alembic upgrade head``). Run from the backend directory:
+
+    python tests/manual_bench_catalog_engine.py --products 100000 --repeat 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+# Add backend directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Inventory, PlantEnvironment, Product, ProductAttributes, ProductKind
+from app.db.session import AsyncSessionLocal, engine
+from app.main import app
+from app.services import catalog_cache, catalog_engine
+
+SLUG_PREFIX = "bench-engine-"
+
+COLORS = ["red", "white", "pink", "yellow", "purple", "orange", "blue", "cream", "coral", "lilac"]
+FLOWERS = ["roses", "tulips", "orchid", "lilies", "peonies", "daisies", "sunflowers", "hydrangea",
+           "carnations", "ranunculus", "monstera", "ficus", "succulent", "cactus", "fern", "bonsai"]
+SIZES = ["small", "medium", "large"]
+
+REQUESTS = {
+    "browse": {},
+    "browse p200": {"page": 200},
+    "kind+env": {"kind": "plant", "plant_environment": "indoor"},
+    "color+size": {"color": "red", "size": "large"},
+    "facets": {"plant_environment": "outdoor", "facets": "true"},
+    "search": {"q": "red ros"},
+    "search+facets": {"q": "orch", "facets": "true"},
+}
+
+
+def load_catalog(db: Session, count: int, batch_size: int = 5_000) -> None:
+    rng = random.Random(42)
+    for start in range(0, count, batch_size):
+        stop = min(start + batch_size, count)
+        products = [
+            {
+                "slug": f"{SLUG_PREFIX}{n}",
+                "name": f"{rng.choice(COLORS).title()} {rng.choice(FLOWERS).title()}",
+                "description": " ".join(rng.choices(FLOWERS + COLORS, k=12)),
+                "price_cents": rng.randint(500, 20_000),
+                "currency": "USD",
+                "kind": rng.choice(list(ProductKind)),
+                "active": rng.random() < 0.95,
+            }
+            for n in range(start, stop)
+        ]
+        ids = db.scalars(insert(Product).returning(Product.id), products).all()
+        db.execute(
+            insert(ProductAttributes),
+            [
+                {
+                    "product_id": product_id,
+                    "plant_environment": rng.choice(list(PlantEnvironment)),
+                    "color": rng.choice(COLORS),
+                    "size": rng.choice(SIZES),
+                }
+                for product_id in ids
+            ],
+        )
+        db.execute(insert(Inventory), [{"product_id": product_id, "quantity": rng.randint(0, 50)} for product_id in ids])
+        db.commit()
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+
+async def time_requests(client: httpx.AsyncClient, params: dict, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get("/catalog/products", params=params)
+        timings.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return timings
+
+
+def p99(timings: list) -> float:
+    return statistics.quantiles(timings, n=100)[-1]
+
+
+async def run(repeat: int) -> None:
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        await catalog_engine.engine.refresh(db)
+        print(f"engine load: {len(catalog_engine.engine)} products in {time.perf_counter() - start:.2f} s")
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for backend in ("sql", "memory"):
+            settings.catalog_backend = backend
+            for name, params in REQUESTS.items():
+                await time_requests(client, params, 3)  # warm up
+                results[backend, name] = await time_requests(client, params, repeat)
+
+    print(f"\n{'request':<16} {'sql p50':>9} {'p99':>8}   {'memory p50':>10} {'p99':>8}   (ms)")
+    for name in REQUESTS:
+        sql, memory = results["sql", name], results["memory", name]
+        print(
+            f"{name:<16} {statistics.median(sql):9.1f} {p99(sql):8.1f}"
+            f"   {statistics.median(memory):10.1f} {p99(memory):8.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic products in place")
+    args = parser.parse_args()
+
+    # Measure the backends, not the read cache; no writes happen during the run
+    catalog_cache.cache.max_size = 0
+    catalog_engine.engine.refresh_seconds = float("inf")
+
+    with Session(engine) as db:
+        existing = db.scalar(select(func.count()).where(Product.slug.startswith(SLUG_PREFIX)))
+        if existing != args.products:
+            db.execute(delete(Product).where(Product.slug.startswith(SLUG_PREFIX)))
+            db.commit()
+            print(f"Loading {args.products} synthetic products...")
+            load_catalog(db, args.products)
+
+    asyncio.run(run(args.repeat))
+
+    if not args.keep:
+        with Session(engine) as db:
+            db.execute(delete(Product).where(Product.slug.startswith(SLUG_PREFIX)))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Manual benchmark: deep catalog paging, OFFSET + full count vs keyset + bounded count.
+
+Loads a synthetic catalog (100k products by default, slugs prefixed
+``bench-page-``) into the configured database, then walks /catalog/products
+in-process three ways and reports per-page latency at increasing depth:
+
+* ``page=N`` with the total (OFFSET scan plus a bounded count);
+* ``page=N`` with ``include_total=false`` (OFFSET scan only);
+* ``cursor=...`` with ``include_total=false`` (keyset, index range scan).
+
+It also times one exact ``count(*)`` of the catalog against
+catalog_pagination.count_matches, which stops at CATALOG_EXACT_COUNT_LIMIT
+and falls back to the planner estimate. The catalog cache is disabled so
+every request reaches the database. The synthetic rows are deleted
+afterwards unless --keep is given.
+
+Needs a running PostgreSQL (``./start_db.sh`` from the project root) migrated
+to head (``alembic upgrade head``). Run from the backend directory:
+
+    python tests/manual_bench_catalog_pagination.py --products 100000 --pages 500
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add backend directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.db.models import Product, ProductKind
+from app.db.session import AsyncSessionLocal, engine
+from app.main import app
+from app.services import catalog_cache, catalog_pagination
+
+SLUG_PREFIX = "bench-page-"
+PAGE_SIZE = 20
+
+
+def load_catalog(db: Session, count: int, batch_size: int = 5_000) -> None:
+    for start in range(0, count, batch_size):
+        rows = [
+            {
+                "slug": f"{SLUG_PREFIX}{n}",
+                "name": f"Bench Plant {n}",
+                "price_cents": 500 + n % 20_000,
+                "currency": "USD",
+                "kind": ProductKind.PLANT,
+                "active": True,
+            }
+            for n in range(start, min(start + batch_size, count))
+        ]
+        db.execute(insert(Product), rows)
+        db.commit()
+    db.execute(text("ANALYZE products"))
+    db.commit()
+
+
+async def walk(client: httpx.AsyncClient, pages: int, mode: str) -> list:
+    """Per-page latencies (ms) for the first `pages` pages."""
+    timings, cursor = [], None
+    for page in range(1, pages + 1):
+        params = {"page_size": PAGE_SIZE}
+        if mode == "offset+total":
+            params["page"] = page
+        elif mode == "offset":
+            params.update(page=page, include_total="false")
+        else:
+            params["include_total"] = "false"
+            if cursor:
+                params["cursor"] = cursor
+        start = time.perf_counter()
+        response = await client.get("/catalog/products", params=params)
+        timings.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        cursor = response.json()["next_cursor"]
+    return timings
+
+
+async def time_counts(repeat: int) -> None:
+    query = select(Product).where(Product.active == True)
+    exact, bounded = [], []
+    async with AsyncSessionLocal() as db:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            total = await db.scalar(select(func.count()).select_from(query.subquery()))
+            exact.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            estimate, is_estimate = await catalog_pagination.count_matches(db, query, ("bench",))
+            bounded.append((time.perf_counter() - start) * 1000)
+    print(f"\nexact count:   {statistics.median(exact):8.1f} ms  ({total})")
+    print(f"count_matches: {statistics.median(bounded):8.1f} ms  ({estimate}, estimate={is_estimate})")
+
+
+def depths(pages: int) -> list:
+    return sorted({d for d in (1, 10, 50, 100, 250, 500, 1000, 2500, pages) if d <= pages})
+
+
+async def run(pages: int, repeat: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"\n{'mode':<14} " + " ".join(f"{f'p{d}':>9}" for d in depths(pages)) + "   (ms per page)")
+        for mode in ("offset+total", "offset", "cursor"):
+            timings = await walk(client, pages, mode)
+            print(f"{mode:<14} " + " ".join(f"{timings[d - 1]:9.1f}" for d in depths(pages)))
+    await time_counts(repeat)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--pages", type=int, default=500, help="pages to walk in each mode")
+    parser.add_argument("--repeat", type=int, default=10, help="repetitions of the count timings")
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic products in place")
+    args = parser.parse_args()
+
+    # Measure the database, not the read cache
+    catalog_cache.cache.max_size = 0
+
+    with Session(engine) as db:
+        existing = db.scalar(select(func.count()).where(Product.slug.startswith(SLUG_PREFIX)))
+        if existing != args.products:
+            db.execute(delete(Product).where(Product.slug.startswith(SLUG_PREFIX)))
+            db.commit()
+            print(f"Loading {args.products} synthetic products...")
+            load_catalog(db, args.products)
+
+    asyncio.run(run(args.pages, args.repeat))
+
+    if not args.keep:
+        with Session(engine) as db:
+            db.execute(delete(Product).where(Product.slug.startswith(SLUG_PREFIX)))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Manual benchmark: catalog search, ILIKE scan vs tsvector/GIN search.
+
+Loads a synthetic catalog (100k products by default, slugs prefixed
+``bench-search-``) into the configured database, then times the catalog
+search queries (count + first page) for a set of type-ahead inputs with the
+old ``ILIKE '%q%'`` filter and with app.services.catalog_search. The synthetic
+rows are deleted afterwards unless --keep is given.
+
+Needs a running PostgreSQL (``./start_db.sh`` from the project root) migrated
+to head (``alembic upgrade head``). Run from the backend directory:
+
+    python tests/manual_bench_catalog_search.py --products 100000 --repeat 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Add backend directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.db.models import Product, ProductKind
+from app.db.session import engine
+from app.services import catalog_search
+
+SLUG_PREFIX = "bench-search-"
+
+COLORS = ["red", "white", "pink", "yellow", "purple", "orange", "blue", "cream", "coral", "lilac"]
+FLOWERS = ["roses", "tulips", "orchid", "lilies", "peonies", "daisies", "sunflowers", "hydrangea",
+           "carnations", "ranunculus", "monstera", "ficus", "succulent", "cactus", "fern", "bonsai"]
+STYLES = ["bouquet", "arrangement", "pot", "basket", "bundle", "box", "wreath", "vase"]
+FILLER = ["fresh", "seasonal", "hand-tied", "premium", "delivered", "local", "garden", "wedding",
+          "birthday", "gift", "indoor", "outdoor", "easy", "care", "bright", "fragrant", "classic"]
+
+QUERIES = ["r", "ro", "ros", "rose", "roses", "red ros", "whi orch", "peon", "bouquet pink", "xyzzy"]
+
+
+def load_catalog(db: Session, count: int, batch_size: int = 5_000) -> None:
+    rng = random.Random(42)
+    for start in range(0, count, batch_size):
+        rows = []
+        for n in range(start, min(start + batch_size, count)):
+            name = f"{rng.choice(COLORS).title()} {rng.choice(FLOWERS).title()} {rng.choice(STYLES).title()}"
+            rows.append(
+                {
+                    "slug": f"{SLUG_PREFIX}{n}",
+                    "name": name,
+                    "description": " ".join(rng.choices(FILLER + FLOWERS, k=20)),
+                    "price_cents": rng.randint(500, 20_000),
+                    "currency": "USD",
+                    "kind": ProductKind.PLANT,
+                    "active": True,
+                }
+            )
+        db.execute(insert(Product), rows)
+        db.commit()
+    db.execute(text("ANALYZE products"))
+    db.commit()
+
+
+def ilike_query(q: str):
+    term = f"%{q}%"
+    return select(Product.id).where(
+        Product.active == True, Product.name.ilike(term) | Product.description.ilike(term)
+    )
+
+
+def search_query(q: str):
+    return catalog_search.apply_search(select(Product.id).where(Product.active == True), q, "postgresql")
+
+
+def time_query(db: Session, query, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.scalar(select(func.count()).select_from(query.subquery()))
+        db.execute(query.limit(20)).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic products in place")
+    args = parser.parse_args()
+
+    with Session(engine) as db:
+        existing = db.scalar(select(func.count()).where(Product.slug.startswith(SLUG_PREFIX)))
+        if existing != args.products:
+            db.execute(delete(Product).where(Product.slug.startswith(SLUG_PREFIX)))
+            db.commit()
+            print(f"Loading {args.products} synthetic products...")
+            load_catalog(db, args.products)
+
+        print(f"\n{'query':<16} {'ILIKE p50':>10} {'p95':>8}   {'search p50':>10} {'p95':>8}   (ms, count + first page)")
+        for q in QUERIES:
+            before = time_query(db, ilike_query(q), args.repeat)
+            after = time_query(db, search_query(q), args.repeat)
+            print(
+                f"{q!r:<16} {statistics.median(before):10.1f} {statistics.quantiles(before, n=20)[-1]:8.1f}"
+                f"   {statistics.median(after):10.1f} {statistics.quantiles(after, n=20)[-1]:8.1f}"
+            )
+
+        if not args.keep:
+            db.execute(delete(Product).where(Product.slug.startswith(SLUG_PREFIX)))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
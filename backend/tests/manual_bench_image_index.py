@@ -0,0 +1,143 @@
+"""
+Manual benchmark: search by photo, from upload to matching product ids.
+
+Fills an ImageIndex with synthetic hashes (100k photos by default: random
+hashes plus near copies of some of them, as when a product has several
+shots of one arrangement) and times, for uploads a couple of bits away
+from a registered photo:
+
+* ``hash``: catalog_images.image_hash of a phone-sized JPEG and of a
+  screenshot-sized PNG, the per-request cost before the lookup;
+* ``scan``: ImageIndex.search at a few max_distance values;
+* ``bk-tree``: the same searches over a BK-tree of the same hashes, with
+  the share of its nodes visited, for comparison.
+
+No database is needed. Run from the backend directory:
+
+    python tests/manual_bench_image_index.py --photos 100000
+"""
+
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add backend directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import catalog_images
+from app.services.catalog_images import ImageIndex
+
+
+def synthetic_hashes(count: int):
+    rng = random.Random(7)
+    hashes = [rng.getrandbits(64) for _ in range(count * 4 // 5)]
+    while len(hashes) < count:
+        value = rng.choice(hashes)
+        for _ in range(rng.randint(1, 6)):
+            value ^= 1 << rng.randrange(64)
+        hashes.append(value)
+    rng.shuffle(hashes)
+    return hashes
+
+
+def _photo(size) -> Image.Image:
+    rng = np.random.default_rng(1)
+    image = Image.new("RGB", size, (40, 90, 30))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y, r = rng.integers(0, size[0]), rng.integers(0, size[1]), rng.integers(size[0] // 40, size[0] // 6)
+        draw.ellipse([x - r, y - r, x + r, y + r], fill=tuple(rng.integers(0, 255, 3).tolist()))
+    return image
+
+
+class BKTree:
+    """Hamming-distance BK-tree; node: [hash, {distance to this node: child}]."""
+
+    def __init__(self) -> None:
+        self.root = None
+
+    def add(self, value: int) -> None:
+        if self.root is None:
+            self.root = [value, {}]
+            return
+        node = self.root
+        while True:
+            d = catalog_images.distance(value, node[0])
+            if d == 0:
+                return
+            if d not in node[1]:
+                node[1][d] = [value, {}]
+                return
+            node = node[1][d]
+
+    def search(self, value: int, max_distance: int):
+        """(matches, nodes visited)"""
+        matches, visited, stack = [], 0, [self.root]
+        while stack:
+            node = stack.pop()
+            visited += 1
+            d = catalog_images.distance(value, node[0])
+            if d <= max_distance:
+                matches.append(node[0])
+            stack.extend(child for edge, child in node[1].items() if abs(edge - d) <= max_distance)
+        return matches, visited
+
+
+def _time(function, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for label, size, format, options in (
+        ("4000x3000 JPEG", (4000, 3000), "JPEG", {"quality": 90}),
+        ("1170x2532 PNG", (1170, 2532), "PNG", {}),
+    ):
+        buffer = io.BytesIO()
+        _photo(size).save(buffer, format, **options)
+        data = buffer.getvalue()
+        timings = _time(lambda: catalog_images.image_hash(data), max(args.repeat // 4, 3))
+        print(f"hash     {label:<15} {statistics.median(timings):8.1f} ms  ({len(data) / 2**20:.1f} MiB)")
+
+    hashes = synthetic_hashes(args.photos)
+    index, tree = ImageIndex(refresh_seconds=60), BKTree()
+    for product_id, value in enumerate(hashes):
+        index.add(value, product_id)
+        tree.add(value)
+    index.search(0)  # stack the arrays, as the first search after a refresh does
+
+    rng = random.Random(3)
+    # Near copies of registered photos, as a customer would upload
+    queries = [value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for value in rng.sample(hashes, 20)]
+    for max_distance in (4, 6, catalog_images.MAX_DISTANCE):
+        timings = [t for value in queries for t in _time(lambda: index.search(value, max_distance), args.repeat)]
+        print(
+            f"scan     max_distance={max_distance:<3} {statistics.median(timings):8.2f} ms median, "
+            f"{sorted(timings)[int(len(timings) * 0.95)]:.2f} ms p95"
+        )
+    for max_distance in (4, 6, catalog_images.MAX_DISTANCE):
+        timings = [t for value in queries for t in _time(lambda: tree.search(value, max_distance), 1)]
+        visited = statistics.mean(tree.search(value, max_distance)[1] for value in queries) / len(hashes)
+        print(
+            f"bk-tree  max_distance={max_distance:<3} {statistics.median(timings):8.2f} ms median  "
+            f"({visited:.0%} of nodes visited)"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Manual benchmark: sort=popular from the product_popularity rollup vs aggregating order items per request.
+
+Loads a synthetic catalog and order history (5k products, 1M confirmed
+orders of 1-4 items by default, spread over the last year; slugs prefixed
+``bench-pop-``), then times:
+
+* ``refresh``: popularity.rebuild over the whole history, then an update
+  with one new batch of orders, which is what cron pays every few minutes;
+* ``rollup``: one page of /catalog/products?sort=popular;
+* ``aggregate``: the same first page computed from order_items with
+  SUM(quantity * 2 ^ (age / half-life)) grouped by product, as a listing
+  without the rollup would have to.
+
+The catalog cache is disabled so every request reaches the database. The
+full-history timing is a popularity.rebuild, so scores of real products are
+recomputed too. The synthetic rows are deleted afterwards unless --keep is
+given.
+
+Needs a running PostgreSQL (``./start_db.sh`` from the project root) migrated
+to head (``alembic upgrade head``). Run from the backend directory:
+
+    python tests/manual_bench_popularity.py --products 5000 --orders 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add backend directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Order, OrderItem, OrderStatus, Product, ProductKind
+from app.db.session import AsyncSessionLocal, engine
+from app.main import app
+from app.services import catalog_cache, popularity
+
+PREFIX = "bench-pop-"
+
+
+def load(db: Session, products: int, orders: int, batch_size: int = 20_000) -> None:
+    db.execute(
+        insert(Product),
+        [
+            {
+                "slug": f"{PREFIX}{n}",
+                "name": f"Bench Plant {n}",
+                "price_cents": 500 + n,
+                "currency": "USD",
+                "kind": ProductKind.PLANT,
+                "active": True,
+            }
+            for n in range(products)
+        ],
+    )
+    product_ids = list(db.scalars(select(Product.id).where(Product.slug.startswith(PREFIX))))
+    rng = random.Random(11)
+    now = datetime.utcnow() - popularity.SETTLE_TIME * 2
+    for start in range(0, orders, batch_size):
+        count = min(batch_size, orders - start)
+        confirmed = [now - timedelta(seconds=rng.randint(0, 365 * 86_400)) for _ in range(count)]
+        order_ids = db.scalars(
+            insert(Order).returning(Order.id),
+            [
+                {
+                    "status": OrderStatus.CONFIRMED,
+                    "subtotal_cents": 0,
+                    "total_cents": 0,
+                    "currency": "USD",
+                    "confirmed_at": at,
+                    "created_at": at,
+                    "updated_at": at,
+                }
+                for at in confirmed
+            ],
+        ).all()
+        db.execute(
+            insert(OrderItem),
+            [
+                {
+                    "order_id": order_id,
+                    # Skewed, so a few products sell far more than the rest
+                    "product_id": product_ids[min(int(rng.paretovariate(1.2)) - 1, len(product_ids) - 1)],
+                    "quantity": rng.randint(1, 3),
+                    "unit_price_cents": 1000,
+                    "product_name": "Bench Plant",
+                }
+                for order_id in order_ids
+                for _ in range(rng.randint(1, 4))
+            ],
+        )
+        db.commit()
+    db.execute(text("ANALYZE orders"))
+    db.execute(text("ANALYZE order_items"))
+    db.commit()
+
+
+def _aggregated_page(page_size: int):
+    half_life = settings.popularity_half_life_days * 86_400
+    age = func.extract("epoch", func.now() - Order.confirmed_at)
+    score = func.sum(OrderItem.quantity * func.power(0.5, age / half_life))
+    return (
+        select(OrderItem.product_id, score.label("score"))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status == OrderStatus.CONFIRMED, Order.confirmed_at.is_not(None))
+        .group_by(OrderItem.product_id)
+        .order_by(score.desc(), OrderItem.product_id.desc())
+        .limit(page_size)
+    )
+
+
+async def time_refresh() -> None:
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        stats = await popularity.rebuild(db)
+        print(f"refresh  full history {(time.perf_counter() - start):8.1f} s   ({stats.orders} orders)")
+
+    # One new batch of orders, as between two cron runs
+    with Session(engine) as db:
+        db.execute(
+            update(Order)
+            .where(Order.id.in_(select(Order.id).order_by(Order.id.desc()).limit(2_000)))
+            .values(confirmed_at=datetime.utcnow() - popularity.SETTLE_TIME * 2)
+        )
+        db.commit()
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        stats = await popularity.update(db)
+        print(f"refresh  incremental  {(time.perf_counter() - start) * 1000:8.1f} ms  ({stats.orders} orders)")
+
+
+async def time_listing(repeat: int) -> None:
+    timings = {"rollup": [], "aggregate": []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client, AsyncSessionLocal() as db:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = await client.get("/catalog/products", params={"sort": "popular", "include_total": "false"})
+            timings["rollup"].append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+
+            start = time.perf_counter()
+            (await db.execute(_aggregated_page(20))).all()
+            timings["aggregate"].append((time.perf_counter() - start) * 1000)
+    for name, values in timings.items():
+        print(f"{name:<9} first page   {statistics.median(values):8.1f} ms")
+
+
+async def run(repeat: int) -> None:
+    await time_refresh()
+    await time_listing(repeat)
+
+
+def cleanup() -> None:
+    with Session(engine) as db:
+        product_ids = select(Product.id).where(Product.slug.startswith(PREFIX))
+        order_ids = select(OrderItem.order_id).where(OrderItem.product_id.in_(product_ids))
+        # Order items and popularity rows go with their orders and products (ON DELETE CASCADE)
+        db.execute(delete(Order).where(Order.id.in_(order_ids)))
+        db.execute(delete(Product).where(Product.slug.startswith(PREFIX)))
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic rows in place")
+    args = parser.parse_args()
+
+    # Measure the database, not the read cache
+    catalog_cache.cache.max_size = 0
+
+    cleanup()
+    print(f"Loading {args.products} products and {args.orders} orders...")
+    with Session(engine) as db:
+        load(db, args.products, args.orders)
+    asyncio.run(run(args.repeat))
+
+    if not args.keep:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
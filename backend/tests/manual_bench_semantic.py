@@ -0,0 +1,107 @@
+"""
+Manual benchmark: semantic search query latency over a memory-mapped build.
+
+Generates a synthetic catalog (100k products by default) from a small
+vocabulary of plant words, writes it as a catalog_semantic build into a
+temporary directory, maps it into a SemanticIndex and times:
+
+* ``build``: embedding and writing every product (build_semantic_index.py);
+* ``search``: SemanticIndex.search for a handful of customer-style queries,
+  the cost a semantic listing adds before its SQL query;
+* ``search + overlay``: the same after --edits products were re-embedded
+  into the worker's overlay, as between two builds.
+
+No database is needed. Run from the backend directory:
+
+    python tests/manual_bench_semantic.py --products 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Add backend directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import catalog_semantic
+from app.services.catalog_semantic import SemanticIndex
+
+NAMES = ["Rose", "Orchid", "Fern", "Cactus", "Lily", "Tulip", "Peony", "Monstera", "Pothos", "Ficus", "Aloe", "Ivy"]
+ADJECTIVES = ["Red", "White", "Dwarf", "Giant", "Variegated", "Golden", "Trailing", "Miniature", "Wild", "Velvet"]
+TRAITS = [
+    "thrives in low light", "loves full sun", "needs bright indirect light", "tolerates dry air",
+    "ideal for bedrooms", "perfect for offices", "pet friendly", "fragrant blooms", "easy to care for",
+    "fast growing", "drought tolerant", "purifies the air", "long-lasting cut flowers", "great gift",
+]
+CARE = ["Water weekly.", "Let the soil dry out.", "Mist the leaves.", "Keep away from drafts.", "Feed monthly."]
+QUERIES = [
+    "low-light plant for a bedroom",
+    "pet friendly plant",
+    "fragrant flowers for a gift",
+    "something that survives in a dry office",
+    "red roses",
+]
+
+
+def synthetic_products(count: int):
+    rng = random.Random(5)
+    for product_id in range(1, count + 1):
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(NAMES)} {product_id}"
+        description = ", ".join(rng.sample(TRAITS, 3)).capitalize() + "."
+        yield product_id, name, description, rng.choice(CARE)
+
+
+def _time_queries(index: SemanticIndex, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        for q in QUERIES:
+            start = time.perf_counter()
+            index.search(q)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--edits", type=int, default=1_000, help="products re-embedded into the overlay")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    products = list(synthetic_products(args.products))
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        build = catalog_semantic.save_build(directory, products, datetime.utcnow())
+        size = os.path.getsize(os.path.join(directory, build, "vectors.npy")) / 2**20
+        print(f"build             {time.perf_counter() - start:8.1f} s   ({args.products} products, {size:.0f} MiB)")
+
+        index = SemanticIndex(directory, refresh_seconds=60)
+        index.load(build)
+        index.search(QUERIES[0])  # fault the mapping in, as a warm worker has it
+        timings = _time_queries(index, args.repeat)
+        print(
+            f"search            {statistics.median(timings):8.1f} ms median, "
+            f"{sorted(timings)[int(len(timings) * 0.95)]:.1f} ms p95"
+        )
+
+        rng = random.Random(9)
+        for product_id, name, description, care in rng.sample(products, min(args.edits, len(products))):
+            index.put(product_id, name, f"{description} Recently repotted.", care)
+        timings = _time_queries(index, args.repeat)
+        print(
+            f"search + overlay  {statistics.median(timings):8.1f} ms median, "
+            f"{sorted(timings)[int(len(timings) * 0.95)]:.1f} ms p95  ({len(index._overlay)} overlay rows)"
+        )
+        print(f"\nTop matches for {QUERIES[0]!r}:")
+        for product_id, score in index.search(QUERIES[0], limit=3):
+            _, name, description, _ = products[product_id - 1]
+            print(f"  {score:.2f}  {name}: {description}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from app.services.allocation_solver import OrderDemand, solve_batch, solve_order
+
+
+def test_solve_order_prefers_fewer_fulfillments_then_nearer_nurseries():
+    demand = OrderDemand(
+        order_id=1,
+        lines=[(10, 100, 2), (11, 101, 1)],
+        tiers={1: 1, 2: 1, 3: 3, 4: 2},
+    )
+    stock = {
+        (1, 100): 2,  # same commune, first product only
+        (2, 101): 1,  # same commune, second product only
+        (3, 100): 5,  # far away, everything
+        (3, 101): 5,
+        (4, 100): 2,  # same city, everything
+        (4, 101): 1,
+    }
+
+    solution = solve_order(demand, stock)
+
+    assert solution.cost == (1, 2)
+    assert solution.allocations == {4: {10: 2, 11: 1}}
+
+
+def test_solve_order_returns_none_when_stock_is_short():
+    demand = OrderDemand(order_id=1, lines=[(10, 100, 3)], tiers={1: 1, 2: 2})
+    assert solve_order(demand, {(1, 100): 1, (2, 100): 1}) is None
+
+
+def test_solve_batch_resolves_contention_across_orders():
+    # Order 1 can be served by nursery 1 (near) or nursery 2 (far). Order 2
+    # also needs a product only nursery 1 stocks, so serving order 1 first
+    # from nursery 1 would split order 2 or leave it unserved.
+    first = OrderDemand(order_id=1, lines=[(10, 100, 1)], tiers={1: 1, 2: 3})
+    second = OrderDemand(order_id=2, lines=[(20, 100, 1), (21, 101, 1)], tiers={1: 1, 2: 3})
+    stock = {(1, 100): 1, (1, 101): 1, (2, 100): 1}
+
+    solutions = solve_batch([first, second], stock)
+
+    assert solutions[1].allocations == {2: {10: 1}}
+    assert solutions[2].allocations == {1: {20: 1, 21: 1}}
+
+
+def test_solve_batch_gives_older_orders_priority_on_ties():
+    first = OrderDemand(order_id=1, lines=[(10, 100, 1)], tiers={1: 1, 2: 3})
+    second = OrderDemand(order_id=2, lines=[(20, 100, 1)], tiers={1: 1, 2: 3})
+
+    solutions = solve_batch([first, second], {(1, 100): 1, (2, 100): 1})
+
+    assert solutions[1].allocations == {1: {10: 1}}
+    assert solutions[2].allocations == {2: {20: 1}}
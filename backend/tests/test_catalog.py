@@ -0,0 +1,392 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.db.models import Inventory, Nursery, PlantEnvironment, Product, ProductAttributes, ProductKind
+
+
+def _create_catalog(db: Session, rows: list) -> dict:
+    """Create products from (name, description, active) and return ids by name."""
+    products = [
+        Product(
+            slug=name.lower().replace(" ", "-"),
+            name=name,
+            description=description,
+            price_cents=1000,
+            kind=ProductKind.PLANT,
+            active=active,
+        )
+        for name, description, active in rows
+    ]
+    db.add_all(products)
+    db.commit()
+    return {product.name: product.id for product in products}
+
+
+def test_search_ranks_name_matches_first(client: TestClient, db: Session, override_get_db):
+    ids = _create_catalog(
+        db,
+        [
+            ("Orchid Pot", "Pairs well with white roses", True),
+            ("Red Roses", "A dozen long stems", True),
+            ("White Roses", "Bright and fresh", True),
+            ("Rosemary", "Kitchen herb", True),
+            ("Roses Deluxe", "Hidden from the shop", False),
+        ],
+    )
+
+    data = client.get("/catalog/products", params={"q": "ros"}).json()
+    assert [p["name"] for p in data["items"]] == ["Rosemary", "Red Roses", "White Roses", "Orchid Pot"]
+    assert data["total"] == 4
+
+    # Every word must match, each as a prefix while the user is still typing
+    data = client.get("/catalog/products", params={"q": "whi ROS"}).json()
+    assert [p["id"] for p in data["items"]] == [ids["White Roses"], ids["Orchid Pot"]]
+
+    data = client.get("/catalog/products", params={"q": "%_!"}).json()
+    assert data["items"] == [] and data["total"] == 0
+
+
+def _create_listed_products(db: Session, count: int) -> None:
+    for n in range(count):
+        product = Product(slug=f"listed-{n}", name=f"Listed {n}", price_cents=1000, kind=ProductKind.PLANT)
+        product.attributes = ProductAttributes(plant_environment=PlantEnvironment.INDOOR, size="small")
+        product.inventory = Inventory(quantity=n)
+        db.add(product)
+    db.commit()
+
+
+def test_catalog_listing_statement_count_is_pinned(
+    client: TestClient, db: Session, override_get_db, count_statements
+):
+    _create_listed_products(db, 40)
+
+    # count + page (attributes and inventory joined in); the second listing reuses the cached total
+    for page_size, expected in ((1, 2), (40, 1)):
+        with count_statements() as statements:
+            data = client.get("/catalog/products", params={"page_size": page_size}).json()
+        assert len(data["items"]) == page_size
+        assert all(p["attributes"]["size"] == "small" and p["inventory"] is not None for p in data["items"])
+        assert len(statements) == expected
+
+
+def test_admin_listing_statement_count_is_pinned(
+    client: TestClient, db: Session, override_get_db, admin_headers, count_statements
+):
+    _create_listed_products(db, 40)
+
+    for page_size in (1, 40):
+        with count_statements() as statements:
+            data = client.get("/admin/products", params={"page_size": page_size}, headers=admin_headers).json()
+        assert len(data["items"]) == page_size
+        assert all(p["attributes"] is not None and p["inventory"] is not None for p in data["items"])
+        # current user + count + page
+        assert len(statements) == 3
+
+
+def test_catalog_cache_hits_and_write_invalidation(
+    client: TestClient, db: Session, override_get_db, admin_headers, fresh_catalog_cache
+):
+    _create_listed_products(db, 3)
+    other = Product(slug="solo", name="Solo Fern", price_cents=500, kind=ProductKind.PLANT)
+    db.add(other)
+    db.commit()
+    listed = client.get("/catalog/products", params={"q": "listed"}).json()["items"]
+
+    assert client.get("/catalog/products", params={"q": "LISTED!"}).headers["X-Cache"] == "HIT"
+    assert client.get("/catalog/products/solo").headers["X-Cache"] == "MISS"
+    assert client.get("/catalog/products/solo").headers["X-Cache"] == "HIT"
+
+    # Stock change: only entries holding that product are dropped
+    nursery = Nursery(internal_name="Cocody", city="Abidjan")
+    db.add(nursery)
+    db.commit()
+    response = client.put(
+        f"/admin/nurseries/{nursery.id}/inventory/{listed[0]['id']}", json={"quantity": 9}, headers=admin_headers
+    )
+    assert response.status_code == 200
+    response = client.get("/catalog/products", params={"q": "listed"})
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.json()["items"][0]["inventory"]["quantity"] == listed[0]["inventory"]["quantity"] + 9
+    assert client.get("/catalog/products/solo").headers["X-Cache"] == "HIT"
+
+    # Product edit: its page and every listing are dropped
+    response = client.patch(f"/admin/products/{other.id}", json={"name": "Solo Fern XL"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert client.get("/catalog/products", params={"q": "listed"}).headers["X-Cache"] == "MISS"
+    response = client.get("/catalog/products/solo")
+    assert (response.headers["X-Cache"], response.json()["name"]) == ("MISS", "Solo Fern XL")
+
+    stats = client.get("/admin/catalog-cache", headers=admin_headers).json()
+    assert (stats["hits"], stats["misses"]) == (fresh_catalog_cache.hits, fresh_catalog_cache.misses)
+    # Two page hits, one product page hit and the search total reused by the post-write listing
+    assert stats["hits"] == 4
+
+
+def test_catalog_conditional_requests(
+    client: TestClient, db: Session, override_get_db, admin_headers, count_statements
+):
+    _create_listed_products(db, 2)
+    nursery = Nursery(internal_name="Cocody", city="Abidjan")
+    db.add(nursery)
+    db.commit()
+
+    for quantity, (path, max_age) in enumerate((("/catalog/products", 30), ("/catalog/products/listed-1", 120)), 1):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == f"public, max-age={max_age}"
+        etag, last_modified = response.headers["ETag"], response.headers.get("Last-Modified")
+
+        with count_statements() as statements:
+            response = client.get(path, headers={"If-None-Match": etag})
+        assert (response.status_code, response.content) == (304, b"")
+        assert response.headers["ETag"] == etag
+        assert statements == []
+
+        assert client.get(path, headers={"If-None-Match": 'W/"stale", ' + etag}).status_code == 304
+        assert client.get(path, headers={"If-None-Match": 'W/"stale"'}).status_code == 200
+        if path == "/catalog/products":
+            # Listings change when products leave them, which no product stamp records
+            assert last_modified is None
+            assert client.get(path, headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}).status_code == 200
+        else:
+            assert client.get(path, headers={"If-Modified-Since": last_modified}).status_code == 304
+
+        # A stock change alters the validators, so the old ETag gets the new body
+        product_id = client.get("/catalog/products/listed-1").json()["id"]
+        response = client.put(
+            f"/admin/nurseries/{nursery.id}/inventory/{product_id}", json={"quantity": quantity}, headers=admin_headers
+        )
+        assert response.status_code == 200
+        response = client.get(path, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+
+def test_catalog_keyset_pagination_and_totals(
+    client: TestClient, db: Session, override_get_db, count_statements, monkeypatch
+):
+    _create_listed_products(db, 7)
+
+    seen, cursor = [], None
+    while True:
+        params = {"page_size": 3, "include_total": "false"}
+        if cursor:
+            params["cursor"] = cursor
+        with count_statements() as statements:
+            data = client.get("/catalog/products", params=params).json()
+        assert len(statements) == 1 and data["total"] is None
+        seen += [p["slug"] for p in data["items"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"listed-{n}" for n in range(7)]
+
+    # Page numbers still work, and agree with the cursor walk
+    data = client.get("/catalog/products", params={"page_size": 3, "page": 2}).json()
+    assert [p["slug"] for p in data["items"]] == seen[3:6]
+    assert (data["total"], data["total_is_estimate"]) == (7, False)
+
+    # Past the exact-count limit other databases still count exactly
+    monkeypatch.setattr("app.services.catalog_pagination.settings.catalog_exact_count_limit", 2)
+    data = client.get("/catalog/products", params={"kind": "plant"}).json()
+    assert (data["total"], data["total_is_estimate"]) == (7, False)
+
+    assert client.get("/catalog/products", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/catalog/products", params={"cursor": "MQ==", "q": "x"}).status_code == 400
+
+
+def test_catalog_facet_counts(client: TestClient, db: Session, override_get_db, count_statements):
+    for n, (kind, environment, color, size) in enumerate(
+        [
+            (ProductKind.PLANT, PlantEnvironment.INDOOR, "green", "small"),
+            (ProductKind.PLANT, PlantEnvironment.INDOOR, "green", "large"),
+            (ProductKind.PLANT, PlantEnvironment.OUTDOOR, "red", "large"),
+            (ProductKind.PLANT, PlantEnvironment.BOTH, "green", "small"),
+            (ProductKind.BOUQUET, None, "red", None),
+        ]
+    ):
+        product = Product(slug=f"facet-{n}", name=f"Facet {n}", price_cents=1000, kind=kind)
+        product.attributes = ProductAttributes(plant_environment=environment, color=color, size=size)
+        db.add(product)
+    db.add(Product(slug="facet-vase", name="Facet Vase", price_cents=1000, kind=ProductKind.VASE))
+    db.commit()
+
+    with count_statements() as statements:
+        data = client.get(
+            "/catalog/products", params={"plant_environment": "indoor", "color": "green", "facets": "true"}
+        ).json()
+    # count + page + grouped facet counts
+    assert len(statements) == 3
+    assert sorted(p["slug"] for p in data["items"]) == ["facet-0", "facet-1", "facet-3"]
+    facets = {facet: {c["value"]: c["count"] for c in counts} for facet, counts in data["facets"].items()}
+    # Each facet ignores its own selection, and counts what selecting each value returns
+    assert facets["plant_environment"] == {"indoor": 3, "outdoor": 1, "both": 1}
+    assert facets["color"] == {"green": 3}
+    assert facets["kind"] == {"plant": 3}
+    assert facets["size"] == {"small": 2, "large": 1}
+
+    data = client.get("/catalog/products", params={"facets": "true"}).json()
+    facets = {facet: {c["value"]: c["count"] for c in counts} for facet, counts in data["facets"].items()}
+    assert facets["kind"] == {"plant": 4, "bouquet": 1, "vase": 1}
+    assert facets["plant_environment"] == {"indoor": 3, "outdoor": 2, "both": 1}
+    assert client.get("/catalog/products").json()["facets"] is None
+
+
+def _create_priced_products(db: Session) -> None:
+    start = datetime(2026, 1, 1)
+    for n, (name, price, kind) in enumerate(
+        [
+            ("Peony", 2500, ProductKind.BOUQUET),
+            ("aloe", 900, ProductKind.PLANT),
+            ("Fern", 1500, ProductKind.PLANT),
+            ("Cactus", 900, ProductKind.PLANT),
+            ("Bonsai", 4000, ProductKind.PLANT),
+            ("Glass Vase", 1500, ProductKind.VASE),
+        ]
+    ):
+        db.add(
+            Product(
+                slug=name.lower().replace(" ", "-"),
+                name=name,
+                price_cents=price,
+                kind=kind,
+                created_at=start + timedelta(days=n),
+            )
+        )
+    db.commit()
+
+
+def test_catalog_sort_orders_and_price_filters(client: TestClient, db: Session, override_get_db):
+    _create_priced_products(db)
+
+    def slugs(**params):
+        return [p["slug"] for p in client.get("/catalog/products", params=params).json()["items"]]
+
+    # Ties on price fall back to id
+    assert slugs(sort="price") == ["aloe", "cactus", "fern", "glass-vase", "peony", "bonsai"]
+    assert slugs(sort="newest") == ["glass-vase", "bonsai", "cactus", "fern", "aloe", "peony"]
+    assert slugs(sort="name") == ["bonsai", "cactus", "fern", "glass-vase", "peony", "aloe"]
+    assert slugs(sort="price", min_price=1000, max_price=2500) == ["fern", "glass-vase", "peony"]
+    assert slugs(sort="price", kind="plant", max_price=1500) == ["aloe", "cactus", "fern"]
+    assert client.get("/catalog/products", params={"sort": "cheapest"}).status_code == 422
+
+    # Keyset pages follow the sort, including across price ties
+    for sort in ("price", "newest", "name"):
+        walked, cursor = [], None
+        while True:
+            params = {"sort": sort, "page_size": 2, **({"cursor": cursor} if cursor else {})}
+            data = client.get("/catalog/products", params=params).json()
+            walked += [p["slug"] for p in data["items"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        assert walked == slugs(sort=sort)
+
+    cursor = client.get("/catalog/products", params={"sort": "price", "page_size": 2}).json()["next_cursor"]
+    assert client.get("/catalog/products", params={"sort": "name", "cursor": cursor}).status_code == 400
+    # An explicit sort replaces relevance, so searches can use cursors too
+    data = client.get("/catalog/products", params={"q": "e", "sort": "price", "page_size": 1}).json()
+    assert data["next_cursor"] is not None
+
+
+def test_catalog_sorts_use_listing_indexes(client: TestClient, db: Session, override_get_db):
+    _create_priced_products(db)
+    db.execute(text("ANALYZE"))
+    db.commit()
+
+    from conftest import async_engine
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if "ORDER BY" in statement:
+            statements.append((statement, parameters))
+
+    for params, index in (
+        ({"sort": "price"}, "ix_products_active_price_cents_id"),
+        ({"sort": "price", "kind": "plant"}, "ix_products_active_kind_price_cents_id"),
+        ({"sort": "newest"}, "ix_products_active_created_at_id"),
+        ({"sort": "name"}, "ix_products_active_name_id"),
+    ):
+        statements.clear()
+        event.listen(async_engine.sync_engine, "before_cursor_execute", _record)
+        try:
+            assert client.get("/catalog/products", params=params).status_code == 200
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", _record)
+        [(statement, parameters)] = statements
+
+        plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        details = " | ".join(row[-1] for row in plan)
+        assert f"USING INDEX {index}" in details, details
+        assert "TEMP B-TREE FOR ORDER BY" not in details, details
+
+
+def test_batch_lookup_reports_missing_and_inactive(
+    client: TestClient, db: Session, override_get_db, count_statements
+):
+    _create_listed_products(db, 3)
+    db.add(Product(slug="retired", name="Retired", price_cents=100, kind=ProductKind.PLANT, active=False))
+    db.commit()
+    ids = {p.slug: p.id for p in db.query(Product)}
+
+    body = {
+        "ids": [ids["listed-2"], 99999, ids["retired"], ids["listed-2"]],
+        "slugs": ["listed-0", "listed-2", "nope", "retired"],
+    }
+    with count_statements() as statements:
+        data = client.post("/catalog/products/lookup", json=body).json()
+    assert len(statements) == 1
+    assert [p["slug"] for p in data["items"]] == ["listed-2", "listed-0"]
+    assert data["items"][0]["inventory"]["quantity"] == 2
+    assert data["missing"] == {"ids": [99999], "slugs": ["nope"]}
+    assert data["inactive"] == {"ids": [ids["retired"]], "slugs": ["retired"]}
+
+    assert client.post("/catalog/products/lookup", json={}).json()["items"] == []
+    assert client.post("/catalog/products/lookup", json={"ids": list(range(501))}).status_code == 422
+
+
+def test_catalog_in_stock_near_filter(client: TestClient, db: Session, override_get_db, admin_headers):
+    _create_listed_products(db, 3)
+    ids = [p["id"] for p in client.get("/catalog/products").json()["items"]]
+    cocody = Nursery(internal_name="N1", city="Abidjan", commune="Cocody")
+    plateau = Nursery(internal_name="N2", city="Abidjan", commune="Plateau")
+    bouake = Nursery(internal_name="N3", city="Bouaké")
+    db.add_all([cocody, plateau, bouake])
+    db.commit()
+
+    def stock(nursery: Nursery, product_id: int, quantity: int) -> None:
+        url = f"/admin/nurseries/{nursery.id}/inventory/{product_id}"
+        assert client.put(url, json={"quantity": quantity}, headers=admin_headers).status_code == 200
+
+    def near(location: str, **params) -> list:
+        response = client.get("/catalog/products", params={"in_stock_near": location, **params})
+        assert response.status_code == 200
+        return [p["id"] for p in response.json()["items"]]
+
+    stock(cocody, ids[0], 3)
+    stock(plateau, ids[1], 2)
+    stock(bouake, ids[2], 1)
+    stock(bouake, ids[0], 0)
+
+    assert near("Abidjan") == ids[:2]
+    assert near("abidjan/COCODY") == ids[:1]
+    assert near("Bouaké") == ids[2:]
+    assert near("Bouake") == []
+    data = client.get("/catalog/products", params={"in_stock_near": "Abidjan", "facets": "true"}).json()
+    assert data["total"] == 2 and data["facets"]["size"] == [{"value": "small", "count": 2}]
+    assert client.get("/catalog/products", params={"in_stock_near": "Abidjan/Cocody/x"}).status_code == 400
+    assert client.get("/catalog/products", params={"in_stock_near": "/Cocody"}).status_code == 400
+
+    # Coming into or running out of stock locally drops the cached in_stock_near listings only
+    assert near("Abidjan/Plateau") == ids[1:2]
+    first_page = {"page_size": 1}  # holds ids[0] only, which the writes below leave alone
+    assert client.get("/catalog/products", params=first_page).headers["X-Cache"] == "MISS"
+    stock(plateau, ids[2], 4)
+    assert near("Abidjan/Plateau") == ids[1:]
+    stock(plateau, ids[1], 0)
+    assert near("Abidjan/Plateau") == ids[2:]
+    assert client.get("/catalog/products", params=first_page).headers["X-Cache"] == "HIT"
@@ -0,0 +1,72 @@
+from app.services.catalog_cache import CatalogCache, listing_key, product_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_eviction_and_counters():
+    cache = CatalogCache(max_size=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats() == {
+        "size": 2,
+        "max_size": 2,
+        "ttl_seconds": 60,
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+        "invalidations": 0,
+    }
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = CatalogCache(max_size=10, ttl_seconds=30, clock=clock)
+    cache.put("a", 1)
+    clock.now = 29.9
+    assert cache.get("a") == 1
+    clock.now = 30
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_invalidation_by_product_and_listings():
+    cache = CatalogCache(max_size=10, ttl_seconds=60)
+    first_page = listing_key(None, None, None, 1, 20)
+    search_page = listing_key(None, None, "rose", 1, 20)
+    cache.put(first_page, "page", [1, 2])
+    cache.put(search_page, "search", [3])
+    cache.put(product_key("rose"), "rose", [3])
+    cache.put(product_key("tulip"), "tulip", [1])
+
+    cache.invalidate(product_ids=[3])
+    assert cache.get(search_page) is None and cache.get(product_key("rose")) is None
+    assert cache.get(first_page) == "page" and cache.get(product_key("tulip")) == "tulip"
+
+    cache.invalidate(listings=True)
+    assert cache.get(first_page) is None
+    assert cache.get(product_key("tulip")) == "tulip"
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_put_skipped_after_concurrent_invalidation():
+    cache = CatalogCache(max_size=10, ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate(product_ids=[1])  # a write commits while the reader is querying
+    cache.put("a", "stale", [1], generation)
+    assert cache.get("a") is None
+
+    generation = cache.generation
+    cache.clear()
+    cache.put("a", "stale", [1], generation)
+    assert cache.get("a") is None
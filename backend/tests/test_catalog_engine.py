@@ -0,0 +1,158 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import (
+    Inventory,
+    Nursery,
+    PlantEnvironment,
+    Product,
+    ProductAttributes,
+    ProductAvailability,
+    ProductKind,
+    ProductPopularity,
+)
+from app.services import catalog_engine
+
+QUERIES = [
+    {},
+    {"page_size": 4},
+    {"page_size": 4, "page": 3},
+    {"kind": "plant"},
+    {"plant_environment": "indoor", "facets": "true"},
+    {"color": "red", "size": "large", "facets": "true"},
+    {"color": "mauve"},
+    {"q": "ros"},
+    {"q": "white ros", "facets": "true"},
+    {"q": "%!"},
+    {"include_total": "false", "page_size": 5},
+    {"sort": "price", "page_size": 4, "page": 2},
+    {"sort": "newest", "kind": "plant"},
+    {"sort": "name", "min_price": 1003, "max_price": 1007, "facets": "true"},
+    {"q": "ros", "sort": "price"},
+    {"in_stock_near": "Abidjan", "facets": "true"},
+    {"in_stock_near": "abidjan/Cocody", "sort": "price"},
+    {"sort": "popular", "page_size": 4, "page": 2},
+    {"q": "ros", "sort": "popular", "kind": "plant"},
+]
+
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    engine = catalog_engine.CatalogEngine(refresh_seconds=60)
+    monkeypatch.setattr(catalog_engine, "engine", engine)
+    monkeypatch.setattr(settings, "catalog_backend", "memory")
+    return engine
+
+
+def _create_catalog(db: Session) -> None:
+    names = ["Red Roses", "White Roses", "Rosemary", "Orchid", "Tulips", "Fern", "Cactus", "Peony", "Lily", "Ivy"]
+    for n, name in enumerate(names):
+        product = Product(
+            slug=name.lower().replace(" ", "-"),
+            name=name,
+            description="Pairs well with white roses" if name == "Orchid" else None,
+            price_cents=1000 + n,
+            kind=ProductKind.BOUQUET if n % 3 == 0 else ProductKind.PLANT,
+            active=name != "Ivy",
+        )
+        if n % 4:
+            product.attributes = ProductAttributes(
+                plant_environment=list(PlantEnvironment)[n % 3],
+                color=["red", "white", "green"][n % 3],
+                size=["small", "large"][n % 2],
+            )
+        if n % 2:
+            product.inventory = Inventory(quantity=n)
+        db.add(product)
+    db.flush()
+    # Seeded directly; inventory_service keeps this index in step with nursery stock
+    products = db.query(Product).order_by(Product.id).all()
+    db.add_all(
+        ProductAvailability(city="abidjan", commune=["cocody", "plateau"][n % 2], product_id=product.id, quantity=n % 3)
+        for n, product in enumerate(products)
+    )
+    # As refresh_popularity.py leaves them: some products never sold, some tie
+    db.add_all(
+        ProductPopularity(product_id=product.id, units=n, score=float(n % 4) * 1.5, updated_at=product.updated_at)
+        for n, product in enumerate(products)
+        if n % 5
+    )
+    db.commit()
+
+
+def test_memory_backend_matches_sql(
+    client: TestClient, db: Session, override_get_db, fresh_catalog_cache, memory_backend, monkeypatch
+):
+    _create_catalog(db)
+    fresh_catalog_cache.max_size = 0
+
+    for params in QUERIES:
+        monkeypatch.setattr(settings, "catalog_backend", "sql")
+        expected = client.get("/catalog/products", params=params).json()
+        monkeypatch.setattr(settings, "catalog_backend", "memory")
+        assert client.get("/catalog/products", params=params).json() == expected, params
+
+    # Walking the cursor gives the same pages as SQL, and cursors are interchangeable
+    for sort in (None, "price", "newest", "name", "popular"):
+        walks = {}
+        for backend in ("sql", "memory"):
+            monkeypatch.setattr(settings, "catalog_backend", backend)
+            slugs, cursor = [], None
+            while True:
+                params = {"page_size": 4, **({"sort": sort} if sort else {}), **({"cursor": cursor} if cursor else {})}
+                data = client.get("/catalog/products", params=params).json()
+                slugs += [p["slug"] for p in data["items"]]
+                cursor = data["next_cursor"]
+                if cursor is None:
+                    break
+            walks[backend] = slugs
+        assert len(walks["sql"]) == 9 and walks["sql"] == walks["memory"], sort
+
+
+def test_memory_backend_refreshes_incrementally(
+    client: TestClient, db: Session, override_get_db, admin_headers, memory_backend, count_statements
+):
+    _create_catalog(db)
+    assert client.get("/catalog/products").json()["total"] == 9
+    assert len(memory_backend) == 10
+
+    # A fresh engine answers without touching the database
+    with count_statements() as statements:
+        assert client.get("/catalog/products", params={"kind": "plant"}).json()["total"] == 6
+    assert statements == []
+
+    # Writes in this process move the cache generation; only changed rows are re-read
+    nursery = Nursery(internal_name="Cocody", city="Abidjan")
+    db.add(nursery)
+    db.commit()
+    tulips = db.query(Product).filter_by(slug="tulips").one()
+    response = client.put(
+        f"/admin/nurseries/{nursery.id}/inventory/{tulips.id}", json={"quantity": 7}, headers=admin_headers
+    )
+    assert response.status_code == 200
+    response = client.patch(f"/admin/products/{tulips.id}", json={"name": "Striped Tulips"}, headers=admin_headers)
+    assert response.status_code == 200
+    response = client.post(
+        "/admin/products",
+        json={"slug": "new-fern", "name": "New Fern", "price_cents": 900, "kind": "plant"},
+        headers=admin_headers,
+    )
+    assert response.status_code in (200, 201)
+
+    data = client.get("/catalog/products", params={"q": "striped"}).json()
+    assert [(p["slug"], p["inventory"]["quantity"]) for p in data["items"]] == [("tulips", 7)]
+    # New products start inactive: loaded, but not listed
+    assert client.get("/catalog/products").json()["total"] == 9
+    assert len(memory_backend) == 11
+
+    # Scores written by refresh_popularity.py in another process arrive with the timed refresh
+    fern = db.query(Product).filter_by(slug="fern").one()
+    db.add(ProductPopularity(product_id=fern.id, units=1, score=100.0, updated_at=datetime.utcnow()))
+    db.commit()
+    memory_backend.refresh_seconds = 0
+    data = client.get("/catalog/products", params={"sort": "popular", "page_size": 1}).json()
+    assert [p["slug"] for p in data["items"]] == ["fern"]
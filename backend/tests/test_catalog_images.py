@@ -0,0 +1,152 @@
+import asyncio
+import io
+import random
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image, ImageDraw, ImageEnhance
+from sqlalchemy.orm import Session
+
+from app.db.models import Product, ProductKind
+from app.services import catalog_images
+from app.services.catalog_images import ImageIndex
+
+
+@pytest.fixture
+def image_index(monkeypatch):
+    index = ImageIndex(refresh_seconds=60)
+    monkeypatch.setattr(catalog_images, "index", index)
+    return index
+
+
+def _photo(seed: int, size=(640, 480)) -> Image.Image:
+    """A made-up product shot: coloured blobs on a plain background."""
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGB", size, tuple(rng.integers(0, 255, 3).tolist()))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y, r = rng.integers(0, size[0]), rng.integers(0, size[1]), rng.integers(20, 160)
+        draw.ellipse([x - r, y - r, x + r, y + r], fill=tuple(rng.integers(0, 255, 3).tolist()))
+    return image
+
+
+def _encode(image: Image.Image, format: str = "PNG", **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+def test_hash_survives_resizing_and_recompression():
+    photo = _photo(1)
+    value = catalog_images.image_hash(_encode(photo))
+    copies = [
+        _encode(photo.resize((200, 150)), "JPEG", quality=50),
+        _encode(ImageEnhance.Brightness(photo).enhance(1.2), "JPEG", quality=80),
+        _encode(photo.crop((10, 8, 630, 472))),
+    ]
+    for copy in copies:
+        assert catalog_images.distance(value, catalog_images.image_hash(copy)) <= catalog_images.MAX_DISTANCE
+    for seed in range(2, 12):
+        assert catalog_images.distance(value, catalog_images.image_hash(_encode(_photo(seed)))) > 16
+    assert catalog_images.to_unsigned(catalog_images.to_signed(2**64 - 1)) == 2**64 - 1
+    with pytest.raises(catalog_images.UnreadableImage):
+        catalog_images.image_hash(b"not an image")
+
+
+def test_search_keeps_the_nearest_photo_per_product():
+    rng = random.Random(3)
+    hashes = [rng.getrandbits(64) for _ in range(300)]
+    # Near copies, so searches have matches at every distance
+    hashes += [value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for value in hashes[:100]]
+    index = ImageIndex(refresh_seconds=60)
+    for product_id, value in enumerate(hashes):
+        index.add(value, product_id % 250)
+    assert len(index) == len(hashes)
+
+    for query in hashes[:20] + [rng.getrandbits(64) for _ in range(5)]:
+        for max_distance in (0, 3, 24):
+            best = {}
+            for product_id, value in enumerate(hashes):
+                d = catalog_images.distance(query, value)
+                if d <= max_distance:
+                    best[product_id % 250] = min(d, best.get(product_id % 250, d))
+            assert index.search(query, max_distance) == sorted(best.items(), key=lambda m: (m[1], m[0]))
+
+
+def test_similar_image_endpoint(client: TestClient, db: Session, override_get_db, admin_headers, image_index):
+    products = {
+        slug: Product(slug=slug, name=slug.title(), price_cents=1000, kind=ProductKind.BOUQUET, active=active)
+        for slug, active in (("tulips", True), ("peonies", True), ("lilies", False))
+    }
+    db.add_all(products.values())
+    db.commit()
+    photos = {"tulips": _photo(1), "peonies": _photo(2), "lilies": _photo(3)}
+
+    def register(slug: str, photo: Image.Image) -> dict:
+        response = client.post(
+            f"/admin/products/{products[slug].id}/images",
+            files={"image": (f"{slug}.png", _encode(photo), "image/png")},
+            headers=admin_headers,
+        )
+        assert response.status_code == 201
+        return response.json()
+
+    def similar(photo_bytes: bytes, **params):
+        return client.post(
+            "/catalog/products/similar-image", files={"image": ("upload.jpg", photo_bytes)}, params=params
+        )
+
+    assert similar(_encode(photos["tulips"])).json() == []
+    registered = {slug: register(slug, photo) for slug, photo in photos.items()}
+    assert registered["tulips"]["filename"] == "tulips.png" and len(registered["tulips"]["hash"]) == 16
+
+    # A shrunken, re-compressed copy of the tulip shot
+    response = similar(_encode(photos["tulips"].resize((320, 240)), "JPEG", quality=60))
+    assert response.status_code == 200
+    matches = response.json()
+    assert [m["product"]["slug"] for m in matches] == ["tulips"]
+    assert matches[0]["distance"] <= catalog_images.MAX_DISTANCE and matches[0]["product"]["active"]
+    # Inactive products and unrelated photos do not match
+    assert similar(_encode(photos["lilies"])).json() == []
+    assert similar(_encode(_photo(4))).json() == []
+    assert similar(b"GIF89a garbage").status_code == 400
+
+    # A second photo of the same product; the product is listed once, at its nearest photo
+    register("tulips", _photo(5))
+    response = similar(_encode(_photo(5)), max_distance=16)
+    assert [(m["product"]["slug"], m["distance"]) for m in response.json()] == [("tulips", 0)]
+
+    photos_listed = client.get(f"/admin/products/{products['tulips'].id}/images", headers=admin_headers).json()
+    assert len(photos_listed) == 2 and photos_listed[0]["id"] == registered["tulips"]["id"]
+    response = client.delete(
+        f"/admin/products/{products['tulips'].id}/images/{registered['tulips']['id']}", headers=admin_headers
+    )
+    assert response.status_code == 204
+    assert similar(_encode(photos["tulips"])).json() == []
+    assert len(image_index) == 3
+
+
+def test_uploads_are_hashed_off_the_event_loop(
+    client: TestClient, db: Session, override_get_db, admin_headers, image_index, monkeypatch
+):
+    product = Product(slug="tulips", name="Tulips", price_cents=1000, kind=ProductKind.BOUQUET, active=True)
+    db.add(product)
+    db.commit()
+    hashed_on_loop = []
+    image_hash = catalog_images.image_hash
+
+    def spy(data: bytes) -> int:
+        try:
+            asyncio.get_running_loop()
+            hashed_on_loop.append(True)
+        except RuntimeError:  # a threadpool worker has no running loop
+            hashed_on_loop.append(False)
+        return image_hash(data)
+
+    monkeypatch.setattr(catalog_images, "image_hash", spy)
+    upload = {"image": ("tulips.png", _encode(_photo(1)), "image/png")}
+    assert client.post(f"/admin/products/{product.id}/images", files=upload, headers=admin_headers).status_code == 201
+    response = client.post("/catalog/products/similar-image", files=upload)
+    assert [m["product"]["slug"] for m in response.json()] == ["tulips"]
+    assert hashed_on_loop == [False, False]
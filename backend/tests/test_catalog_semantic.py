@@ -0,0 +1,138 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Product, ProductAttributes, ProductKind
+from app.services import catalog_engine, catalog_semantic
+from app.services.catalog_semantic import SemanticIndex
+from conftest import TestingAsyncSessionLocal
+
+PRODUCTS = [
+    ("snake-plant", "Snake Plant", "Thrives in low light, ideal for bedrooms and offices.", "Water sparingly."),
+    ("sunflowers", "Sunflowers", "Bright summer bouquet that loves full sun.", None),
+    ("zz-plant", "ZZ Plant", "Glossy leaves; tolerates low-light corners.", "Let the soil dry out."),
+    ("red-roses", "Red Roses", "A dozen long-stemmed roses.", None),
+    ("bedroom-lamp", "Bedroom Lamp Vase", None, None),
+]
+
+
+@pytest.fixture
+def semantic_index(monkeypatch, tmp_path):
+    index = SemanticIndex(str(tmp_path), refresh_seconds=60)
+    monkeypatch.setattr(catalog_semantic, "index", index)
+    return index
+
+
+def _create_catalog(db: Session) -> dict:
+    products = {}
+    for slug, name, description, care in PRODUCTS:
+        product = Product(
+            slug=slug,
+            name=name,
+            description=description,
+            price_cents=1000 + len(products),
+            kind=ProductKind.VASE if "Vase" in name else ProductKind.PLANT,
+            active=True,
+        )
+        if care:
+            product.attributes = ProductAttributes(care_instructions=care)
+        db.add(product)
+        products[slug] = product
+    db.commit()
+    return {slug: product.id for slug, product in products.items()}
+
+
+def _write_build(directory: str) -> str:
+    async def run():
+        async with TestingAsyncSessionLocal() as session:
+            return await catalog_semantic.write_build(session, directory)
+
+    return asyncio.run(run())[0]
+
+
+def test_similar_texts_score_higher():
+    query = catalog_semantic.embed([("low-light plant for a bedroom", 1.0)])
+    scores = {
+        slug: float(catalog_semantic.embed_product(name, description, care) @ query)
+        for slug, name, description, care in PRODUCTS
+    }
+    assert np.linalg.norm(query) == pytest.approx(1.0)
+    assert max(scores, key=scores.get) == "snake-plant"
+    assert scores["zz-plant"] > scores["sunflowers"] and scores["zz-plant"] > scores["red-roses"]
+    assert not catalog_semantic.embed([("for the", 1.0)]).any()
+
+
+def test_semantic_listing(client: TestClient, db: Session, override_get_db, semantic_index):
+    _create_catalog(db)
+
+    def search(q: str, **params) -> list:
+        response = client.get("/catalog/products", params={"q": q, "semantic": "true", **params})
+        assert response.status_code == 200
+        return [p["slug"] for p in response.json()["items"]]
+
+    results = search("low-light plant for a bedroom")
+    assert results[:2] == ["snake-plant", "zz-plant"] and "red-roses" not in results
+    # Filters and sorts apply to the matches (prices rise down PRODUCTS)
+    assert search("low-light plant for a bedroom", kind="vase") == ["bedroom-lamp"]
+    assert search("low-light plant for a bedroom", sort="price") == [slug for slug, *_ in PRODUCTS if slug in results]
+    # Word-prefix search needs every word
+    assert search("low-light plants")[:2] == ["snake-plant", "zz-plant"]
+    assert client.get("/catalog/products", params={"q": "low-light plants"}).json()["total"] == 0
+    assert search("the") == []
+
+
+def test_semantic_index_is_memory_mapped_and_updated_incrementally(
+    client: TestClient, db: Session, override_get_db, admin_headers, semantic_index
+):
+    ids = _create_catalog(db)
+    build = _write_build(semantic_index.directory)
+
+    def search(q: str) -> list:
+        return [
+            p["slug"]
+            for p in client.get("/catalog/products", params={"q": q, "semantic": "true"}).json()["items"]
+        ]
+
+    assert search("roses")[0] == "red-roses"
+    assert semantic_index.build == build and isinstance(semantic_index._vectors, np.memmap)
+    assert len(semantic_index._overlay) == 0 and len(semantic_index) == len(PRODUCTS)
+
+    # Admin edits are re-embedded into the overlay; the build row is masked
+    response = client.patch(
+        f"/admin/products/{ids['sunflowers']}",
+        json={"attributes": {"care_instructions": "Keep in low light in a bedroom"}},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    assert "sunflowers" in search("low-light bedroom")
+    response = client.patch(f"/admin/products/{ids['red-roses']}", json={"active": False}, headers=admin_headers)
+    assert response.status_code == 200
+    assert "red-roses" not in search("roses")
+    assert set(semantic_index._overlay) == {ids["sunflowers"]}
+    assert len(semantic_index) == len(PRODUCTS) - 1
+
+    # A new build replaces the old one and the overlay on the next refresh
+    new_build = _write_build(semantic_index.directory)
+    semantic_index.refresh_seconds = 0
+    assert "sunflowers" in search("low-light bedroom")
+    assert semantic_index.build == new_build and semantic_index._overlay == {}
+
+
+def test_memory_backend_matches_sql_for_semantic_search(
+    client: TestClient, db: Session, override_get_db, semantic_index, monkeypatch
+):
+    _create_catalog(db)
+    monkeypatch.setattr(catalog_engine, "engine", catalog_engine.CatalogEngine(refresh_seconds=60))
+    for params in (
+        {"q": "low-light plant for a bedroom", "semantic": "true", "facets": "true"},
+        {"q": "plant", "semantic": "true", "page_size": 1, "page": 2},
+        {"q": "low light", "semantic": "true", "sort": "price", "page_size": 1},
+    ):
+        monkeypatch.setattr(settings, "catalog_backend", "sql")
+        expected = client.get("/catalog/products", params=params).json()
+        monkeypatch.setattr(settings, "catalog_backend", "memory")
+        assert client.get("/catalog/products", params=params).json() == expected, params
@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.db.models import Product, ProductKind
+from app.services import catalog_suggest
+from app.services.catalog_suggest import SuggestIndex
+
+
+def _index(*names: str) -> SuggestIndex:
+    index = SuggestIndex(refresh_seconds=60)
+    for product_id, name in enumerate(names, 1):
+        index.put(product_id, name.lower().replace(" ", "-"), name)
+    return index
+
+
+def test_suggest_prefers_name_prefix_then_word_prefix():
+    index = _index("Red Roses", "Rosemary", "White Roses", "Rose Gold Vase", "Orchid", "Primrose")
+
+    assert [s.name for s in index.suggest("ros", 10)] == ["Rose Gold Vase", "Rosemary", "Red Roses", "White Roses"]
+    assert [s.name for s in index.suggest("ros", 2)] == ["Rose Gold Vase", "Rosemary"]
+    # Every word is a prefix, in any order
+    assert [s.name for s in index.suggest("ROSES wh", 10)] == ["White Roses"]
+    assert [s.slug for s in index.suggest("red ro", 10)] == ["red-roses"]
+    assert index.suggest("mary", 10) == [] and index.suggest("!!", 10) == []
+
+
+def test_suggest_index_updates_in_place():
+    index = _index("Red Roses", "Rosemary")
+
+    index.put(1, "red-tulips", "Red Tulips")
+    assert [s.name for s in index.suggest("r", 10)] == ["Red Tulips", "Rosemary"]
+    index.put(2, "rosemary", "Rosemary", active=False)
+    assert [s.name for s in index.suggest("ros", 10)] == []
+    assert len(index) == 1
+
+
+@pytest.fixture
+def suggest_index(monkeypatch):
+    index = SuggestIndex(refresh_seconds=60)
+    monkeypatch.setattr(catalog_suggest, "index", index)
+    return index
+
+
+def test_suggest_endpoint_follows_admin_edits(
+    client: TestClient, db: Session, override_get_db, admin_headers, suggest_index, count_statements
+):
+    db.add_all(
+        [
+            Product(slug="red-roses", name="Red Roses", price_cents=1000, kind=ProductKind.BOUQUET),
+            Product(slug="rosemary", name="Rosemary", price_cents=500, kind=ProductKind.PLANT),
+            Product(slug="hidden-rose", name="Hidden Rose", price_cents=500, kind=ProductKind.PLANT, active=False),
+        ]
+    )
+    db.commit()
+
+    response = client.get("/catalog/suggest", params={"q": "ros"})
+    assert response.json() == [{"slug": "rosemary", "name": "Rosemary"}, {"slug": "red-roses", "name": "Red Roses"}]
+    assert response.headers["Cache-Control"].startswith("public")
+
+    # A fresh index answers without touching the database
+    with count_statements() as statements:
+        assert len(client.get("/catalog/suggest", params={"q": "r", "limit": 1}).json()) == 1
+    assert statements == []
+
+    rosemary = db.query(Product).filter_by(slug="rosemary").one()
+    response = client.patch(f"/admin/products/{rosemary.id}", json={"active": False}, headers=admin_headers)
+    assert response.status_code == 200
+    assert [s["slug"] for s in client.get("/catalog/suggest", params={"q": "ros"}).json()] == ["red-roses"]
+
+    assert client.get("/catalog/suggest", params={"q": ""}).status_code == 422
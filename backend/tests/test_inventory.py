@@ -0,0 +1,185 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.db.models import Inventory, Nursery, NurseryInventory, Product, ProductAvailability, ProductKind
+from app.services import inventory_service
+from conftest import TestingAsyncSessionLocal
+
+
+def _setup(db: Session, nursery_count: int = 2):
+    product = Product(slug="monstera", name="Monstera", price_cents=1500, kind=ProductKind.PLANT)
+    db.add(product)
+    db.flush()
+    db.add(Inventory(product_id=product.id, quantity=0))
+    nurseries = [Nursery(internal_name=f"Nursery {n}", city="Abidjan") for n in range(nursery_count)]
+    db.add_all(nurseries)
+    db.commit()
+    return product, nurseries
+
+
+def _global_quantity(db: Session, product_id: int) -> int:
+    db.expire_all()
+    return db.query(Inventory).filter(Inventory.product_id == product_id).one().quantity
+
+
+def test_nursery_stock_writes_update_global_inventory(
+    client: TestClient, db: Session, override_get_db, admin_headers
+):
+    product, (first, second) = _setup(db)
+    url = "/admin/nurseries/{}/inventory/" + str(product.id)
+
+    response = client.put(url.format(first.id), json={"quantity": 7}, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["product_name"] == "Monstera"
+    assert client.put(url.format(second.id), json={"quantity": 5}, headers=admin_headers).status_code == 200
+    assert _global_quantity(db, product.id) == 12
+
+    assert client.put(url.format(first.id), json={"quantity": 3}, headers=admin_headers).status_code == 200
+    assert _global_quantity(db, product.id) == 8
+
+    assert client.delete(f"/admin/nurseries/{second.id}", headers=admin_headers).status_code == 204
+    assert _global_quantity(db, product.id) == 3
+
+
+def _local_quantities(db: Session, product_id: int) -> dict:
+    db.expire_all()
+    rows = db.query(ProductAvailability).filter(ProductAvailability.product_id == product_id)
+    return {(row.city, row.commune): row.quantity for row in rows if row.quantity}
+
+
+def test_nursery_stock_writes_update_local_availability(
+    client: TestClient, db: Session, override_get_db, admin_headers
+):
+    product, (first, second) = _setup(db)
+    first.commune, second.commune = "Cocody", " plateau "
+    db.commit()
+    url = "/admin/nurseries/{}/inventory/" + str(product.id)
+
+    assert client.put(url.format(first.id), json={"quantity": 7}, headers=admin_headers).status_code == 200
+    assert client.put(url.format(second.id), json={"quantity": 5}, headers=admin_headers).status_code == 200
+    assert _local_quantities(db, product.id) == {("abidjan", "cocody"): 7, ("abidjan", "plateau"): 5}
+
+    rows = [{"nursery_id": first.id, "product_id": product.id, "quantity": 2}]
+    assert client.post("/admin/nurseries/inventory/bulk", json={"rows": rows}, headers=admin_headers).status_code == 200
+
+    async def confirm_shipment():
+        async with TestingAsyncSessionLocal() as session:
+            await inventory_service.decrement_stock(session, {(second.id, product.id): 5})
+            await session.commit()
+
+    asyncio.run(confirm_shipment())
+    assert _local_quantities(db, product.id) == {("abidjan", "cocody"): 2}
+
+    response = client.patch(f"/admin/nurseries/{first.id}", json={"commune": "Yopougon"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert _local_quantities(db, product.id) == {("abidjan", "yopougon"): 2}
+
+    assert client.delete(f"/admin/nurseries/{first.id}", headers=admin_headers).status_code == 204
+    assert _local_quantities(db, product.id) == {}
+
+    async def drift():
+        async with TestingAsyncSessionLocal() as session:
+            return await inventory_service.find_availability_drift(session)
+
+    assert asyncio.run(drift()) == []
+
+
+def test_find_and_repair_availability_drift(db: Session):
+    product, (nursery,) = _setup(db, nursery_count=1)
+    db.add(NurseryInventory(nursery_id=nursery.id, product_id=product.id, quantity=4))
+    db.add(ProductAvailability(city="bouake", commune="", product_id=product.id, quantity=3))
+    db.commit()
+
+    async def reconcile():
+        async with TestingAsyncSessionLocal() as session:
+            drifts = await inventory_service.find_availability_drift(session)
+            await inventory_service.repair_availability_drift(session, drifts)
+            await session.commit()
+            return drifts, await inventory_service.find_availability_drift(session)
+
+    drifts, remaining = asyncio.run(reconcile())
+    assert [(d.city, d.commune, d.recorded, d.actual) for d in drifts] == [
+        ("abidjan", "", None, 4),
+        ("bouake", "", 3, 0),
+    ]
+    assert remaining == []
+    assert _local_quantities(db, product.id) == {("abidjan", ""): 4}
+
+
+def test_find_and_repair_drift(db: Session):
+    product, (nursery,) = _setup(db, nursery_count=1)
+    db.add(NurseryInventory(nursery_id=nursery.id, product_id=product.id, quantity=4))
+    orphan = Product(slug="ficus", name="Ficus", price_cents=900, kind=ProductKind.PLANT)
+    db.add(orphan)
+    db.flush()
+    db.add(NurseryInventory(nursery_id=nursery.id, product_id=orphan.id, quantity=2))
+    db.commit()
+
+    async def reconcile():
+        async with TestingAsyncSessionLocal() as session:
+            drifts = await inventory_service.find_drift(session)
+            await inventory_service.repair_drift(session, drifts)
+            await session.commit()
+            return drifts, await inventory_service.find_drift(session)
+
+    drifts, remaining = asyncio.run(reconcile())
+    assert [(d.product_id, d.recorded, d.actual) for d in drifts] == [
+        (product.id, 0, 4),
+        (orphan.id, None, 2),
+    ]
+    assert remaining == []
+    assert _global_quantity(db, product.id) == 4
+    assert _global_quantity(db, orphan.id) == 2
+
+
+def test_bulk_upsert_json_reports_row_errors(
+    client: TestClient, db: Session, override_get_db, admin_headers
+):
+    product, (first, second) = _setup(db)
+    db.add(NurseryInventory(nursery_id=first.id, product_id=product.id, quantity=10))
+    db.query(Inventory).filter(Inventory.product_id == product.id).update({"quantity": 10})
+    db.commit()
+
+    rows = [
+        {"nursery_id": first.id, "product_id": product.id, "quantity": 4},
+        {"nursery_id": second.id, "product_id": product.id, "quantity": 6},
+        {"nursery_id": 9999, "product_id": product.id, "quantity": 1},
+        {"nursery_id": second.id, "product_id": product.id, "quantity": -1},
+        {"nursery_id": second.id, "product_id": product.id, "quantity": 2},
+        {"nursery_id": first.id},
+    ]
+    response = client.post("/admin/nurseries/inventory/bulk", json={"rows": rows}, headers=admin_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["applied"] == 2
+    assert data["affected_products"] == 1
+    assert [(e["row"], e["error"]) for e in data["errors"]][:3] == [
+        (3, "Nursery 9999 not found"),
+        (4, "quantity: Input should be greater than or equal to 0"),
+        (5, "Duplicate of row 2"),
+    ]
+    assert data["errors"][3]["row"] == 6
+    assert _global_quantity(db, product.id) == 10
+
+
+def test_bulk_upsert_csv(client: TestClient, db: Session, override_get_db, admin_headers):
+    product, nurseries = _setup(db, nursery_count=3)
+    feed = "nursery_id,product_id,quantity\n" + "".join(f"{n.id},{product.id},{n.id}\n" for n in nurseries)
+
+    response = client.post(
+        "/admin/nurseries/inventory/bulk",
+        content=feed,
+        headers={**admin_headers, "Content-Type": "text/csv"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"applied": 3, "affected_products": 1, "errors": []}
+    assert _global_quantity(db, product.id) == sum(n.id for n in nurseries)
+
+    response = client.post(
+        "/admin/nurseries/inventory/bulk",
+        content="nursery,quantity\n1,2\n",
+        headers={**admin_headers, "Content-Type": "text/csv"},
+    )
+    assert response.status_code == 400
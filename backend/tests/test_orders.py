@@ -0,0 +1,484 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.db.models import (
+    Address,
+    FulfillmentStatus,
+    Inventory,
+    Nursery,
+    NurseryInventory,
+    Order,
+    OrderFulfillment,
+    OrderFulfillmentItem,
+    OrderItem,
+    OrderStatus,
+    PricingRule,
+    PricingRuleKind,
+    Product,
+    ProductKind,
+    User,
+)
+from app.main import app
+
+
+def _create_order(db: Session, item_count: int, fulfillment_count: int) -> Order:
+    order = Order(status=OrderStatus.PLACED, subtotal_cents=0, total_cents=0)
+    db.add(order)
+    db.flush()
+    db.add(
+        Address(
+            order_id=order.id,
+            full_name="Ama Kouassi",
+            street_address="12 Rue des Jardins",
+            city="Abidjan",
+            commune="Cocody",
+            postal_code="00225",
+            country="CI",
+        )
+    )
+    items = [
+        OrderItem(order_id=order.id, quantity=2, unit_price_cents=1000, product_name=f"Rose {i}")
+        for i in range(item_count)
+    ]
+    db.add_all(items)
+    db.flush()
+
+    for n in range(fulfillment_count):
+        nursery = Nursery(internal_name=f"Nursery {n}", city="Abidjan")
+        db.add(nursery)
+        db.flush()
+        fulfillment = OrderFulfillment(order_id=order.id, nursery_id=nursery.id)
+        db.add(fulfillment)
+        db.flush()
+        db.add_all(
+            OrderFulfillmentItem(fulfillment_id=fulfillment.id, order_item_id=item.id, quantity=1)
+            for item in items
+        )
+    db.commit()
+    return order
+
+
+def test_get_order_admin_returns_fulfillment_graph(
+    client: TestClient, db: Session, override_get_db, admin_headers
+):
+    order = _create_order(db, item_count=2, fulfillment_count=2)
+
+    response = client.get(f"/orders/admin/{order.id}", headers=admin_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["product_name"] for item in data["items"]] == ["Rose 0", "Rose 1"]
+    assert data["shipping_address"]["commune"] == "Cocody"
+    assert [f["nursery_name"] for f in data["fulfillments"]] == ["Nursery 0", "Nursery 1"]
+    assert [i["order_item_product_name"] for i in data["fulfillments"][1]["items"]] == ["Rose 0", "Rose 1"]
+
+
+def test_get_order_admin_query_count_is_constant(
+    client: TestClient, db: Session, override_get_db, admin_headers, count_statements
+):
+    small = _create_order(db, item_count=1, fulfillment_count=1)
+    large = _create_order(db, item_count=12, fulfillment_count=6)
+
+    with count_statements() as small_statements:
+        assert client.get(f"/orders/admin/{small.id}", headers=admin_headers).status_code == 200
+    with count_statements() as large_statements:
+        assert client.get(f"/orders/admin/{large.id}", headers=admin_headers).status_code == 200
+
+    assert len(large_statements) == len(small_statements)
+
+
+def _stock_nurseries(db: Session, order: Order, layout: list) -> list:
+    """Create nurseries from (city, commune, [qty per order item]) and return their ids."""
+    nursery_ids = []
+    for city, commune, quantities in layout:
+        nursery = Nursery(internal_name=f"{city}/{commune}", city=city, commune=commune)
+        db.add(nursery)
+        db.flush()
+        for item, quantity in zip(order.items, quantities):
+            if quantity:
+                db.add(NurseryInventory(nursery_id=nursery.id, product_id=item.product_id, quantity=quantity))
+        nursery_ids.append(nursery.id)
+    db.commit()
+    return nursery_ids
+
+
+def _create_product_order(db: Session, item_count: int) -> Order:
+    order = _create_order(db, item_count=item_count, fulfillment_count=0)
+    for item in order.items:
+        product = Product(slug=f"p-{order.id}-{item.id}", name=item.product_name, price_cents=1000, kind=ProductKind.PLANT)
+        db.add(product)
+        db.flush()
+        item.product_id = product.id
+    db.commit()
+    return order
+
+
+def test_allocation_suggestions_tiers_and_plans(
+    client: TestClient, db: Session, override_get_db, admin_headers
+):
+    order = _create_product_order(db, item_count=2)
+    far, same_city, same_commune = _stock_nurseries(
+        db,
+        order,
+        [
+            ("Bouaké", None, [2, 1]),
+            ("Abidjan", "Yopougon", [2, 0]),
+            ("Abidjan", "Cocody", [0, 2]),
+        ],
+    )
+
+    response = client.get(f"/orders/admin/{order.id}/allocation-suggestions", headers=admin_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [(s["nursery_id"], s["match_tier"]) for s in data["suggestions"]] == [
+        (same_commune, 1),
+        (same_city, 2),
+        (far, 3),
+    ]
+    assert data["plan"] is None
+
+    single = client.get(
+        f"/orders/admin/{order.id}/allocation-suggestions?plan=single_nursery", headers=admin_headers
+    ).json()["plan"]
+    assert single["fully_allocated"] is False
+    assert [a["nursery_id"] for a in single["allocations"]] == [far]
+    assert single["unallocated_items"] == [{"order_item_id": order.items[1].id, "quantity": 1}]
+
+    split = client.get(
+        f"/orders/admin/{order.id}/allocation-suggestions?plan=min_splits", headers=admin_headers
+    ).json()["plan"]
+    assert split["fully_allocated"] is True
+    assert [a["nursery_id"] for a in split["allocations"]] == [far, same_commune]
+
+
+def test_allocation_suggestions_query_count_is_constant(
+    client: TestClient, db: Session, override_get_db, admin_headers, count_statements
+):
+    small = _create_product_order(db, item_count=1)
+    _stock_nurseries(db, small, [("Abidjan", "Cocody", [1])])
+    large = _create_product_order(db, item_count=8)
+    _stock_nurseries(db, large, [("Abidjan", f"Commune {n}", [n + 1] * 8) for n in range(10)])
+
+    url = "/orders/admin/{}/allocation-suggestions?plan=min_splits"
+    with count_statements() as small_statements:
+        assert client.get(url.format(small.id), headers=admin_headers).status_code == 200
+    with count_statements() as large_statements:
+        assert client.get(url.format(large.id), headers=admin_headers).status_code == 200
+
+    assert len(large_statements) == len(small_statements)
+
+
+def test_auto_allocate_creates_proposed_fulfillments(
+    client: TestClient, db: Session, override_get_db, admin_headers
+):
+    order = _create_product_order(db, item_count=2)
+    _, same_city = _stock_nurseries(db, order, [("Bouaké", None, [2, 2]), ("Abidjan", None, [2, 2])])
+
+    response = client.post(
+        "/orders/admin/auto-allocate", json={"order_ids": [order.id], "dry_run": True}, headers=admin_headers
+    )
+    assert response.status_code == 200
+    [result] = response.json()["results"]
+    assert result["plan"]["fully_allocated"] is True
+    assert [a["nursery_id"] for a in result["plan"]["allocations"]] == [same_city]
+    assert db.query(OrderFulfillment).filter(OrderFulfillment.order_id == order.id).count() == 0
+
+    response = client.post("/orders/admin/auto-allocate", json={"order_ids": [order.id]}, headers=admin_headers)
+    assert response.status_code == 200
+    data = client.get(f"/orders/admin/{order.id}", headers=admin_headers).json()
+    assert [(f["nursery_id"], f["status"]) for f in data["fulfillments"]] == [(same_city, "proposed")]
+    assert sum(i["quantity"] for i in data["fulfillments"][0]["items"]) == 4
+
+
+def _propose(db: Session, order: Order, nursery_id: int, quantities: list) -> None:
+    """Add a proposed fulfillment from one nursery with the given quantity per order item."""
+    db.add(
+        OrderFulfillment(
+            order_id=order.id,
+            nursery_id=nursery_id,
+            items=[
+                OrderFulfillmentItem(order_item_id=item.id, quantity=quantity)
+                for item, quantity in zip(order.items, quantities)
+            ],
+        )
+    )
+    db.commit()
+
+
+def test_confirm_allocation_reports_every_shortage(
+    client: TestClient, db: Session, override_get_db, admin_headers
+):
+    order = _create_product_order(db, item_count=2)
+    [nursery_id] = _stock_nurseries(db, order, [("Abidjan", "Cocody", [1, 1])])
+    _propose(db, order, nursery_id, [2, 2])
+
+    response = client.post(f"/orders/admin/{order.id}/confirm", headers=admin_headers)
+    assert response.status_code == 400
+    shortages = response.json()["detail"]["shortages"]
+    assert sorted((s["product_id"], s["requested"], s["available"]) for s in shortages) == [
+        (item.product_id, 2, 1) for item in order.items
+    ]
+
+    db.expire_all()
+    assert [i.quantity for i in db.query(NurseryInventory).order_by(NurseryInventory.id)] == [1, 1]
+    assert {f.status for f in db.query(OrderFulfillment)} == {FulfillmentStatus.PROPOSED}
+
+
+def test_concurrent_confirmations_never_oversell(db: Session, override_get_db, admin_headers):
+    orders = [_create_product_order(db, item_count=1) for _ in range(8)]
+    [nursery_id] = _stock_nurseries(db, orders[0], [("Abidjan", "Cocody", [5])])
+    product_id = orders[0].items[0].product_id
+    for order in orders:
+        order.items[0].product_id = product_id
+        _propose(db, order, nursery_id, [2])
+
+    async def confirm_all() -> list:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                *(client.post(f"/orders/admin/{order.id}/confirm", headers=admin_headers) for order in orders)
+            )
+
+    responses = asyncio.run(confirm_all())
+    assert sorted(r.status_code for r in responses) == [200, 200] + [400] * 6
+
+    db.expire_all()
+    stock = db.query(NurseryInventory).filter(NurseryInventory.product_id == product_id).one()
+    assert stock.quantity == 1
+    assert db.query(Inventory).filter(Inventory.product_id == product_id).one().quantity == 1
+    assert db.query(Order).filter(Order.status == OrderStatus.CONFIRMED).count() == 2
+    # Confirmation time drives the popularity job
+    assert db.query(Order).filter(Order.confirmed_at.is_not(None)).count() == 2
+
+
+def _checkout_payload(product_ids: list) -> dict:
+    return {
+        "items": [{"product_id": product_id, "quantity": 2} for product_id in product_ids],
+        "shipping_address": {
+            "full_name": "Ama Kouassi",
+            "street_address": "12 Rue des Jardins",
+            "city": "Abidjan",
+            "commune": "Cocody",
+            "postal_code": "00225",
+            "country": "CI",
+        },
+    }
+
+
+def _create_products(db: Session, count: int, active: bool = True) -> list:
+    products = [
+        Product(slug=f"bouquet-{active}-{n}", name=f"Bouquet {n}", price_cents=1000 + n, kind=ProductKind.PLANT, active=active)
+        for n in range(count)
+    ]
+    db.add_all(products)
+    db.commit()
+    return [product.id for product in products]
+
+
+def test_create_order(client: TestClient, db: Session, override_get_db, admin_headers):
+    product_ids = _create_products(db, 3)
+
+    response = client.post("/orders", json=_checkout_payload(product_ids), headers=admin_headers)
+    assert response.status_code == 201
+    data = response.json()
+    assert [(i["product_id"], i["quantity"], i["unit_price_cents"]) for i in data["items"]] == [
+        (product_id, 2, 1000 + n) for n, product_id in enumerate(product_ids)
+    ]
+    assert data["subtotal_cents"] == 2 * (1000 + 1001 + 1002)
+    assert data["shipping_address"]["commune"] == "Cocody"
+    assert db.query(OrderItem).filter(OrderItem.order_id == data["id"]).count() == 3
+
+
+def test_create_order_reports_all_unavailable_products(
+    client: TestClient, db: Session, override_get_db, admin_headers
+):
+    [active] = _create_products(db, 1)
+    [inactive] = _create_products(db, 1, active=False)
+
+    response = client.post("/orders", json=_checkout_payload([active, inactive, 9999]), headers=admin_headers)
+    assert response.status_code == 404
+    detail = response.json()["detail"]
+    assert (detail["missing"], detail["inactive"]) == ([9999], [inactive])
+    assert db.query(Order).count() == 0
+
+
+def test_create_order_query_count_is_constant(
+    client: TestClient, db: Session, override_get_db, admin_headers, count_statements
+):
+    product_ids = _create_products(db, 30)
+    assert client.post("/orders/quote", json=_quote_payload(product_ids[:1])).status_code == 200  # loads pricing rules
+
+    with count_statements() as small_statements:
+        assert client.post("/orders", json=_checkout_payload(product_ids[:1]), headers=admin_headers).status_code == 201
+    with count_statements() as large_statements:
+        response = client.post("/orders", json=_checkout_payload(product_ids), headers=admin_headers)
+    assert response.status_code == 201
+    assert [item["product_id"] for item in response.json()["items"]] == product_ids
+
+    # SQLite cannot return a batched INSERT's rows in parameter order, so SQLAlchemy inserts the
+    # order items one by one there; PostgreSQL sends them in one statement. Everything else is shared.
+    def other_statements(statements: list) -> list:
+        return [statement for statement in statements if not statement.startswith("INSERT INTO order_items")]
+
+    assert len(other_statements(large_statements)) == len(other_statements(small_statements))
+
+
+def _quote_payload(product_ids: list, country: str = "CI", commune: str = "Cocody") -> dict:
+    return {
+        "items": [{"product_id": product_id, "quantity": 2} for product_id in product_ids],
+        "country": country,
+        "commune": commune,
+    }
+
+
+def test_quote_matches_created_order(client: TestClient, db: Session, override_get_db, admin_headers):
+    product_ids = _create_products(db, 3)
+
+    response = client.post("/orders/quote", json=_quote_payload(product_ids))
+    assert response.status_code == 200
+    quote = response.json()
+    subtotal = 2 * (1000 + 1001 + 1002)
+    assert [(line["product_id"], line["line_total_cents"]) for line in quote["lines"]] == [
+        (product_id, 2 * (1000 + n)) for n, product_id in enumerate(product_ids)
+    ]
+    # No pricing rules: the default 500 shipping and 8% tax
+    assert (quote["subtotal_cents"], quote["shipping_cents"], quote["tax_cents"]) == (subtotal, 500, subtotal * 8 // 100)
+
+    order = client.post("/orders", json=_checkout_payload(product_ids), headers=admin_headers).json()
+    assert {key: order[key] for key in ("subtotal_cents", "shipping_cents", "tax_cents", "total_cents")} == {
+        key: quote[key] for key in ("subtotal_cents", "shipping_cents", "tax_cents", "total_cents")
+    }
+
+
+def test_quote_applies_most_specific_pricing_rule(client: TestClient, db: Session, override_get_db):
+    [product_id] = _create_products(db, 1)  # 1000 cents, quoted twice: 2000
+    db.add_all(
+        [
+            PricingRule(kind=PricingRuleKind.SHIPPING, amount_cents=900),
+            PricingRule(kind=PricingRuleKind.SHIPPING, country="CI", amount_cents=400),
+            PricingRule(kind=PricingRuleKind.SHIPPING, country="CI", min_subtotal_cents=2000, amount_cents=0),
+            PricingRule(kind=PricingRuleKind.SHIPPING, country="CI", commune="Cocody", amount_cents=250),
+            PricingRule(kind=PricingRuleKind.SHIPPING, country="CI", commune="Plateau", amount_cents=1, active=False),
+            PricingRule(kind=PricingRuleKind.TAX, country="CI", rate_bps=1800),
+        ]
+    )
+    db.commit()
+
+    def priced(country: str, commune: str, quantity: int = 2) -> tuple:
+        payload = {"items": [{"product_id": product_id, "quantity": quantity}], "country": country, "commune": commune}
+        quote = client.post("/orders/quote", json=payload).json()
+        return quote["shipping_cents"], quote["tax_cents"]
+
+    assert priced("CI", "Cocody") == (250, 360)
+    assert priced("ci", "Plateau") == (0, 360)  # free over 2000 in CI; the Plateau rule is inactive
+    assert priced("CI", "Plateau", quantity=1) == (400, 180)
+    assert priced("GH", "Accra") == (900, 160)  # catch-all shipping, default tax
+
+
+def test_quote_reports_unavailable_products(client: TestClient, db: Session, override_get_db):
+    [active] = _create_products(db, 1)
+    [inactive] = _create_products(db, 1, active=False)
+
+    response = client.post("/orders/quote", json=_quote_payload([active, inactive, 9999]))
+    assert response.status_code == 404
+    detail = response.json()["detail"]
+    assert (detail["missing"], detail["inactive"]) == ([9999], [inactive])
+
+    assert client.post("/orders/quote", json={"items": [{"product_id": active, "quantity": 0}]}).status_code == 422
+    assert client.post("/orders/quote", json={"items": []}).status_code == 422
+
+
+def test_quote_is_one_query_once_rules_are_loaded(client: TestClient, db: Session, override_get_db, count_statements):
+    product_ids = _create_products(db, 30)
+    assert client.post("/orders/quote", json=_quote_payload(product_ids[:1])).status_code == 200
+
+    with count_statements() as small_statements:
+        assert client.post("/orders/quote", json=_quote_payload(product_ids[:1])).status_code == 200
+    with count_statements() as large_statements:
+        assert client.post("/orders/quote", json=_quote_payload(product_ids)).status_code == 200
+
+    assert len(small_statements) == len(large_statements) == 1
+
+
+def test_pricing_rule_changes_apply_to_the_next_quote(
+    client: TestClient, db: Session, override_get_db, admin_headers
+):
+    [product_id] = _create_products(db, 1)
+    assert client.post("/orders/quote", json=_quote_payload([product_id])).json()["shipping_cents"] == 500
+
+    response = client.post(
+        "/admin/pricing-rules", json={"kind": "shipping", "country": "CI", "amount_cents": 300}, headers=admin_headers
+    )
+    assert response.status_code == 201
+    rule_id = response.json()["id"]
+    assert client.post("/orders/quote", json=_quote_payload([product_id])).json()["shipping_cents"] == 300
+
+    response = client.patch(f"/admin/pricing-rules/{rule_id}", json={"amount_cents": 100}, headers=admin_headers)
+    assert response.status_code == 200
+    assert client.post("/orders/quote", json=_quote_payload([product_id])).json()["shipping_cents"] == 100
+
+    assert client.delete(f"/admin/pricing-rules/{rule_id}", headers=admin_headers).status_code == 204
+    assert client.post("/orders/quote", json=_quote_payload([product_id])).json()["shipping_cents"] == 500
+
+    response = client.post("/admin/pricing-rules", json={"kind": "tax", "country": "CI"}, headers=admin_headers)
+    assert response.status_code == 400
+
+
+def _create_dated_orders(db: Session, count: int) -> list:
+    """Orders created one hour apart, statuses alternating PLACED / CONFIRMED; two share a timestamp."""
+    start = datetime(2026, 3, 1, 8, 0)
+    orders = []
+    for n in range(count):
+        created_at = start + timedelta(hours=n if n != 1 else 0)
+        status = OrderStatus.PLACED if n % 2 == 0 else OrderStatus.CONFIRMED
+        orders.append(Order(status=status, subtotal_cents=0, total_cents=0, created_at=created_at))
+    db.add_all(orders)
+    db.commit()
+    return orders
+
+
+def _page_through(client: TestClient, url: str, params: dict, headers: dict) -> list:
+    pages, cursor = [], None
+    while True:
+        response = client.get(url, params={**params, "cursor": cursor} if cursor else params, headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        pages.append([order["id"] for order in data["items"]])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_list_orders_keyset_pagination(client: TestClient, db: Session, override_get_db, admin_headers):
+    orders = _create_dated_orders(db, 7)
+    newest_first = [o.id for o in sorted(orders, key=lambda o: (o.created_at, o.id), reverse=True)]
+
+    pages = _page_through(client, "/orders/admin", {"page_size": 3}, admin_headers)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == newest_first
+
+    placed = _page_through(client, "/orders/admin", {"page_size": 2, "status": "placed"}, admin_headers)
+    assert sum(placed, []) == [o for o in newest_first if o in {o.id for o in orders[::2]}]
+
+    ranged = client.get(
+        "/orders/admin",
+        params={"created_from": "2026-03-01T10:00:00", "created_to": "2026-03-01T12:00:00"},
+        headers=admin_headers,
+    ).json()
+    assert [o["id"] for o in ranged["items"]] == [orders[3].id, orders[2].id]
+
+    assert client.get("/orders/admin?cursor=not-a-cursor", headers=admin_headers).status_code == 400
+
+
+def test_get_my_orders_only_returns_own_orders(client: TestClient, db: Session, override_get_db, admin_headers):
+    orders = _create_dated_orders(db, 3)
+    admin = db.query(User).filter(User.email == "admin@fixture.test").one()
+    orders[0].user_id = orders[2].user_id = admin.id
+    db.commit()
+
+    data = client.get("/orders/me", headers=admin_headers).json()
+    assert [o["id"] for o in data["items"]] == [orders[2].id, orders[0].id]
+    assert data["next_cursor"] is None
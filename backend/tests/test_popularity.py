@@ -0,0 +1,161 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.db.models import Order, OrderItem, OrderStatus, Product, ProductKind, ProductPopularity
+from app.services import popularity
+from conftest import TestingAsyncSessionLocal
+
+HALF_LIFE = 14.0
+
+
+def test_scores_rank_like_decayed_units():
+    now = datetime(2026, 6, 1)
+    sales = {
+        1: [(now - timedelta(days=1), 3)],
+        2: [(now - timedelta(days=28), 10), (now - timedelta(days=2), 1)],  # 2.5 + ~0.9 units now
+        3: [(now - timedelta(days=400), 1000)],
+    }
+    items = [(product_id, quantity, at) for product_id, rows in sales.items() for at, quantity in rows]
+    products, units, scores, last_sold = popularity.sum_scores(
+        np.array([p for p, _, _ in items]),
+        np.array([q for _, q, _ in items], dtype=np.float64),
+        np.array([at for _, _, at in items], dtype="datetime64[us]"),
+        HALF_LIFE,
+    )
+
+    assert products.tolist() == [1, 2, 3] and units.tolist() == [3, 11, 1000]
+    assert last_sold.tolist() == [max(at for at, _ in sales[p]) for p in (1, 2, 3)]
+    decayed = [popularity.decayed_units(score, now, HALF_LIFE) for score in scores.tolist()]
+    expected = [
+        sum(quantity * 0.5 ** ((now - at).days / HALF_LIFE) for at, quantity in sales[p]) for p in (1, 2, 3)
+    ]
+    assert decayed == pytest.approx(expected)
+    assert sorted(products.tolist(), key=lambda p: -scores[p - 1]) == [2, 1, 3]
+
+
+def _products(db: Session, names: str) -> dict:
+    products = [
+        Product(slug=name.lower(), name=name, price_cents=1000, kind=ProductKind.PLANT, active=True) for name in names
+    ]
+    db.add_all(products)
+    db.commit()
+    return {product.name: product.id for product in products}
+
+
+def _order(db: Session, ids: dict, basket: dict, confirmed_at, status: OrderStatus = OrderStatus.CONFIRMED) -> None:
+    order = Order(status=status, subtotal_cents=0, total_cents=0, confirmed_at=confirmed_at)
+    order.items = [
+        OrderItem(product_id=ids[name], quantity=quantity, unit_price_cents=1000, product_name=name)
+        for name, quantity in basket.items()
+    ]
+    db.add(order)
+    db.commit()
+
+
+def _run(function, **kwargs) -> popularity.RunStats:
+    async def run():
+        async with TestingAsyncSessionLocal() as session:
+            return await function(session, **kwargs)
+
+    return asyncio.run(run())
+
+
+def _units(db: Session) -> dict:
+    db.expire_all()
+    return {row.product_id: row.units for row in db.query(ProductPopularity)}
+
+
+def test_popularity_is_updated_incrementally_and_sorts_the_catalog(
+    client: TestClient, db: Session, override_get_db, fresh_catalog_cache
+):
+    # The job runs in another process; workers see new scores once cached pages expire
+    fresh_catalog_cache.max_size = 0
+    ids = _products(db, "ABCDE")
+    now = datetime.utcnow()
+    _order(db, ids, {"A": 5}, now - timedelta(days=60))
+    _order(db, ids, {"B": 2, "C": 1}, now - timedelta(days=1))
+    _order(db, ids, {"C": 1}, now - timedelta(hours=1))
+    _order(db, ids, {"D": 50}, None, status=OrderStatus.PLACED)
+    _order(db, ids, {"D": 50}, now - timedelta(hours=2), status=OrderStatus.CANCELLED)
+
+    def popular(**params) -> list:
+        response = client.get("/catalog/products", params={"sort": "popular", **params})
+        assert response.status_code == 200
+        return response.json()
+
+    # Nothing counted yet: every score is 0, ties newest id first
+    assert [p["slug"] for p in popular()["items"]] == ["e", "d", "c", "b", "a"]
+
+    stats = _run(popularity.update, chunk_orders=2, half_life_days=HALF_LIFE)
+    assert (stats.orders, stats.products) == (4, 4)  # C is in both chunks
+    # Five units two months ago now weigh less than two yesterday
+    assert _units(db) == {ids["A"]: 5, ids["B"]: 2, ids["C"]: 2}
+    assert [p["slug"] for p in popular()["items"]] == ["c", "b", "a", "e", "d"]
+
+    # Only newly confirmed orders are read; orders younger than SETTLE_TIME wait
+    _order(db, ids, {"A": 100}, datetime.utcnow())
+    _order(db, ids, {"E": 1}, now - timedelta(minutes=30))
+    stats = _run(popularity.update, half_life_days=HALF_LIFE)
+    assert (stats.orders, stats.products) == (1, 1)
+    assert _units(db) == {ids["A"]: 5, ids["B"]: 2, ids["C"]: 2, ids["E"]: 1}
+    assert _run(popularity.update, half_life_days=HALF_LIFE).orders == 0
+
+    stats = _run(popularity.update, half_life_days=HALF_LIFE, now=datetime.utcnow() + timedelta(minutes=5))
+    assert stats.orders == 1
+    assert _units(db)[ids["A"]] == 105
+
+    # Keyset pages follow the scores
+    walked, cursor = [], None
+    while True:
+        data = popular(page_size=2, **({"cursor": cursor} if cursor else {}))
+        walked += [p["slug"] for p in data["items"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert walked == [p["slug"] for p in popular()["items"]] == ["a", "c", "b", "e", "d"]
+    cursor = popular(page_size=2)["next_cursor"]
+    assert client.get("/catalog/products", params={"sort": "price", "cursor": cursor}).status_code == 400
+
+    # A rebuild from the whole history lands on the same scores
+    db.expire_all()
+    before = {row.product_id: row.score for row in db.query(ProductPopularity)}
+    stats = _run(popularity.rebuild, now=datetime.utcnow() + timedelta(minutes=5))
+    assert stats.orders == 6
+    db.expire_all()
+    assert {row.product_id: row.score for row in db.query(ProductPopularity)} == pytest.approx(before)
+
+
+def test_orders_confirmed_by_status_update_are_counted_once(
+    client: TestClient, db: Session, override_get_db, admin_headers
+):
+    ids = _products(db, "AB")
+    _order(db, ids, {"A": 3}, None, status=OrderStatus.PLACED)
+    _order(db, ids, {"B": 2}, datetime.utcnow() - timedelta(hours=1))
+    placed, confirmed = db.query(Order).order_by(Order.id).all()
+
+    def set_status(order: Order, value: str) -> None:
+        response = client.patch(f"/orders/admin/{order.id}", json={"status": value}, headers=admin_headers)
+        assert response.status_code == 200
+
+    def update() -> popularity.RunStats:
+        return _run(popularity.update, half_life_days=HALF_LIFE, now=datetime.utcnow() + timedelta(minutes=5))
+
+    set_status(placed, "confirmed")
+    assert update().orders == 2
+    assert _units(db) == {ids["A"]: 3, ids["B"]: 2}
+
+    # Leaving and re-entering CONFIRMED keeps the first stamp, so nothing is counted again
+    stamped = placed.confirmed_at
+    assert stamped is not None
+    set_status(placed, "cancelled")
+    set_status(placed, "confirmed")
+    set_status(confirmed, "cancelled")
+    db.expire_all()
+    assert placed.confirmed_at == stamped and confirmed.confirmed_at is not None
+    assert update().orders == 0
+    assert _units(db) == {ids["A"]: 3, ids["B"]: 2}
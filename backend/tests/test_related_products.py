@@ -0,0 +1,140 @@
+import asyncio
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import permutations
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.db.models import JobWatermark, Order, OrderItem, OrderStatus, Product, ProductCooccurrence, ProductKind
+from app.services import related_products
+from conftest import TestingAsyncSessionLocal
+
+
+def test_count_pairs_matches_brute_force():
+    rng = random.Random(3)
+    baskets = {order_id: [rng.randint(1, 30) for _ in range(rng.randint(1, 6))] for order_id in range(1, 200)}
+    baskets[500] = list(range(1, related_products.MAX_ORDER_PRODUCTS + 2))  # too big: skipped
+    items = [(order_id, product_id) for order_id, products in baskets.items() for product_id in products]
+    rng.shuffle(items)
+
+    left, right, counts = related_products.count_pairs(
+        np.array([o for o, _ in items]), np.array([p for _, p in items])
+    )
+
+    expected = Counter(
+        pair
+        for order_id, products in baskets.items()
+        if len(set(products)) <= related_products.MAX_ORDER_PRODUCTS
+        for pair in permutations(sorted(set(products)), 2)
+    )
+    assert dict(zip(zip(left.tolist(), right.tolist()), counts.tolist())) == expected
+
+
+def _products(db: Session, names: str) -> dict:
+    products = [
+        Product(slug=name.lower(), name=name, price_cents=1000, kind=ProductKind.PLANT, active=True) for name in names
+    ]
+    db.add_all(products)
+    db.commit()
+    return {product.name: product.id for product in products}
+
+
+def _orders(db: Session, ids: dict, baskets: list, status: OrderStatus = OrderStatus.PLACED) -> None:
+    for basket in baskets:
+        order = Order(
+            status=status, subtotal_cents=0, total_cents=0, created_at=datetime.utcnow() - timedelta(hours=1)
+        )
+        order.items = [
+            OrderItem(product_id=ids[name], quantity=1, unit_price_cents=1000, product_name=name) for name in basket
+        ]
+        db.add(order)
+    db.commit()
+
+
+def _update(**kwargs) -> related_products.RunStats:
+    async def run():
+        async with TestingAsyncSessionLocal() as session:
+            return await related_products.update(session, **kwargs)
+
+    return asyncio.run(run())
+
+
+def _counts(db: Session) -> dict:
+    db.expire_all()
+    return {(row.product_id, row.related_product_id): row.orders for row in db.query(ProductCooccurrence)}
+
+
+def test_related_products_are_built_incrementally(client: TestClient, db: Session, override_get_db):
+    ids = _products(db, "ABCDE")
+    _orders(db, ids, [["A", "B", "C"], ["A", "B", "B"], ["A", "D"], ["E"]])
+    _orders(db, ids, [["A", "E"]], status=OrderStatus.CANCELLED)
+
+    def related(slug: str) -> list:
+        response = client.get(f"/catalog/products/{slug}/related")
+        assert response.status_code == 200
+        return [p["name"] for p in response.json()]
+
+    stats = _update(chunk_orders=2)
+    assert (stats.orders, stats.products) == (5, 5)
+    assert related("a") == ["B", "C", "D"]
+    assert related("d") == ["A"]
+    assert related("e") == []
+
+    assert _update().orders == 0
+    _orders(db, ids, [["A", "C"], ["C", "A", "D"]])
+    assert _update().orders == 2
+    assert client.get("/catalog/products/a/related").headers["X-Cache"] == "HIT"  # until the TTL or a product write
+
+    incremental = _counts(db)
+    db.query(ProductCooccurrence).delete()
+    db.execute(JobWatermark.__table__.delete())
+    db.commit()
+    _update()
+    assert _counts(db) == incremental
+    assert incremental[(ids["A"], ids["C"])] == 3
+
+    db.query(Product).filter(Product.id == ids["C"]).update({"active": False})
+    db.commit()
+    assert client.get("/catalog/products/c/related").status_code == 404
+    assert [p["name"] for p in client.get("/catalog/products/d/related", params={"limit": 1}).json()] == ["A"]
+
+
+def test_recent_orders_wait_for_the_next_run(db: Session):
+    ids = _products(db, "AB")
+    _orders(db, ids, [["A", "B"]])
+    db.query(Order).update({"created_at": datetime.utcnow()})
+    db.commit()
+
+    assert _update().orders == 0
+    assert _update(now=datetime.utcnow() + timedelta(minutes=5)).orders == 1
+
+
+def test_orders_are_read_in_creation_order(db: Session):
+    ids = _products(db, "ABC")
+    _orders(db, ids, [["A", "B"], ["B", "C"]])
+    late, early = db.query(Order).order_by(Order.id).all()
+    # The lower id was created last, e.g. on a worker with a skewed clock
+    late.created_at = datetime.utcnow()
+    early.created_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+
+    assert _update().orders == 1
+    assert _counts(db) == {(ids["B"], ids["C"]): 1, (ids["C"], ids["B"]): 1}
+    # The watermark is past the higher id, yet the older-id order is still counted once it settles
+    assert _update(now=datetime.utcnow() + timedelta(minutes=5)).orders == 1
+    assert _counts(db)[(ids["A"], ids["B"])] == 1
+    assert _update(now=datetime.utcnow() + timedelta(minutes=5)).orders == 0
+
+
+def test_id_only_watermarks_are_resumed(db: Session):
+    ids = _products(db, "AB")
+    _orders(db, ids, [["A", "B"], ["A", "B"]])
+    first, _ = db.query(Order).order_by(Order.id).all()
+    db.add(JobWatermark(name=related_products.JOB_NAME, last_id=first.id))
+    db.commit()
+
+    assert _update().orders == 1
+    assert _counts(db)[(ids["A"], ids["B"])] == 1
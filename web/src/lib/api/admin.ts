@@ -9,8 +9,13 @@ import type {
   CreateNurseryRequest,
   UpdateNurseryRequest,
   UpsertNurseryInventoryRequest,
+  CreatePricingRuleRequest,
+  UpdatePricingRuleRequest,
+  PricingRule,
   Order,
   OrderFulfillment,
+  OrderListParams,
+  OrderListResponse,
   AllocationSuggestionsResponse,
   CreateAllocationRequest,
   DeliveryContactRequest,
@@ -47,7 +52,14 @@ export const nurseriesApi = {
 
 // Orders
 export const ordersApi = {
-  list: (): Promise<Order[]> => api.get<Order[]>("/orders/admin"),
+  list: (params?: OrderListParams): Promise<OrderListResponse> => {
+    const searchParams = new URLSearchParams();
+    Object.entries(params ?? {}).forEach(([key, value]) => {
+      if (value !== undefined) searchParams.set(key, String(value));
+    });
+    const query = searchParams.toString();
+    return api.get<OrderListResponse>(`/orders/admin${query ? `?${query}` : ""}`);
+  },
 
   get: (id: number): Promise<Order> => api.get<Order>(`/orders/admin/${id}`),
 
@@ -82,12 +94,29 @@ export const productsApi = {
 
   getBySlug: (slug: string): Promise<Product> => api.get<Product>(`/catalog/products/${slug}`),
 
+  // "Frequently bought together", most frequent first (limit up to 20)
+  getRelated: (slug: string, limit = 8): Promise<Product[]> =>
+    api.get<Product[]>(`/catalog/products/${slug}/related?limit=${limit}`),
+
   create: (data: Partial<Product>): Promise<Product> => api.post<Product>("/admin/products", data),
 
   update: (id: number, data: Partial<Product>): Promise<Product> =>
     api.patch<Product>(`/admin/products/${id}`, data),
 };
 
+// Pricing rules (shipping charges and tax rates used by quotes and checkout)
+export const pricingRulesApi = {
+  list: (): Promise<PricingRule[]> => api.get<PricingRule[]>("/admin/pricing-rules"),
+
+  create: (data: CreatePricingRuleRequest): Promise<PricingRule> =>
+    api.post<PricingRule>("/admin/pricing-rules", data),
+
+  update: (id: number, data: UpdatePricingRuleRequest): Promise<PricingRule> =>
+    api.patch<PricingRule>(`/admin/pricing-rules/${id}`, data),
+
+  delete: (id: number): Promise<void> => api.delete<void>(`/admin/pricing-rules/${id}`),
+};
+
 // Auth (for login)
 export const authApi = {
   login: async (email: string, password: string): Promise<{ access_token: string }> => {
@@ -3,11 +3,33 @@
  */
 
 import { api } from "../api";
-import type { Order } from "./types";
+import type {
+  Order,
+  OrderListParams,
+  OrderListResponse,
+  ProductLookupResponse,
+  ProductRefs,
+  QuoteRequest,
+  QuoteResponse,
+} from "./types";
 
 export const customerApi = {
-  // Get orders for the current user
-  getMyOrders: (): Promise<Order[]> => api.get<Order[]>("/orders"),
+  // Get orders for the current user, newest first; pass next_cursor back as cursor for more
+  getMyOrders: (params?: OrderListParams): Promise<OrderListResponse> => {
+    const searchParams = new URLSearchParams();
+    Object.entries(params ?? {}).forEach(([key, value]) => {
+      if (value !== undefined) searchParams.set(key, String(value));
+    });
+    const query = searchParams.toString();
+    return api.get<OrderListResponse>(`/orders/me${query ? `?${query}` : ""}`);
+  },
+
+  // Current price, name and stock for cart lines, in one request (up to 500 ids and 500 slugs)
+  lookupProducts: (refs: Partial<ProductRefs>): Promise<ProductLookupResponse> =>
+    api.post<ProductLookupResponse>("/catalog/products/lookup", refs),
+
+  // Subtotal, shipping and tax for a cart, priced exactly as checkout will; no login needed
+  quoteCart: (cart: QuoteRequest): Promise<QuoteResponse> => api.post<QuoteResponse>("/orders/quote", cart),
 
   // Get a specific order by ID
   getOrderById: (orderId: number): Promise<Order> =>
@@ -31,9 +31,28 @@ export interface Product {
 
 export interface ProductListResponse {
   items: Product[];
-  total: number;
+  total: number | null;
   page: number;
   page_size: number;
+  total_is_estimate?: boolean;
+  next_cursor?: string | null;
+  facets?: Record<"kind" | "plant_environment" | "color" | "size", FacetCount[]> | null;
+}
+
+export interface ProductRefs {
+  ids: number[];
+  slugs: string[];
+}
+
+export interface ProductLookupResponse {
+  items: Product[];
+  missing: ProductRefs;
+  inactive: ProductRefs;
+}
+
+export interface FacetCount {
+  value: string;
+  count: number;
 }
 
 // Order types
@@ -71,6 +90,58 @@ export interface Order {
   fulfillments?: OrderFulfillment[];
 }
 
+export interface OrderListResponse {
+  items: Order[];
+  next_cursor: string | null;
+}
+
+export interface OrderListParams {
+  cursor?: string;
+  page_size?: number;
+  status?: OrderStatus;
+  created_from?: string;
+  created_to?: string;
+}
+
+export interface QuoteLine {
+  product_id: number;
+  product_name: string;
+  quantity: number;
+  unit_price_cents: number;
+  line_total_cents: number;
+}
+
+export interface QuoteRequest {
+  items: { product_id: number; quantity: number }[];
+  country?: string | null;
+  commune?: string | null;
+}
+
+export interface QuoteResponse {
+  lines: QuoteLine[];
+  subtotal_cents: number;
+  shipping_cents: number;
+  tax_cents: number;
+  total_cents: number;
+  currency: string;
+}
+
+// Pricing rules; with no matching rule the server's default shipping and tax apply
+export type PricingRuleKind = "shipping" | "tax";
+
+export interface PricingRule {
+  id: number;
+  kind: PricingRuleKind;
+  country: string | null;
+  commune: string | null;
+  min_subtotal_cents: number;
+  amount_cents: number | null;
+  rate_bps: number | null;
+  active: boolean;
+  created_at: string;
+  updated_at: string;
+}
+
 // Nursery types
 export interface Nursery {
   id: number;
@@ -176,6 +247,18 @@ export interface UpsertNurseryInventoryRequest {
   quantity: number;
 }
 
+export interface CreatePricingRuleRequest {
+  kind: PricingRuleKind;
+  country?: string | null;
+  commune?: string | null;
+  min_subtotal_cents?: number;
+  amount_cents?: number | null;
+  rate_bps?: number | null;
+  active?: boolean;
+}
+
+export type UpdatePricingRuleRequest = Partial<Omit<CreatePricingRuleRequest, "kind">>;
+
 export interface UpdateOrderStatusRequest {
   status: OrderStatus;
 }